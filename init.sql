@@ -33,8 +33,26 @@ DROP VIEW IF EXISTS "V_InitialLinkedLotSizingValues" CASCADE;
 DROP VIEW IF EXISTS "V_DemandPropagation" CASCADE;
 DROP VIEW IF EXISTS "V_ShelfLifePropagation" CASCADE;
 
--- Drop result table
+-- Drop all materialized views if they exist
+DROP TABLE IF EXISTS "MV_ProblemInstance" CASCADE;
+DROP TABLE IF EXISTS "MV_Capacity" CASCADE;
+DROP TABLE IF EXISTS "MV_PrimaryDemand" CASCADE;
+DROP TABLE IF EXISTS "MV_Material" CASCADE;
+DROP TABLE IF EXISTS "MV_MaterialCost" CASCADE;
+DROP TABLE IF EXISTS "MV_MaterialType" CASCADE;
+DROP TABLE IF EXISTS "MV_PlanningPeriod" CASCADE;
+DROP TABLE IF EXISTS "MV_Production" CASCADE;
+DROP TABLE IF EXISTS "MV_ProductStructures" CASCADE;
+DROP TABLE IF EXISTS "MV_ProductToLine" CASCADE;
+DROP TABLE IF EXISTS "MV_SetupMatrix" CASCADE;
+DROP TABLE IF EXISTS "MV_InitialLotSizingValues" CASCADE;
+DROP TABLE IF EXISTS "MV_InitialLinkedLotSizingValues" CASCADE;
+DROP TABLE IF EXISTS "MV_MaxProductionQuantity" CASCADE;
+
+-- Drop result tables
 DROP TABLE IF EXISTS "LotSizingResult" CASCADE;
+DROP TABLE IF EXISTS "LotSizingPlan" CASCADE;
+DROP TABLE IF EXISTS "LotSizingInventory" CASCADE;
 
 ---- Define persistent entities ----
 CREATE TABLE "ProblemInstance"(
@@ -50,7 +68,7 @@ CREATE TABLE "SimulationInstance"(
     "ProblemInstanceId" VARCHAR(36) NOT NULL,
     "SimulationInstanceName" VARCHAR(100) DEFAULT NULL,
     PRIMARY KEY("ProblemInstanceId", "SimulationInstanceId"),
-    CONSTRAINT "ConstraintSimulationInstanceProblemInstance" FOREIGN KEY ("ProblemInstanceId") REFERENCES "ProblemInstance"("ProblemInstanceId") ON DELETE CASCADE
+    CONSTRAINT "ConstraintSimulationInstanceProblemInstance" FOREIGN KEY ("ProblemInstanceId") REFERENCES "ProblemInstance"("ProblemInstanceId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE
 );
 
 CREATE TABLE "Material"(
@@ -63,7 +81,7 @@ CREATE TABLE "Material"(
     "BaseUOM" VARCHAR(10) DEFAULT 'PC',
     "BaseCurrency" VARCHAR(10) DEFAULT 'EUR',
     PRIMARY KEY("ProblemInstanceId", "MaterialId"),
-    CONSTRAINT "ConstraintMaterialProblemInstance" FOREIGN KEY ("ProblemInstanceId") REFERENCES "ProblemInstance"("ProblemInstanceId") ON DELETE CASCADE
+    CONSTRAINT "ConstraintMaterialProblemInstance" FOREIGN KEY ("ProblemInstanceId") REFERENCES "ProblemInstance"("ProblemInstanceId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE
 );
 
 CREATE TABLE "Capacity"(
@@ -75,7 +93,7 @@ CREATE TABLE "Capacity"(
     "Capacity" DECIMAL DEFAULT 0,
     "MachineName" VARCHAR(100) DEFAULT NULL,
     PRIMARY KEY("ProblemInstanceId", "SimulationInstanceId", "MachineId", "ValidityDateTo"),
-    CONSTRAINT "ConstraintCapacitySimulationInstance" FOREIGN KEY ("ProblemInstanceId", "SimulationInstanceId") REFERENCES "SimulationInstance"("ProblemInstanceId", "SimulationInstanceId") ON DELETE CASCADE
+    CONSTRAINT "ConstraintCapacitySimulationInstance" FOREIGN KEY ("ProblemInstanceId", "SimulationInstanceId") REFERENCES "SimulationInstance"("ProblemInstanceId", "SimulationInstanceId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE
 );
 
 CREATE TABLE "Demand"(
@@ -85,8 +103,8 @@ CREATE TABLE "Demand"(
     "DeliveryDate" DATE NOT NULL,
     "Quantity" DECIMAL NOT NULL,
     PRIMARY KEY("ProblemInstanceId", "SimulationInstanceId", "MaterialId", "DeliveryDate"),
-    CONSTRAINT "ConstraintDemandMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE,
-    CONSTRAINT "ConstraintDemandSimulationInstance" FOREIGN KEY ("ProblemInstanceId", "SimulationInstanceId") REFERENCES "SimulationInstance"("ProblemInstanceId", "SimulationInstanceId") ON DELETE CASCADE
+    CONSTRAINT "ConstraintDemandMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE,
+    CONSTRAINT "ConstraintDemandSimulationInstance" FOREIGN KEY ("ProblemInstanceId", "SimulationInstanceId") REFERENCES "SimulationInstance"("ProblemInstanceId", "SimulationInstanceId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE
 );
 
 CREATE TABLE "MaterialCost"(
@@ -99,7 +117,7 @@ CREATE TABLE "MaterialCost"(
     "Destruction" DECIMAL DEFAULT 0,
     "LostSales" DECIMAL DEFAULT 0,
     PRIMARY KEY("ProblemInstanceId", "MaterialId", "ValidityDateTo"),
-    CONSTRAINT "ConstraintMaterialCostMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE
+    CONSTRAINT "ConstraintMaterialCostMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE
 );
 
 CREATE TABLE "SetupMatrix"(
@@ -114,8 +132,8 @@ CREATE TABLE "SetupMatrix"(
     "SetupTime" DECIMAL DEFAULT 0,
     "SetupCost" DECIMAL DEFAULT 0,
     PRIMARY KEY("ProblemInstanceId", "MachineId", "MaterialIdFrom", "MaterialIdTo", "ValidityDateTo"),
-    CONSTRAINT "ConstraintSetupMatrixMaterial1" FOREIGN KEY ("ProblemInstanceId", "MaterialIdFrom") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE,
-    CONSTRAINT "ConstraintSetupMatrixMaterial2" FOREIGN KEY ("ProblemInstanceId", "MaterialIdTo") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE
+    CONSTRAINT "ConstraintSetupMatrixMaterial1" FOREIGN KEY ("ProblemInstanceId", "MaterialIdFrom") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE,
+    CONSTRAINT "ConstraintSetupMatrixMaterial2" FOREIGN KEY ("ProblemInstanceId", "MaterialIdTo") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE
 );
 
 CREATE TABLE "BOMHeader"(
@@ -134,7 +152,7 @@ CREATE TABLE "BOMHeader"(
     "LotSizeMin" DECIMAL DEFAULT NULL,
     "LotSizeMax" DECIMAL DEFAULT NULL,
     PRIMARY KEY("ProblemInstanceId", "BOMHeaderId", "ValidityDateTo"),
-    CONSTRAINT "ConstraintBOMHeaderMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE
+    CONSTRAINT "ConstraintBOMHeaderMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE
 );
 
 CREATE TABLE "BOMItem"(
@@ -148,7 +166,7 @@ CREATE TABLE "BOMItem"(
     "ScrapVariable" DECIMAL DEFAULT 0,
     "ShelfLifeVariable" DECIMAL DEFAULT 0,
     PRIMARY KEY("ProblemInstanceId", "BOMHeaderId", "BOMItemId"),
-    CONSTRAINT "ConstraintBOMItemMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE
+    CONSTRAINT "ConstraintBOMItemMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE
 );
 
 CREATE TABLE "InitialLotSizingValues"(
@@ -161,8 +179,8 @@ CREATE TABLE "InitialLotSizingValues"(
     "FinalInventory" DECIMAL DEFAULT 0,
     "InitialLinkedLotSize" INTEGER DEFAULT 0,
     PRIMARY KEY("ProblemInstanceId", "SimulationInstanceId", "MaterialId"),
-    CONSTRAINT "ConstraintInitialValuesMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE,
-    CONSTRAINT "ConstraintInitialValuesSimulationInstance" FOREIGN KEY ("ProblemInstanceId", "SimulationInstanceId") REFERENCES "SimulationInstance"("ProblemInstanceId", "SimulationInstanceId") ON DELETE CASCADE
+    CONSTRAINT "ConstraintInitialValuesMaterial" FOREIGN KEY ("ProblemInstanceId", "MaterialId") REFERENCES "Material"("ProblemInstanceId", "MaterialId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE,
+    CONSTRAINT "ConstraintInitialValuesSimulationInstance" FOREIGN KEY ("ProblemInstanceId", "SimulationInstanceId") REFERENCES "SimulationInstance"("ProblemInstanceId", "SimulationInstanceId") ON DELETE CASCADE DEFERRABLE INITIALLY IMMEDIATE
 );
 
 
@@ -184,6 +202,29 @@ CREATE TABLE "LotSizingResult"(
     PRIMARY KEY("ProblemInstanceId","MaterialId")
 );
 
+CREATE TABLE "LotSizingPlan"(
+    "ProblemInstanceId" VARCHAR(36) NOT NULL,
+    "SimulationInstanceId" VARCHAR(36) NOT NULL,
+    "MachineId" VARCHAR(36) NOT NULL,
+    "MaterialId" VARCHAR(36) NOT NULL,
+    "PlanningPeriod" INTEGER NOT NULL,
+    "ProductionQuantity" DECIMAL DEFAULT 0,
+    "SetupState" INTEGER DEFAULT 0,
+    "LinkedLotSize" INTEGER DEFAULT 0,
+    PRIMARY KEY("ProblemInstanceId","SimulationInstanceId","MachineId","MaterialId","PlanningPeriod")
+);
+
+CREATE TABLE "LotSizingInventory"(
+    "ProblemInstanceId" VARCHAR(36) NOT NULL,
+    "SimulationInstanceId" VARCHAR(36) NOT NULL,
+    "MaterialId" VARCHAR(36) NOT NULL,
+    "PlanningPeriod" INTEGER NOT NULL,
+    "Demand" DECIMAL DEFAULT 0,
+    "InventoryOnHand" DECIMAL DEFAULT 0,
+    "BackorderQuantity" DECIMAL DEFAULT 0,
+    PRIMARY KEY("ProblemInstanceId","SimulationInstanceId","MaterialId","PlanningPeriod")
+);
+
 ---- Define virtual tables ----
 CREATE VIEW "V_PlanningBuckets" AS
 SELECT t_pi."ProblemInstanceId", t_pi."PlanningBuckets", j_c."PlanningEndDate", j_c."PlanningStartDate",
@@ -464,4 +505,35 @@ CREATE VIEW "V_ShelfLifePropagation" AS
 	   cte."ShelfLifeFix",
 	 	cte."MaxRemainingShelfLife",
 	 	cte."ShelfLifeType"
-	FROM cte;
\ No newline at end of file
+	FROM cte;
+
+---- Materialized views ----
+-- Materialized views of the virtual tables loaded by the model client, refreshed per problem instance after each upload
+CREATE TABLE "MV_ProblemInstance" AS SELECT * FROM "V_ProblemInstance" WITH NO DATA;
+CREATE INDEX "IndexMVProblemInstance" ON "MV_ProblemInstance"("ProblemInstanceId", "SimulationInstanceId");
+CREATE TABLE "MV_Capacity" AS SELECT * FROM "V_Capacity" WITH NO DATA;
+CREATE INDEX "IndexMVCapacity" ON "MV_Capacity"("ProblemInstanceId", "SimulationInstanceId");
+CREATE TABLE "MV_PrimaryDemand" AS SELECT * FROM "V_PrimaryDemand" WITH NO DATA;
+CREATE INDEX "IndexMVPrimaryDemand" ON "MV_PrimaryDemand"("ProblemInstanceId", "SimulationInstanceId");
+CREATE TABLE "MV_Material" AS SELECT * FROM "V_Material" WITH NO DATA;
+CREATE INDEX "IndexMVMaterial" ON "MV_Material"("ProblemInstanceId");
+CREATE TABLE "MV_MaterialCost" AS SELECT * FROM "V_MaterialCost" WITH NO DATA;
+CREATE INDEX "IndexMVMaterialCost" ON "MV_MaterialCost"("ProblemInstanceId");
+CREATE TABLE "MV_MaterialType" AS SELECT * FROM "V_MaterialType" WITH NO DATA;
+CREATE INDEX "IndexMVMaterialType" ON "MV_MaterialType"("ProblemInstanceId");
+CREATE TABLE "MV_PlanningPeriod" AS SELECT * FROM "V_PlanningPeriod" WITH NO DATA;
+CREATE INDEX "IndexMVPlanningPeriod" ON "MV_PlanningPeriod"("ProblemInstanceId");
+CREATE TABLE "MV_Production" AS SELECT * FROM "V_Production" WITH NO DATA;
+CREATE INDEX "IndexMVProduction" ON "MV_Production"("ProblemInstanceId");
+CREATE TABLE "MV_ProductStructures" AS SELECT * FROM "V_ProductStructures" WITH NO DATA;
+CREATE INDEX "IndexMVProductStructures" ON "MV_ProductStructures"("ProblemInstanceId");
+CREATE TABLE "MV_ProductToLine" AS SELECT * FROM "V_ProductToLine" WITH NO DATA;
+CREATE INDEX "IndexMVProductToLine" ON "MV_ProductToLine"("ProblemInstanceId");
+CREATE TABLE "MV_SetupMatrix" AS SELECT * FROM "V_SetupMatrix" WITH NO DATA;
+CREATE INDEX "IndexMVSetupMatrix" ON "MV_SetupMatrix"("ProblemInstanceId");
+CREATE TABLE "MV_InitialLotSizingValues" AS SELECT * FROM "V_InitialLotSizingValues" WITH NO DATA;
+CREATE INDEX "IndexMVInitialLotSizingValues" ON "MV_InitialLotSizingValues"("ProblemInstanceId", "SimulationInstanceId");
+CREATE TABLE "MV_InitialLinkedLotSizingValues" AS SELECT * FROM "V_InitialLinkedLotSizingValues" WITH NO DATA;
+CREATE INDEX "IndexMVInitialLinkedLotSizingValues" ON "MV_InitialLinkedLotSizingValues"("ProblemInstanceId", "SimulationInstanceId");
+CREATE TABLE "MV_MaxProductionQuantity" AS SELECT * FROM "V_MaxProductionQuantity" WITH NO DATA;
+CREATE INDEX "IndexMVMaxProductionQuantity" ON "MV_MaxProductionQuantity"("ProblemInstanceId", "SimulationInstanceId");
\ No newline at end of file
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables, the time limit applies to all model variants
+SOURCE = str(sys.argv[1])
+PROBLEM_INSTANCE = str(sys.argv[2])
+SIMULATION_INSTANCES = str(sys.argv[3]).split(",")
+CT_LIMIT = int(sys.argv[4])
+
+# Model variants as build options
+VARIANTS = {
+    "ORIGINAL": {"tighten_bounds": False, "cuts": False},
+    "TIGHTENED": {"tighten_bounds": True, "cuts": False},
+    "TIGHTENED_CUTS": {"tighten_bounds": True, "cuts": True}
+}
+
+# Benchmark function
+def benchmark_bound_tightening(problem_instance_id: str, simulation_instance_ids: list):
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    print("# Benchmark bound tightening: Problem instance = %s #" % (problem_instance_id))
+    def build(options):
+        m = MLCLSP_L_B(
+            problem_instance_id = problem_instance_id,
+            simulation_instance_ids = simulation_instance_ids,
+            load_connection = True,
+            compact = True
+        )
+        m.build(vectorized = True, presolve = True, **options)
+        return m
+
+    results = list()
+    for variant, options in VARIANTS.items():
+        # Root bound after the cut passes of the root node
+        m = build(options)
+        m.model.optimize(max_nodes = 1, max_seconds = CT_LIMIT)
+        root_bound = m.model.objective_bound
+
+        m = build(options)
+        st = time.time()
+        m.solve(max_seconds = CT_LIMIT)
+        et = time.time()
+        root_gap = (m.objective_value - root_bound) / max(abs(m.objective_value), 1e-9) if m.objective_value < float("inf") and root_bound is not None else None
+        results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": m.S, "Variant": variant, "RootBound": root_bound, "RootGap": root_gap,
+                        "Cuts": m.cut_generator.cuts if m.cut_generator is not None else None, "ExecutionTime": et - st, "ObjectiveValue": m.objective_value, "LowerBound": m.model_lb,
+                        "OptimizationState": m.optimzation_state})
+    for result in results:
+        print("# %s: root gap = %s, execution time = %s seconds, %s #" % (result["Variant"], result["RootGap"], result["ExecutionTime"], result["OptimizationState"]))
+    return results
+
+if __name__ == "__main__":
+    results = benchmark_bound_tightening(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES)
+
+    # %% Save comparison
+    from lib.benchmark import append_report
+    append_report("logs/solve/bound_tightening.csv", results)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables
+PROBLEM_INSTANCE = str(sys.argv[1])
+SIMULATION_INSTANCES = str(sys.argv[2]).split(",")
+REPETITIONS = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+# Benchmark function
+def benchmark_build(problem_instance_id: str, simulation_instance_ids: list):
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    print("# Benchmark model build: Problem instance = %s #" % (problem_instance_id))
+    m = MLCLSP_L_B(
+        problem_instance_id = problem_instance_id,
+        simulation_instance_ids = simulation_instance_ids,
+        load_connection = True
+    )
+
+    results = list()
+    for engine, options in [("DICT", {}), ("VECTORIZED", {"vectorized": True}), ("VECTORIZED_NO_NAMES", {"vectorized": True, "use_names": False})]:
+        for repetition in range(REPETITIONS):
+            st = time.time()
+            m.build(**options)
+            et = time.time()
+            results.append({"ProblemInstance": problem_instance_id, "Scenarios": m.S, "Engine": engine, "Repetition": repetition, "BuildTime": et - st,
+                            "Rows": m.model.num_rows, "Columns": m.model.num_cols, "NonZeros": m.model.num_nz})
+            print("# Engine %s built %s rows, %s columns and %s non-zeros after %s seconds #" % (engine, m.model.num_rows, m.model.num_cols, m.model.num_nz, et - st))
+    return results
+
+results = benchmark_build(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES)
+
+# %% Both engines have to generate a model of equal size
+import pandas as pd
+results = pd.DataFrame(results)
+if results[["Rows", "Columns", "NonZeros"]].drop_duplicates().shape[0] != 1:
+    print("# Warning: Model sizes differ between build engines #")
+build_time = results.groupby("Engine")["BuildTime"].min()
+for engine in ["VECTORIZED", "VECTORIZED_NO_NAMES"]:
+    print("# Speedup of engine %s = %s #" % (engine, build_time["DICT"] / build_time[engine]))
+
+# %% Save build time
+from lib.benchmark import append_report
+append_report("logs/build/build_time.csv", results)
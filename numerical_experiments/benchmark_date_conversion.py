@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import sys
+import os
+import glob
+import time
+import pandas as pd
+from pyxlsb import convert_date
+
+# Get system variables
+REPETITIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+SCENARIO_FACTOR = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+# Benchmark function
+def benchmark_date_conversion(data_path: str):
+    from lib.prepare_data_in_memory import convert_serial_dates
+    demand = pd.read_excel(data_path, sheet_name = "Demand")
+    # Replicate the demand sheet to simulate additional scenarios
+    demand = pd.concat([demand] * SCENARIO_FACTOR, ignore_index = True)
+    print("# Benchmark date conversion: Demand sheet of %s with %s rows #" % (os.path.basename(data_path), demand.shape[0]))
+
+    results = list()
+    for method in ["APPLY", "VECTORIZED"]:
+        for repetition in range(REPETITIONS):
+            st = time.time()
+            if method == "APPLY":
+                converted = demand.apply(lambda x: convert_date(x['DeliveryDate']), axis=1)
+            else:
+                converted = convert_serial_dates(demand["DeliveryDate"])
+            et = time.time()
+            results.append({"Workbook": os.path.basename(data_path), "Rows": demand.shape[0], "Method": method, "Repetition": repetition, "ConversionTime": et - st})
+        if method == "APPLY":
+            reference = converted
+    if not (reference == converted).all():
+        print("# Warning: Converted dates differ between methods #")
+    return results
+
+results = list()
+for data_path in sorted(glob.glob(os.path.dirname(os.path.realpath("__file__")) + "/research_data/migrated_data/**/*.xlsb", recursive = True)):
+    results += benchmark_date_conversion(data_path)
+
+# %% Speedup per workbook
+results = pd.DataFrame(results)
+conversion_time = results.groupby(["Workbook", "Rows", "Method"])["ConversionTime"].min().unstack()
+conversion_time["Speedup"] = conversion_time["APPLY"] / conversion_time["VECTORIZED"]
+print(conversion_time)
+
+# %% Save conversion time
+from lib.benchmark import append_report
+append_report("logs/loading/date_conversion.csv", results)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables, the time limit applies to the monolithic model and to the whole decomposition
+SOURCE = str(sys.argv[1])
+PROBLEM_INSTANCE = str(sys.argv[2])
+SIMULATION_INSTANCES = str(sys.argv[3]).split(",")
+CT_LIMIT = int(sys.argv[4])
+PROCESSES = int(sys.argv[5]) if len(sys.argv) > 5 else None
+
+# Benchmark function
+def benchmark_decomposition(problem_instance_id: str, simulation_instance_ids: list):
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    print("# Benchmark scenario decomposition: Problem instance = %s #" % (problem_instance_id))
+    m = MLCLSP_L_B(
+        problem_instance_id = problem_instance_id,
+        simulation_instance_ids = simulation_instance_ids,
+        load_connection = True,
+        compact = True
+    )
+
+    results = list()
+    st = time.time()
+    m.build(vectorized = True, presolve = True)
+    m.solve(max_seconds = CT_LIMIT)
+    et = time.time()
+    results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": m.S, "SolveMode": "MONOLITHIC", "Processes": 1, "ExecutionTime": et - st,
+                    "ObjectiveValue": m.objective_value, "LowerBound": m.model_lb, "Gap": abs(m.objective_value - m.model_lb) / m.objective_value, "OptimizationState": m.optimzation_state})
+
+    st = time.time()
+    m.solve_decomposition(max_seconds = CT_LIMIT, processes = PROCESSES, vectorized = True, presolve = True)
+    et = time.time()
+    results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": m.S, "SolveMode": "DECOMPOSITION", "Processes": m.decomposition.processes, "ExecutionTime": et - st,
+                    "ObjectiveValue": m.objective_value, "LowerBound": m.model_lb, "Gap": abs(m.objective_value - m.model_lb) / m.objective_value, "OptimizationState": m.optimzation_state})
+    for result in results:
+        print("# %s: execution time = %s seconds, gap = %s, %s #" % (result["SolveMode"], result["ExecutionTime"], result["Gap"], result["OptimizationState"]))
+    return results
+
+if __name__ == "__main__":
+    results = benchmark_decomposition(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES)
+
+    # %% Save comparison
+    from lib.benchmark import append_report
+    append_report("logs/solve/decomposition.csv", results)
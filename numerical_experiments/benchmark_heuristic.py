@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables, the time limit applies to both solve modes
+SOURCE = str(sys.argv[1])
+PROBLEM_INSTANCE = str(sys.argv[2])
+SIMULATION_INSTANCES = str(sys.argv[3]).split(",")
+CT_LIMIT = int(sys.argv[4])
+PARTITION = str(sys.argv[5]) if len(sys.argv) > 5 else "period"
+WINDOW = int(sys.argv[6]) if len(sys.argv) > 6 else 2
+
+# Benchmark function
+def benchmark_heuristic(problem_instance_id: str, simulation_instance_ids: list):
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    print("# Benchmark fix-and-optimize heuristic: Problem instance = %s #" % (problem_instance_id))
+    m = MLCLSP_L_B(
+        problem_instance_id = problem_instance_id,
+        simulation_instance_ids = simulation_instance_ids,
+        load_connection = True,
+        compact = True
+    )
+    m.build(vectorized = True, presolve = True)
+
+    results = list()
+    for solve_mode in ["MONOLITHIC", "HEURISTIC"]:
+        st = time.time()
+        if solve_mode == "MONOLITHIC":
+            m.solve(max_seconds = CT_LIMIT)
+        else:
+            m.solve_heuristic(max_seconds = CT_LIMIT, window = WINDOW, partition = PARTITION)
+        et = time.time()
+        results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": m.S, "SolveMode": solve_mode, "Partition": PARTITION if solve_mode == "HEURISTIC" else None,
+                        "Window": WINDOW if solve_mode == "HEURISTIC" else None, "ExecutionTime": et - st, "ObjectiveValue": m.objective_value, "LowerBound": m.model_lb,
+                        "OptimizationState": m.optimzation_state})
+    for result in results:
+        print("# %s: execution time = %s seconds, %s #" % (result["SolveMode"], result["ExecutionTime"], result["OptimizationState"]))
+    return results
+
+if __name__ == "__main__":
+    results = benchmark_heuristic(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES)
+
+    # %% Save comparison
+    from lib.benchmark import append_report
+    append_report("logs/solve/heuristic.csv", results)
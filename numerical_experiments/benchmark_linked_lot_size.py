@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables
+SOURCE = str(sys.argv[1])
+PROBLEM_INSTANCE = str(sys.argv[2])
+SIMULATION_INSTANCES = str(sys.argv[3]).split(",")
+CT_LIMIT = int(sys.argv[4])
+
+# Benchmark function
+def benchmark_linked_lot_size(problem_instance_id: str, simulation_instance_ids: list):
+    from lib.MLCLSP_L_B import MLCLSP_L_B, LINKED_LOT_SIZE_FORMULATIONS
+    print("# Benchmark linked lot-size formulations: Problem instance = %s #" % (problem_instance_id))
+    m = MLCLSP_L_B(
+        problem_instance_id = problem_instance_id,
+        simulation_instance_ids = simulation_instance_ids,
+        load_connection = True
+    )
+
+    results = list()
+    for linked_lot_size in LINKED_LOT_SIZE_FORMULATIONS:
+        st = time.time()
+        m.build(vectorized = True, linked_lot_size = linked_lot_size)
+        bt = time.time()
+        m.solve(max_seconds = CT_LIMIT)
+        et = time.time()
+        results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": m.S, "Formulation": linked_lot_size, "Rows": m.model.num_rows, "Columns": m.model.num_cols,
+                        "NonZeros": m.model.num_nz, "BuildTime": bt - st, "SolveTime": et - bt, "ObjectiveValue": m.objective_value, "LowerBound": m.model_lb, "OptimizationState": m.optimzation_state})
+        print("# Formulation %s: %s rows, build time = %s seconds, solve time = %s seconds, %s #" % (linked_lot_size, m.model.num_rows, bt - st, et - bt, m.optimzation_state))
+    return results
+
+results = benchmark_linked_lot_size(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES)
+
+# %% Save comparison
+from lib.benchmark import append_report
+append_report("logs/build/linked_lot_size.csv", results)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import sys
+import os
+import time
+import pandas as pd
+
+# Get system variables, optional refresh of the materialized views of all problem instances before the benchmark
+REFRESH = len(sys.argv) > 1 and str(sys.argv[1]) == "REFRESH"
+
+# Benchmark function
+def benchmark_materialized_views(source: str, problem_instance_id: str):
+    from lib.index_model import IndexModel
+    print("# Benchmark materialized views: Problem instance = %s #" % (problem_instance_id))
+    results = list()
+    for materialized in [False, True]:
+        st = time.time()
+        index_model = IndexModel(
+            problem_instance_id = problem_instance_id,
+            load_connection = True,
+            materialized = materialized
+        )
+        lt = time.time()
+        index_model.instantiate()
+        et = time.time()
+        results.append({"Source": source, "ProblemInstance": problem_instance_id, "LoadingType": "DB_MATERIALIZED" if materialized else "DB", "LoadTime": lt - st,
+                        "ExecutionTime": et - st})
+        print("# Instantiation from %s after %s seconds #" % ("materialized views" if materialized else "views", et - st))
+    return results
+
+problem_instances = pd.read_csv(os.path.dirname(os.path.realpath("__file__")) + "/ProblemInstances.csv", header = None, names = ["Source", "ProblemInstance", "DataPath"])
+if REFRESH:
+    from lib.model_client import ModelClient
+    client = ModelClient()
+    for problem_instance_id in problem_instances["ProblemInstance"]:
+        client.set_problem_instance_id(problem_instance_id)
+        client.refresh_views()
+
+results = list()
+for row in problem_instances.itertuples():
+    results += benchmark_materialized_views(source = row.Source, problem_instance_id = row.ProblemInstance)
+
+# %% Save comparison
+from lib.benchmark import append_report
+append_report("logs/instantiation/materialized_views.csv", results)
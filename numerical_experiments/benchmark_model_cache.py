@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables, every repetition loads, instantiates and builds the model again
+SOURCE = str(sys.argv[1])
+PROBLEM_INSTANCE = str(sys.argv[2])
+SIMULATION_INSTANCES = str(sys.argv[3]).split(",")
+REPETITIONS = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+
+# Benchmark function
+def benchmark_model_cache(problem_instance_id: str, simulation_instance_ids: list):
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    from lib.model_cache import ModelCache
+    print("# Benchmark model cache: Problem instance = %s #" % (problem_instance_id))
+    cache = ModelCache()
+    results = list()
+    for mode, model_cache in [("UNCACHED", None), ("CACHED", cache)]:
+        for repetition in range(REPETITIONS):
+            st = time.time()
+            m = MLCLSP_L_B(
+                problem_instance_id = problem_instance_id,
+                simulation_instance_ids = simulation_instance_ids,
+                load_connection = True
+            )
+            lt = time.time()
+            m.build(presolve = True, cache = model_cache)
+            et = time.time()
+            results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": m.S, "Mode": mode, "Repetition": repetition, "LoadTime": lt - st, "BuildTime": et - lt,
+                            "Rows": m.model.num_rows, "Columns": m.model.num_cols})
+            print("# %s repetition %s: load time = %s seconds, build time = %s seconds #" % (mode, repetition, lt - st, et - lt))
+
+    statistics = cache.statistics()
+    print("# Model cache: %s hits, %s misses, %s entries with %s MB #" % (statistics["Hits"], statistics["Misses"], statistics["Entries"], statistics["Size"] / 1024 ** 2))
+    return results
+
+if __name__ == "__main__":
+    results = benchmark_model_cache(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES)
+
+    # %% Save build time
+    from lib.benchmark import append_report
+    append_report("logs/build/model_cache.csv", results)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables, the added simulation instances are appended to the model of the initial simulation instances
+SOURCE = str(sys.argv[1])
+PROBLEM_INSTANCE = str(sys.argv[2])
+SIMULATION_INSTANCES = str(sys.argv[3]).split(",")
+ADDED_SIMULATION_INSTANCES = str(sys.argv[4]).split(",")
+CT_LIMIT = int(sys.argv[5])
+
+# Benchmark function
+def benchmark_scenario_append(problem_instance_id: str, simulation_instance_ids: list, added_simulation_instance_ids: list):
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    print("# Benchmark scenario append: Problem instance = %s #" % (problem_instance_id))
+    results = list()
+
+    # Rebuild: all simulation instances are fetched, instantiated and built from scratch
+    st = time.time()
+    m = MLCLSP_L_B(
+        problem_instance_id = problem_instance_id,
+        simulation_instance_ids = simulation_instance_ids + added_simulation_instance_ids,
+        load_connection = True
+    )
+    m.build(presolve = True)
+    build_time = time.time() - st
+    st = time.time()
+    m.solve(max_seconds = CT_LIMIT, progress_log = True)
+    results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": m.S, "AddedScenarios": len(added_simulation_instance_ids), "Mode": "REBUILD",
+                    "BuildTime": build_time, "TimeToFirstIncumbent": m.time_to_first_incumbent, "ExecutionTime": time.time() - st, "ObjectiveValue": m.objective_value,
+                    "LowerBound": m.model_lb, "OptimizationState": m.optimzation_state})
+
+    # Append: the model of the initial simulation instances is solved, extended by the added ones and solved again from the previous solution
+    m = MLCLSP_L_B(
+        problem_instance_id = problem_instance_id,
+        simulation_instance_ids = simulation_instance_ids,
+        load_connection = True
+    )
+    m.build(presolve = True)
+    m.solve(max_seconds = CT_LIMIT)
+    st = time.time()
+    m.add_scenarios(added_simulation_instance_ids)
+    build_time = time.time() - st
+    st = time.time()
+    m.solve(max_seconds = CT_LIMIT, progress_log = True)
+    results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": m.S, "AddedScenarios": len(added_simulation_instance_ids), "Mode": "APPEND",
+                    "BuildTime": build_time, "TimeToFirstIncumbent": m.time_to_first_incumbent, "ExecutionTime": time.time() - st, "ObjectiveValue": m.objective_value,
+                    "LowerBound": m.model_lb, "OptimizationState": m.optimzation_state})
+    for result in results:
+        print("# %s: build time = %s seconds, time to first incumbent = %s seconds, %s #" % (result["Mode"], result["BuildTime"], result["TimeToFirstIncumbent"],
+              result["OptimizationState"]))
+    return results
+
+if __name__ == "__main__":
+    results = benchmark_scenario_append(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES,
+                                        added_simulation_instance_ids = ADDED_SIMULATION_INSTANCES)
+
+    # %% Save comparison
+    from lib.benchmark import append_report
+    append_report("logs/solve/scenario_append.csv", results)
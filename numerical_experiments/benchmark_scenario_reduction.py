@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables, the reduced model keeps N_SCENARIOS representatives of the simulation instances
+SOURCE = str(sys.argv[1])
+PROBLEM_INSTANCE = str(sys.argv[2])
+SIMULATION_INSTANCES = str(sys.argv[3]).split(",")
+CT_LIMIT = int(sys.argv[4])
+N_SCENARIOS = int(sys.argv[5])
+
+# Benchmark function
+def benchmark_scenario_reduction(problem_instance_id: str, simulation_instance_ids: list):
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    print("# Benchmark scenario reduction: Problem instance = %s #" % (problem_instance_id))
+    results = list()
+    for reduction in [False, True]:
+        m = MLCLSP_L_B(
+            problem_instance_id = problem_instance_id,
+            simulation_instance_ids = simulation_instance_ids,
+            load_connection = True,
+            compact = True
+        )
+        st = time.time()
+        if reduction:
+            m.reduce_scenarios(N_SCENARIOS)
+        rt = time.time()
+        m.build(vectorized = True, presolve = True)
+        bt = time.time()
+        m.solve(max_seconds = CT_LIMIT)
+        et = time.time()
+        results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": len(simulation_instance_ids), "ReducedScenarios": m.S,
+                        "ReductionTime": rt - st, "BuildTime": bt - rt, "SolveTime": et - bt, "Rows": m.model.num_rows, "Columns": m.model.num_cols,
+                        "ObjectiveValue": m.objective_value, "LowerBound": m.model_lb, "OptimizationState": m.optimzation_state,
+                        "ApproximationError": m.scenario_reduction.approximation_error if reduction else 0.0,
+                        "RelativeApproximationError": m.scenario_reduction.relative_approximation_error if reduction else 0.0})
+    full, reduced = results
+    print("# Build time %s -> %s seconds, solve time %s -> %s seconds, objective value %s -> %s #" % (full["BuildTime"], reduced["BuildTime"], full["SolveTime"], reduced["SolveTime"],
+        full["ObjectiveValue"], reduced["ObjectiveValue"]))
+    return results
+
+if __name__ == "__main__":
+    results = benchmark_scenario_reduction(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES)
+
+    # %% Save comparison
+    from lib.benchmark import append_report
+    append_report("logs/solve/scenario_reduction.csv", results)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import sys
+
+# Get system variables, commands:
+# run $INSTANCES $SYNTHETIC_INSTANCES $PHASES $CT_LIMIT [$REPETITIONS] - lists are comma-separated, "-" for none, "ALL" for all problem instances of ProblemInstances.csv
+# baseline $RESULTS - save a result file as baseline
+# compare $RESULTS [$BASELINE] - flag regressions of a result file against the baseline
+COMMAND = str(sys.argv[1])
+ARGUMENTS = sys.argv[2:]
+
+def argument_list(argument):
+    return list() if argument == "-" else [value.strip() for value in argument.split(",")]
+
+if __name__ == "__main__":
+    from lib.benchmark import BenchmarkSuite, BENCHMARK_PHASES
+    suite = BenchmarkSuite()
+    if COMMAND == "run":
+        suite.run(problem_instance_ids = argument_list(ARGUMENTS[0]), synthetic_instances = argument_list(ARGUMENTS[1]),
+                  phases = argument_list(ARGUMENTS[2]) if len(ARGUMENTS) > 2 else BENCHMARK_PHASES, ct_limit = int(ARGUMENTS[3]) if len(ARGUMENTS) > 3 else 60,
+                  repetitions = int(ARGUMENTS[4]) if len(ARGUMENTS) > 4 else 1)
+    elif COMMAND == "baseline":
+        suite.save_baseline(ARGUMENTS[0])
+    elif COMMAND == "compare":
+        comparison = suite.compare(ARGUMENTS[0], ARGUMENTS[1] if len(ARGUMENTS) > 1 else None)
+        print(comparison.to_string(index = False))
+        regressions = comparison[comparison["Regression"] != ""]
+        if regressions.shape[0] > 0:
+            print("# %s regressions against the baseline #" % (regressions.shape[0]))
+            sys.exit(1)
+        print("# No regressions against the baseline #")
+    else:
+        raise ValueError("Unknown command {}, choose one of run, baseline or compare".format(COMMAND))
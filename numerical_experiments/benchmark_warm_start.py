@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables, the time limit applies to both starts
+SOURCE = str(sys.argv[1])
+PROBLEM_INSTANCE = str(sys.argv[2])
+SIMULATION_INSTANCES = str(sys.argv[3]).split(",")
+CT_LIMIT = int(sys.argv[4])
+
+# Benchmark function
+def benchmark_warm_start(problem_instance_id: str, simulation_instance_ids: list):
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    print("# Benchmark warm start: Problem instance = %s #" % (problem_instance_id))
+    results = list()
+    for start in ["COLD", "CONSTRUCTIVE"]:
+        # Every start solves a freshly built model so that no incumbent is kept from the previous solve
+        m = MLCLSP_L_B(
+            problem_instance_id = problem_instance_id,
+            simulation_instance_ids = simulation_instance_ids,
+            load_connection = True,
+            compact = True
+        )
+        m.build(vectorized = True, presolve = True)
+        st = time.time()
+        m.solve(max_seconds = CT_LIMIT, warm_start = "constructive" if start == "CONSTRUCTIVE" else None, progress_log = True)
+        et = time.time()
+        results.append({"Source": SOURCE, "ProblemInstance": problem_instance_id, "Scenarios": m.S, "Start": start,
+                        "ConstructionTime": m.warm_start.construction_time if start == "CONSTRUCTIVE" else None, "TimeToFirstIncumbent": m.time_to_first_incumbent,
+                        "ExecutionTime": et - st, "ObjectiveValue": m.objective_value, "LowerBound": m.model_lb, "OptimizationState": m.optimzation_state})
+    for result in results:
+        print("# %s: time to first incumbent = %s seconds, execution time = %s seconds, %s #" % (result["Start"], result["TimeToFirstIncumbent"], result["ExecutionTime"],
+              result["OptimizationState"]))
+    return results
+
+if __name__ == "__main__":
+    results = benchmark_warm_start(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES)
+
+    # %% Save comparison
+    from lib.benchmark import append_report
+    append_report("logs/solve/warm_start.csv", results)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import sys
+import os
+
+# Get system variables, the instance is a synthetic instance S<scenarios>P<products>T<periods>M<machines> or a problem instance of ProblemInstances.csv,
+# e.g. python3 check_build_engines.py S2P12T8M3 60
+INSTANCE = str(sys.argv[1]) if len(sys.argv) > 1 else "S2P12T8M3"
+CT_LIMIT = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+
+# Check function
+def check_build_engines(instance: str, ct_limit: float):
+    # The dictionary build and the array build of the same instance have equal row, column and non-zero counts, an equal LP relaxation and,
+    # if both solves are optimal, an equal objective value. The dictionary build raises a KeyError for positive lead times, it is skipped then
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    from lib.benchmark import BenchmarkSuite, SYNTHETIC_INSTANCE, synthetic_instance
+    if SYNTHETIC_INSTANCE.match(instance):
+        m = MLCLSP_L_B(instance, [], load_connection = False, disk_data = synthetic_instance(*[int(value) for value in SYNTHETIC_INSTANCE.match(instance).groups()]))
+    else:
+        row = [row for row in BenchmarkSuite().problem_instances if row["ProblemInstance"] == instance][0]
+        m = MLCLSP_L_B(instance, [], load_connection = False, data_path = os.path.dirname(os.path.realpath("__file__")) + row["DataPath"])
+    lead_times = sorted(set(float(value) for value in m.lead_time.values()))
+    print("# Check build engines: Instance = %s, %s scenarios, lead times = %s #" % (instance, m.S, lead_times))
+    engines = [("DICT", {}), ("VECTORIZED", {"vectorized": True}), ("VECTORIZED_NO_NAMES", {"vectorized": True, "use_names": False})]
+    if max(lead_times, default = 0) > 0:
+        print("# The dictionary build does not support positive lead times, only the array builds are compared #")
+        engines = engines[1:]
+
+    results = dict()
+    for engine, options in engines:
+        m.build(**options)
+        m.model.verbose = 0
+        m.model.optimize(relax = True)
+        relaxation = m.model.objective_value
+        status = m.solve(max_seconds = ct_limit)
+        results[engine] = {"Rows": m.model.num_rows, "Columns": m.model.num_cols, "NonZeros": m.model.num_nz, "Relaxation": relaxation, "Status": status.name,
+                           "ObjectiveValue": m.objective_value}
+        print("# Engine %s: %s #" % (engine, results[engine]))
+
+    # Solves stopped by the time limit may end with different incumbents of equal models, their objective values are not compared
+    def differs(a, b):
+        return abs(a - b) > 1e-6 * max(1.0, abs(b))
+
+    differences = list()
+    reference = engines[0][0]
+    for engine, options in engines[1:]:
+        for column in ["Rows", "Columns", "NonZeros"]:
+            if results[engine][column] != results[reference][column]:
+                differences.append("%s %s %s differs from %s" % (engine, column, results[engine][column], results[reference][column]))
+        if differs(results[engine]["Relaxation"], results[reference]["Relaxation"]):
+            differences.append("%s LP relaxation %s differs from %s" % (engine, results[engine]["Relaxation"], results[reference]["Relaxation"]))
+        if results[engine]["Status"] == "OPTIMAL" and results[reference]["Status"] == "OPTIMAL" and differs(results[engine]["ObjectiveValue"], results[reference]["ObjectiveValue"]):
+            differences.append("%s objective value %s differs from %s" % (engine, results[engine]["ObjectiveValue"], results[reference]["ObjectiveValue"]))
+    return differences
+
+if __name__ == "__main__":
+    differences = check_build_engines(INSTANCE, CT_LIMIT)
+    for difference in differences:
+        print("# %s #" % (difference))
+    if len(differences) > 0:
+        sys.exit(1)
+    print("# Build engines are equal #")
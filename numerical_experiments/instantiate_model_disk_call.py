@@ -7,15 +7,26 @@ import time
 SOURCE = str(sys.argv[1])
 PROBLEM_INSTANCE = str(sys.argv[2])
 DATA_PATH = os.path.dirname(os.path.realpath("__file__")) + str(sys.argv[3])
+USE_CACHE = len(sys.argv) > 4 and str(sys.argv[4]) == "CACHE"
+LOADING_TYPE = "DISK_CACHE" if USE_CACHE else "DISK"
 
 print("Memory profiling of instantiation (Disk load): Problem instance = %s" % (PROBLEM_INSTANCE))
 
-fp = open("logs/instantiation/model_instantiation_disk_load_" + PROBLEM_INSTANCE + ".log", "w+")
+fp = open("logs/instantiation/model_instantiation_" + LOADING_TYPE.lower() + "_load_" + PROBLEM_INSTANCE + ".log", "w+")
 @profile(stream = fp)
 def instantiate_model(problem_instance_id, data_path):
     # For data preparation
     from lib.index_model import IndexModel
     from lib.prepare_data_in_memory import DataDiskLoader
+    if USE_CACHE:
+        # Prepared data is read from the disk cache
+        index_model = IndexModel(
+            problem_instance_id = problem_instance_id,
+            load_connection = False,
+            data_path = data_path
+        )
+        index_model.instantiate()
+        return
     disk_load = DataDiskLoader(problem_instance_id, data_path)
 
     index_model = IndexModel(
@@ -33,5 +44,5 @@ print("#### Script executed successfully after", et - st, "seconds #####")
 # %% Save execution time
 import pandas as pd
 execution_time_report = pd.read_csv(os.path.dirname(os.path.realpath("__file__")) + "/logs/instantiation/execution_time.csv", sep=";")
-execution_time_report = pd.concat([execution_time_report, pd.DataFrame(data = {"Source": [SOURCE], "LoadingType": ["DISK"], "ProblemInstance": [PROBLEM_INSTANCE], "ExecutionTime": [et - st]})])
+execution_time_report = pd.concat([execution_time_report, pd.DataFrame(data = {"Source": [SOURCE], "LoadingType": [LOADING_TYPE], "ProblemInstance": [PROBLEM_INSTANCE], "ExecutionTime": [et - st]})])
 execution_time_report.to_csv(os.path.dirname(os.path.realpath("__file__")) + "/logs/instantiation/execution_time.csv", index = False, sep=";")
\ No newline at end of file
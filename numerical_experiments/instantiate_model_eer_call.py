@@ -6,6 +6,7 @@ import os
 
 SOURCE = str(sys.argv[1])
 PROBLEM_INSTANCE = str(sys.argv[2])
+CONCURRENCY = int(sys.argv[3]) if len(sys.argv) > 3 else 4
 
 print("# Memory profiling of instantiation from EER model: Problem instance = %s #" % (PROBLEM_INSTANCE))
 
@@ -15,12 +16,14 @@ def instantiate_model(problem_instance_id):
     from lib.index_model import IndexModel
     index_model = IndexModel(
         problem_instance_id = problem_instance_id, 
-        load_connection = True
+        load_connection = True,
+        concurrency = CONCURRENCY
     )
     index_model.instantiate()
+    return index_model.view_latency
 
 st = time.time()
-instantiate_model(problem_instance_id = PROBLEM_INSTANCE)
+view_latency = instantiate_model(problem_instance_id = PROBLEM_INSTANCE)
 et = time.time()
 print("# Run EER model instantiation successfully after", et - st, "seconds #")
 
@@ -28,4 +31,14 @@ print("# Run EER model instantiation successfully after", et - st, "seconds #")
 import pandas as pd
 execution_time_report = pd.read_csv(os.path.dirname(os.path.realpath("__file__")) + "/logs/instantiation/execution_time.csv", sep=";")
 execution_time_report = pd.concat([execution_time_report, pd.DataFrame(data = {"Source": [SOURCE], "LoadingType": ["DB"], "ProblemInstance": [PROBLEM_INSTANCE], "ExecutionTime": [et - st]})])
-execution_time_report.to_csv(os.path.dirname(os.path.realpath("__file__")) + "/logs/instantiation/execution_time.csv", index = False, sep=";")
\ No newline at end of file
+execution_time_report.to_csv(os.path.dirname(os.path.realpath("__file__")) + "/logs/instantiation/execution_time.csv", index = False, sep=";")
+
+# %% Save latency per view
+view_latency = pd.DataFrame(view_latency)
+view_latency.insert(0, "Concurrency", CONCURRENCY)
+view_latency.insert(0, "ProblemInstance", PROBLEM_INSTANCE)
+view_latency.insert(0, "Source", SOURCE)
+report_path = os.path.dirname(os.path.realpath("__file__")) + "/logs/instantiation/view_latency.csv"
+if os.path.exists(report_path):
+    view_latency = pd.concat([pd.read_csv(report_path, sep=";"), view_latency])
+view_latency.to_csv(report_path, index = False, sep=";")
\ No newline at end of file
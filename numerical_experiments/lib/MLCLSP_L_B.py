@@ -1,95 +1,198 @@
 # -*- coding: utf-8 -*-
+import time
+import numpy as np
 from mip import *
 from lib.index_model import IndexModel
+from lib.array_model import ArrayModel
+from lib.presolve import ModelReduction, is_redundant
+from lib.decomposition import ScenarioDecomposition
+from lib.heuristic import FixAndOptimize
+from lib.warm_start import ConstructivePlan
+from lib.bound_tightening import BoundTightening
+from lib.valid_inequalities import LSInequalities
+from lib.lot_sizing_result import LotSizingResult, column_values
+from lib import instrumentation
+
+# Formulations of the linked lot-size synchronization constraints
+LINKED_LOT_SIZE_FORMULATIONS = ["pairwise", "aggregated"]
 
 # Define optimization class
 class MLCLSP_L_B(IndexModel):
-    def __init__(self, problem_instance_id: str, simulation_instance_ids: list, load_connection = True, disk_data = dict()):
+    def __init__(self, problem_instance_id: str, simulation_instance_ids: list, load_connection = True, disk_data = dict(), data_path = None, compact = False, shared = False, concurrency = 4,
+                 materialized = False):
         if load_connection:
-            IndexModel.__init__(self, problem_instance_id, simulation_instance_ids, load_connection)
+            # Views are fetched concurrently on the given number of connections, optionally from the materialized views
+            IndexModel.__init__(self, problem_instance_id, simulation_instance_ids, load_connection, concurrency = concurrency, materialized = materialized, shared = shared)
         else:
-            IndexModel.__init__(self, problem_instance_id, simulation_instance_ids, load_connection, disk_data)
-        IndexModel.instantiate(self)
+            IndexModel.__init__(self, problem_instance_id, simulation_instance_ids, load_connection, disk_data, data_path, shared = shared)
+        IndexModel.instantiate(self, compact)
  
         self.model_lb = float("inf")
         self.objective_value = float("inf")
         self.optimzation_state = None
         self.optimzation_status = None
         self.solution = dict()
+        self.solution_values = None
+        self.array_model = None
+        self.presolve = None
+        self.bound_tightening = None
+        self.cut_generator = None
+        self.decomposition = None
+        self.heuristic = None
+        self.warm_start = None
+        self.time_to_first_incumbent = None
+        self.model = None
+        self.build_options = None
+
+    def build(self, use_gbr = False, vectorized = False, use_names = True, presolve = False, linked_lot_size = "pairwise", tighten_bounds = False, cuts = False, cache = None):
+        if linked_lot_size not in LINKED_LOT_SIZE_FORMULATIONS:
+            raise ValueError("Unknown linked lot-size formulation {}, choose one of {}".format(linked_lot_size, LINKED_LOT_SIZE_FORMULATIONS))
+
+        # Build options are kept for scenarios that are added or removed later
+        self.build_options = {"use_gbr": use_gbr, "vectorized": vectorized, "use_names": use_names, "presolve": presolve, "linked_lot_size": linked_lot_size, "tighten_bounds": tighten_bounds,
+                              "cuts": cuts}
+        clock = instrumentation.stages("build", problem_instance_id = self.problem_instance_id, engine = "vectorized" if vectorized else "dict")
 
-    def build(self, use_gbr = False):
         # Instantiate a model for cost mnimization
         if use_gbr:
             self.model = Model(sense = MINIMIZE, solver_name = GRB)
         else:
             self.model = Model(sense = MINIMIZE, solver_name = CBC)
 
+        # Tighten the big-M values and reduce the model before variables and constraints are created
+        self.bound_tightening = BoundTightening(self) if tighten_bounds else None
+        self.presolve = ModelReduction(self, linked_lot_size = linked_lot_size, tightening = self.bound_tightening) if presolve else None
+        self.cut_generator = None
+        clock.stage("PRESOLVE")
+
+        # A built model of equal instance data and build options is read from the model cache (see lib/model_cache.py)
+        if cache is not None:
+            key = cache.key(self, self.build_options)
+            if cache.read(key, self):
+                clock.stage("CACHE_READ", rows = self.model.num_rows, columns = self.model.num_cols)
+                if presolve:
+                    self.presolve.report(self.model.num_rows, self.model.num_cols)
+                self.add_cut_generator(cuts)
+                clock.done(model_rows = self.model.num_rows, model_columns = self.model.num_cols, nonzeros = self.model.num_nz, cache = "HIT")
+                return
+
+        # Generate variables and constraints in batch from coefficient arrays
+        if vectorized:
+            self.array_model = ArrayModel(self, reduction = self.presolve, linked_lot_size = linked_lot_size, tightening = self.bound_tightening)
+            clock.stage("COEFFICIENTS")
+            self.array_model.load(self.model, use_names = use_names, clock = clock)
+        else:
+            self.array_model = None
+
+            # Variables are kept for the heuristic solve mode and for scenarios that are added or removed later
+            self.variables = {"INVENTORY_ON_HAND": dict(), "BACKORDER_QUANTITY": dict(), "PRODUCTION_QUANTITY": dict(), "SETUP_STATE": dict(), "LINKED_LOT_SIZE": dict(), "TOTAL_SETUP": dict(),
+                              "MACHINE_OCCUPIED": dict()}
+            self.constraints = list()
+            self.build_scenarios(self.simulation_instances, clock)
+            self.set_objective()
+            clock.stage("OBJECTIVE")
+
+            if presolve:
+                self.presolve.report(self.model.num_rows, self.model.num_cols)
+        self.add_cut_generator(cuts)
+
+        if cache is not None:
+            cache.write(key, self)
+            clock.stage("CACHE_WRITE")
+        clock.done(model_rows = self.model.num_rows, model_columns = self.model.num_cols, nonzeros = self.model.num_nz, cache = "MISS" if cache is not None else None)
+
+    def build_scenarios(self, scenarios, clock = instrumentation.NULL_TIMER):
+        # Variables and constraints of the given scenarios, scenarios are only linked by the objective
+        presolve = self.presolve is not None
+        columns = self.model.num_cols
+        linked_lot_size = self.build_options["linked_lot_size"]
+        tighten_bounds = self.bound_tightening is not None
+        scenarios = sorted(scenarios)
+
         # Define decision variables
-        x_p = dict() # Production quantity
-        x_inv = dict() # Inventory on hand
-        x_bo = dict() # Backorder quantity
-        x_su = dict() # Machine setup operation
-        x_l = dict() # Setup carry-over (linked lot size)
-        x_tsu = dict() # Total setup state
+        x_p = self.variables["PRODUCTION_QUANTITY"] # Production quantity
+        x_inv = self.variables["INVENTORY_ON_HAND"] # Inventory on hand
+        x_bo = self.variables["BACKORDER_QUANTITY"] # Backorder quantity
+        x_su = self.variables["SETUP_STATE"] # Machine setup operation
+        x_l = self.variables["LINKED_LOT_SIZE"] # Setup carry-over (linked lot size)
+        x_tsu = self.variables["TOTAL_SETUP"] # Total setup state
+        x_occ = self.variables["MACHINE_OCCUPIED"] # Machine occupied by a linked lot size for the whole period
 
-        for scenario in self.simulation_instances:
+        # Fixed variables are replaced by their values
+        if presolve:
+            x_inv.update({key: value for key, value in self.presolve.fixed_inventory.items() if key[0] in scenarios})
+            x_bo.update({key: value for key, value in self.presolve.fixed_backorder.items() if key[0] in scenarios})
+            x_l.update({key: value for key, value in self.presolve.fixed_linked_lot_size.items() if key[0] in scenarios})
+            x_p.update({key: 0 for key in self.presolve.fixed_production if key[0] in scenarios})
+
+        for scenario in scenarios:
             for product in self.products:
                 # Initial period
-                x_inv[(scenario, product, 0)] = self.model.add_var(name = "INVENTORY_ON_HAND_{}_{}_0".format(scenario, product), var_type = self.material_uom[product])
-                x_bo[(scenario, product, 0)] = self.model.add_var(name = "BACKORDER_QUANTITY_{}_{}_0".format(scenario, product), var_type = self.material_uom[product])
+                if (scenario, product, 0) not in x_inv:
+                    x_inv[(scenario, product, 0)] = self.model.add_var(name = "INVENTORY_ON_HAND_{}_{}_0".format(scenario, product), var_type = self.material_uom[product])
+                if (scenario, product, 0) not in x_bo:
+                    x_bo[(scenario, product, 0)] = self.model.add_var(name = "BACKORDER_QUANTITY_{}_{}_0".format(scenario, product), var_type = self.material_uom[product])
                 for machine in self.machines:
-                    x_l[(scenario, machine, product, 0)] = self.model.add_var(name = "LINKED_LOT_SIZE_{}_{}_{}_0".format(scenario, machine, product), var_type = BINARY)
+                    if (scenario, machine, product, 0) not in x_l and (not presolve or self.presolve.is_allocated(machine, product)):
+                        x_l[(scenario, machine, product, 0)] = self.model.add_var(name = "LINKED_LOT_SIZE_{}_{}_{}_0".format(scenario, machine, product), var_type = BINARY)
                 
                 for period in self.periods:
-                    x_inv[(scenario, product, period)] = self.model.add_var(name = "INVENTORY_ON_HAND_{}_{}_{}".format(scenario, product, period), var_type = self.material_uom[product])
-                    x_bo[(scenario, product, period)] = self.model.add_var(name = "BACKORDER_QUANTITY_{}_{}_{}".format(scenario, product, period), var_type = self.material_uom[product])
+                    if (scenario, product, period) not in x_inv:
+                        x_inv[(scenario, product, period)] = self.model.add_var(name = "INVENTORY_ON_HAND_{}_{}_{}".format(scenario, product, period), var_type = self.material_uom[product])
+                    if (scenario, product, period) not in x_bo:
+                        x_bo[(scenario, product, period)] = self.model.add_var(name = "BACKORDER_QUANTITY_{}_{}_{}".format(scenario, product, period), var_type = self.material_uom[product])
                     for machine in self.product_to_line[product]:
-                        x_p[(scenario, machine, product, period)] = self.model.add_var(name = "PRODUCTION_QUANTITY_{}_{}_{}_{}".format(scenario, machine, product, period), var_type = self.material_uom[product])
-                        x_tsu[(scenario, machine, product, period)] = self.model.add_var(name = "TOTAL_SETUP_{}_{}_{}_{}".format(scenario, machine, product, period), var_type = BINARY)
+                        if (scenario, machine, product, period) not in x_p:
+                            x_p[(scenario, machine, product, period)] = self.model.add_var(name = "PRODUCTION_QUANTITY_{}_{}_{}_{}".format(scenario, machine, product, period), var_type = self.material_uom[product])
+                        # Total setup states are substituted by their definition
+                        if not presolve:
+                            x_tsu[(scenario, machine, product, period)] = self.model.add_var(name = "TOTAL_SETUP_{}_{}_{}_{}".format(scenario, machine, product, period), var_type = BINARY)
                         x_su[(scenario, machine, product, period)] = self.model.add_var(name = "SETUP_STATE_{}_{}_{}_{}".format(scenario, machine, product, period), var_type = BINARY)
                         x_l[(scenario, machine, product, period)] = self.model.add_var(name = "LINKED_LOT_SIZE_{}_{}_{}_{}".format(scenario, machine, product, period), var_type = BINARY)
-        
-        # Define objective function
-        objective_terms = list()
-        for scenario in self.simulation_instances:
-            for product in self.products:
-                for period in self.periods:
-                    objective_terms.append(self.inventory_holding_cost[(product, period)] * x_inv[(scenario, product, period)])
-                    objective_terms.append(self.backorder_cost[(product, period)] * x_bo[(scenario, product, period)])
-                    for machine in self.product_to_line[product]:
-                            objective_terms.append(self.setup_cost[(machine, product, period)] * x_su[(scenario, machine, product, period)])
-            
-            self.model.objective = minimize(1 / self.S * xsum(objective_terms))
+
+        # The aggregated formulation synchronizes linked lot sizes per machine and period
+        if linked_lot_size == "aggregated":
+            for scenario in scenarios:
+                for machine in self.machines:
+                    if len(self.line_to_product[machine]) > 1:
+                        for period in self.periods:
+                            x_occ[(scenario, machine, period)] = self.model.add_var(name = "MACHINE_OCCUPIED_{}_{}_{}".format(scenario, machine, period), ub = 1, var_type = CONTINUOUS)
+        clock.stage("VARIABLES", columns = self.model.num_cols - columns)
         
         # Define constraints
         constraints = list()
         
         # Add initial and final inventories/backorders
-        for scenario, dict_values in self.init_inventory.items():
-            for product, initial_inventory in dict_values.items():
+        init_inventory = self.init_inventory if not presolve else dict()
+        init_backorder = self.init_backorder if not presolve else dict()
+        init_linked_lot_size = self.init_linked_lot_size if not presolve else dict()
+        for scenario in scenarios:
+            for product, initial_inventory in init_inventory.get(scenario, dict()).items():
                 constraints.append(x_inv[(scenario, product, 0)] == initial_inventory)
                 constraints.append(x_inv[(scenario, product, self.T)] == 0)
         
-        for scenario, dict_values in self.init_backorder.items():
-            for product, initial_backorder in dict_values.items():
+        for scenario in scenarios:
+            for product, initial_backorder in init_backorder.get(scenario, dict()).items():
                 constraints.append(x_bo[(scenario, product, 0)] == initial_backorder)
                 constraints.append(x_bo[(scenario, product, self.T)] == 0)
         
         # Add initial linked lot-sizes
-        for scenario, dict_values in self.init_linked_lot_size.items():
-            for key, initial_linked_lot_size in dict_values.items():
+        for scenario in scenarios:
+            for key, initial_linked_lot_size in init_linked_lot_size.get(scenario, dict()).items():
                 constraints.append(x_l[(scenario, key[0], key[1], 0)] == initial_linked_lot_size)
+        clock.stage("INITIAL_VALUES", rows = len(constraints))
         
         # Production quantities equal zero if t + lead time > T
         for key, values in self.lead_time.items():
             # Positive lead times
-            if values > 0:
+            if values > 0 and not presolve:
                 for t in range(self.T + 1 - values, self.T + values):
-                    for scenario in self.simulation_instances: 
+                    for scenario in scenarios: 
                         constraints.append(x_p[(scenario, key[0], key[1], t)] == 0)
+        clock.stage("LEAD_TIME", rows = len(constraints))
 
         # Material balance equation
-        for scenario in self.simulation_instances:
+        for scenario in scenarios:
             for product in self.products:
                 for period in self.periods:
                     secondary_demand = list()
@@ -100,60 +203,339 @@ class MLCLSP_L_B(IndexModel):
                         constraints.append(x_inv[(scenario, product, period - 1)] + x_bo[(scenario, product, period)] + xsum(x_p[(scenario, machine, product, period + self.lead_time[machine, product, period])] for machine in self.product_to_line[product]) == x_inv[(scenario, product, period)] + x_bo[(scenario, product, period - 1)] + self.demand[scenario][(product, period)])
                     else:
                         constraints.append(x_inv[(scenario, product, period - 1)] + x_bo[(scenario, product, period)] + xsum(x_p[(scenario, machine, product, period + self.lead_time[machine, product, period])] for machine in self.product_to_line[product]) == x_inv[(scenario, product, period)] + x_bo[(scenario, product, period - 1)] + self.demand[scenario][(product, period)] + xsum(secondary_demand))
+        clock.stage("MATERIAL_BALANCE", rows = len(constraints))
   
         # Capacity constraints
-        for scenario in self.simulation_instances:
+        for scenario in scenarios:
             for period in self.periods:
                 for machine in self.machines:
                     # Capacity restriction
                     constraints_term = [self.production_time[(machine, product, period)] * x_p[(scenario, machine, product, period)] + self.setup_time[(machine, product, period)] * x_su[(scenario, machine, product, period)] for product in self.line_to_product[machine]]
                     constraints.append(xsum(constraints_term)  <= self.capacity[scenario][(machine, period)])
+        clock.stage("CAPACITY", rows = len(constraints))
         
-        for scenario in self.simulation_instances:
+        big_M_setup = self.bound_tightening.big_M_setup if tighten_bounds else self.big_M
+        big_M_linked = self.bound_tightening.big_M_linked if tighten_bounds else self.big_M
+        for scenario in scenarios:
             for period in self.periods:
                 for product in self.products:
                     for machine in self.product_to_line[product]:
-                        # Big-M formulation
-                        constraints.append(x_p[(scenario, machine, product, period)] <= self.big_M[scenario][(machine, product, period)] * (x_su[(scenario, machine, product, period)] + x_l[(scenario, machine, product, period - 1)]))
+                        # Big-M formulation, tightened bounds differ for setups and linked lot sizes
+                        constraints.append(x_p[(scenario, machine, product, period)] <= big_M_setup[scenario][(machine, product, period)] * x_su[(scenario, machine, product, period)] + big_M_linked[scenario][(machine, product, period)] * x_l[(scenario, machine, product, period - 1)])
                         # Total setup definition
-                        constraints.append(x_tsu[(scenario, machine, product, period)] == x_su[(scenario, machine, product, period)] + x_l[(scenario, machine, product, period - 1)])
+                        if not presolve:
+                            constraints.append(x_tsu[(scenario, machine, product, period)] == x_su[(scenario, machine, product, period)] + x_l[(scenario, machine, product, period - 1)])
+        clock.stage("BIG_M", rows = len(constraints))
         
         # Linked lot size synchronizations
-        for scenario in self.simulation_instances:
+        for scenario in scenarios:
             for period in self.periods:
                 for machine in self.machines:
                     constraints_term = [x_l[(scenario, machine, product, period)] for product in self.line_to_product[machine]]
                     constraints.append(xsum(constraints_term) <= 1)
                     for product in self.line_to_product[machine]:
                         constraints.append(x_l[(scenario, machine, product, period)] - x_su[(scenario, machine, product, period)] - x_l[(scenario, machine, product, period - 1)] <= 0)
-                        for product2 in self.products:
+                        if (scenario, machine, period) in x_occ:
+                            # A product carried over the whole period occupies the machine, no other product can be set up
+                            constraints.append(x_l[(scenario, machine, product, period)] + x_l[(scenario, machine, product, period - 1)] - x_su[(scenario, machine, product, period)] - x_occ[(scenario, machine, period)] <= 1)
+                            constraints.append(x_occ[(scenario, machine, period)] + x_su[(scenario, machine, product, period)] <= 1)
+                            continue
+                        for product2 in self.line_to_product[machine]:
                             if product2 != product:
                                 constraints.append(x_l[(scenario, machine, product, period)] + x_l[(scenario, machine, product, period - 1)] - x_su[(scenario, machine, product, period)] + x_su[(scenario, machine, product2, period)]  <= 2)
         
-        self.constraints = constraints
-        for constraint in self.constraints:
+        clock.stage("LINKED_LOT_SIZE", rows = len(constraints))
+
+        # Skip constraints that are satisfied for all values within the variable bounds
+        if presolve:
+            constraints = [constraint for constraint in constraints if not is_redundant(constraint)]
+            clock.stage("REDUCTION", rows = len(constraints))
+
+        self.constraints += constraints
+        for constraint in constraints:
             self.model += constraint
+        clock.stage("ADD_ROWS")
 
-    def solve(self, max_seconds = 100.0):
-        status = self.model.optimize(max_seconds=max_seconds)
-        result = dict()
+    def set_objective(self):
+        # Scenarios are weighted by their probabilities (uniform 1 / S without scenario reduction)
+        x_inv, x_bo, x_su = self.variables["INVENTORY_ON_HAND"], self.variables["BACKORDER_QUANTITY"], self.variables["SETUP_STATE"]
+        objective_terms = list()
+        for scenario in self.simulation_instances:
+            probability = self.scenario_probability[scenario]
+            for product in self.products:
+                for period in self.periods:
+                    objective_terms.append(probability * self.inventory_holding_cost[(product, period)] * x_inv[(scenario, product, period)])
+                    objective_terms.append(probability * self.backorder_cost[(product, period)] * x_bo[(scenario, product, period)])
+                    for machine in self.product_to_line[product]:
+                            objective_terms.append(probability * self.setup_cost[(machine, product, period)] * x_su[(scenario, machine, product, period)])
+            
+        self.model.objective = minimize(xsum(objective_terms))
+
+    def add_scenarios(self, simulation_instance_ids: list, disk_data = None, concurrency = 4, materialized = False):
+        # Append simulation instances to the built model, only the variables and constraints of the new scenarios are added
+        index_sets = self.index_sets()
+        previous_layout = self.solution_layout() if self.model is not None and self.array_model is not None else None
+        new_scenarios = IndexModel.add_scenarios(self, simulation_instance_ids, disk_data, concurrency, materialized)
+        if self.model is None or len(new_scenarios) == 0:
+            return new_scenarios
+        if self.index_sets() != index_sets:
+            # New machines change the variables of all scenarios and the shape of the array layout, the model is built again
+            self.build(**self.build_options)
+        else:
+            self.update_scenarios(new_scenarios, list(), previous_layout)
+
+        # The previous solution is the start of the extended model, the new scenarios start from the constructive plan
+        if len(self.solution) > 0:
+            self.set_start(self.solution, scenarios = new_scenarios)
+        return new_scenarios
+
+    def remove_scenarios(self, simulation_instance_ids: list):
+        # Remove simulation instances from the built model together with their variables and constraints
+        index_sets = self.index_sets()
+        previous_layout = self.solution_layout() if self.model is not None and self.array_model is not None else None
+        removed_scenarios = IndexModel.remove_scenarios(self, simulation_instance_ids)
+        if self.model is None or len(removed_scenarios) == 0:
+            return removed_scenarios
+        if self.index_sets() != index_sets:
+            # Machines that only the removed scenarios have change the variables of all scenarios and the shape of the array layout, the model is built again
+            self.build(**self.build_options)
+        else:
+            self.update_scenarios(list(), removed_scenarios, previous_layout)
+        if len(self.solution) > 0:
+            self.set_start(self.solution, scenarios = list())
+        return removed_scenarios
+
+    def index_sets(self):
+        # Index sets that determine the variables of every scenario, the array layout maps columns by their positions in these sets
+        return sorted(self.products), sorted(self.machines), sorted((machine, product) for product in self.products for machine in self.product_to_line[product]), self.T
+
+    def update_scenarios(self, new_scenarios, removed_scenarios, previous_layout = None):
+        # Bound tightening and presolve are computed per scenario, the values of the other scenarios do not change
+        clock = instrumentation.stages("build", problem_instance_id = self.problem_instance_id, engine = "dict" if self.array_model is None else "vectorized", added_scenarios = len(new_scenarios),
+                                       removed_scenarios = len(removed_scenarios))
+        self.model.start = None
+        self.bound_tightening = BoundTightening(self) if self.build_options["tighten_bounds"] else None
+        self.presolve = ModelReduction(self, linked_lot_size = self.build_options["linked_lot_size"], tightening = self.bound_tightening) if self.build_options["presolve"] else None
+        clock.stage("PRESOLVE")
+
+        if self.array_model is not None:
+            self.update_array_model(new_scenarios, previous_layout, clock)
+        else:
+            self.update_variables(new_scenarios, removed_scenarios, clock)
+        if self.presolve is not None:
+            self.presolve.report(self.model.num_rows, self.model.num_cols)
+        self.cut_generator = None
+        self.model.cuts_generator = None
+        self.add_cut_generator(self.build_options["cuts"])
+        clock.done(model_rows = self.model.num_rows, model_columns = self.model.num_cols, nonzeros = self.model.num_nz)
+
+    def update_array_model(self, new_scenarios, previous_layout, clock = instrumentation.NULL_TIMER):
+        # Model columns are mapped from the previous array layout (also of a cached model) into the layout of the changed scenario set
+        layout, columns = previous_layout
+        self.array_model = ArrayModel(self, reduction = self.presolve, linked_lot_size = self.build_options["linked_lot_size"], tightening = self.bound_tightening)
+        columns = layout.map_columns(columns, self.array_model)
+
+        # Columns of removed scenarios are removed with their rows, scenarios do not share rows
+        removed = np.flatnonzero(columns < 0)
+        if removed.size > 0:
+            variables = [self.model.vars[j] for j in removed.tolist()]
+            constraints = {constr.idx: constr for var in variables for constr in var.column.constrs or list()}
+            self.model.remove(list(constraints.values()))
+            self.model.remove(variables)
+            columns = columns[columns >= 0]
+        clock.stage("REMOVE", removed_columns = int(removed.size))
+
+        # Columns and rows of new scenarios are appended from the array layout of these scenarios
+        if len(new_scenarios) > 0:
+            appended = ArrayModel(self, reduction = self.presolve, linked_lot_size = self.build_options["linked_lot_size"], tightening = self.bound_tightening, scenarios = new_scenarios)
+            appended.load(self.model, use_names = self.build_options["use_names"], clock = clock)
+            columns = np.concatenate([columns, appended.map_columns(appended.layout_columns, self.array_model)])
+        self.array_model.layout_columns = columns
+
+        # Objective weights of all scenarios change with the number of scenarios
+        self.array_model.set_objective(self.model)
+        clock.stage("OBJECTIVE")
+
+    def update_variables(self, new_scenarios, removed_scenarios, clock = instrumentation.NULL_TIMER):
+        # Rows of removed scenarios are found by the columns of their variables, scenarios do not share rows
+        removed_scenarios = set(removed_scenarios)
+        variables = [var for block in self.variables.values() for key, var in block.items() if key[0] in removed_scenarios and isinstance(var, Var)]
+        if len(variables) > 0:
+            removed_variables = {id(var) for var in variables}
+            self.constraints = [constraint for constraint in self.constraints if not any(id(var) in removed_variables for var in constraint.expr)]
+            constraints = {constr.idx: constr for var in variables for constr in var.column.constrs or list()}
+            self.model.remove(list(constraints.values()))
+            self.model.remove(variables)
+        for block in self.variables.values():
+            for key in [key for key in block if key[0] in removed_scenarios]:
+                del block[key]
+        clock.stage("REMOVE", removed_columns = len(variables))
+
+        if len(new_scenarios) > 0:
+            self.build_scenarios(new_scenarios, clock)
+        # Objective weights of all scenarios change with the number of scenarios
+        self.set_objective()
+        clock.stage("OBJECTIVE")
+
+    def add_cut_generator(self, cuts):
+        # (l,S) inequalities are separated in the callback of the solver, the callback model addresses variables by name
+        if not cuts:
+            return
+        if not self.has_names():
+            print("Cut generator skipped, the callback of CBC requires variable names (build with use_names = True)")
+            return
+        self.cut_generator = LSInequalities(self)
+        self.model.cuts_generator = self.cut_generator
+
+    def set_optimization_state(self, status, objective_value, objective_bound, no_solution = "no feasible solution found"):
+        # Objective value, lower bound and state of the solve modes, values of a solve without solution are kept
         if status == OptimizationStatus.OPTIMAL:
-            self.model_lb = self.model.objective_value
-            self.objective_value = self.model.objective_value
-            self.optimzation_state = "optimal solution cost {} found".format(self.model.objective_value)
+            self.model_lb = objective_value
+            self.objective_value = objective_value
+            self.optimzation_state = "optimal solution cost {} found".format(objective_value)
         elif status == OptimizationStatus.FEASIBLE:
-            self.model_lb = self.model.objective_bound
-            self.objective_value = self.model.objective_value
-            self.optimzation_state = "sol.cost {} found, best possible: {}".format(self.model.objective_value, self.model.objective_bound)
+            self.model_lb = objective_bound
+            self.objective_value = objective_value
+            self.optimzation_state = "sol.cost {} found, best possible: {}".format(objective_value, objective_bound)
         elif status == OptimizationStatus.NO_SOLUTION_FOUND:
-            self.optimzation_state = "no feasible solution found, lower bound is: {}".format(self.model.objective_bound)
+            self.optimzation_state = "{}, lower bound is: {}".format(no_solution, objective_bound)
         elif status == OptimizationStatus.INFEASIBLE:
             self.optimzation_state = "model is infeasible. Check constrains."
+
+    def solve(self, max_seconds = 100.0, warm_start = None, progress_log = False):
+        # The warm start is either "constructive" or a stored solution by variable name, e.g. the solution of a related instance or scenario set
+        if warm_start is not None:
+            self.set_start(warm_start)
+        # The progress log of CBC gives the time to the first incumbent, it is only stored on request or with instrumentation since its event handler
+        # crashes CBC intermittently in single-threaded solves
+        progress_log = (progress_log or instrumentation.enabled()) and self.model.threads != 1
+        self.model.store_search_progress_log = progress_log
+        if progress_log:
+            self.model.search_progress_log.log.clear()
+        st = time.time()
+        status = self.model.optimize(max_seconds=max_seconds)
+        solve_time = time.time() - st
+        incumbents = [log_time for log_time, (lb, ub) in self.model.search_progress_log.log if ub < 1e+300] if progress_log else list()
+        self.time_to_first_incumbent = incumbents[0] if len(incumbents) > 0 else None
+        result = dict()
+        self.solution_values = None
+        self.set_optimization_state(status, self.model.objective_value, self.model.objective_bound)
         if status == OptimizationStatus.OPTIMAL or status == OptimizationStatus.FEASIBLE:
-            for v in self.model.vars:
-                result[v.name] = v.x
+            # Values of all columns are read at once from the solution of the solver
+            self.solution_values = column_values(self.model)
+            result = self.read_solution(self.solution_values.tolist())
         
         self.optimzation_status = status
         self.solution = result
+
+        # Lower and upper bounds over time from the progress log of the solver
+        if instrumentation.enabled():
+            for log_time, (lb, ub) in (self.model.search_progress_log.log if progress_log else list()):
+                instrumentation.emit("solver_progress", problem_instance_id = self.problem_instance_id, time = log_time, lower_bound = lb, upper_bound = ub if ub < 1e+300 else None)
+            instrumentation.emit("solve", problem_instance_id = self.problem_instance_id, status = status.name, time = solve_time, max_seconds = max_seconds, objective_value = self.objective_value,
+                                 lower_bound = self.model.objective_bound, time_to_first_incumbent = self.time_to_first_incumbent, rows = self.model.num_rows, columns = self.model.num_cols)
         
-        return status
\ No newline at end of file
+        return status
+
+    def set_start(self, warm_start, scenarios = None):
+        # MIP start from the constructive plan, values of a stored solution replace the plan for all variables it contains
+        # Only the given scenarios are planned if the stored solution covers the other ones
+        self.warm_start = ConstructivePlan(self, big_M = self.bound_tightening.big_M_setup if self.bound_tightening is not None else None, scenarios = scenarios)
+        values = dict(self.warm_start.plan)
+        if isinstance(warm_start, dict):
+            values.update(warm_start)
+        elif warm_start != "constructive":
+            raise ValueError("Unknown warm start {}, pass 'constructive' or a solution by variable name".format(warm_start))
+        if not self.has_names():
+            print("Warm start skipped, the MIP start of CBC requires variable names (build with use_names = True)")
+            return
+        self.model.start = [(v, values[v.name]) for v in self.model.vars if v.var_type != CONTINUOUS and v.name in values]
+
+    def column_name(self, idx):
+        # Variable name of a model column
+        if self.array_model is not None:
+            return self.array_model.column_name(idx)
+        return self.model.vars[idx].name
+
+    def has_names(self):
+        # MIP starts and cuts address columns by variable name, models built without names or read from the model cache without names can not be addressed
+        return self.model.num_cols == 0 or self.model.vars[0].name == self.column_name(0)
+
+    def read_solution(self, values):
+        # Solution by variable name from the values of all model columns
+        result = dict()
+        if self.array_model is not None:
+            # Resolve variable names lazily from the array layout
+            for v, value in zip(self.model.vars, values):
+                result[self.array_model.column_name(v.idx)] = value
+        else:
+            for v, value in zip(self.model.vars, values):
+                result[v.name] = value
+        if self.presolve is not None:
+            result = self.presolve.postsolve(result)
+        return result
+
+    def solution_layout(self):
+        # Array layout of the MLCLSP-L-B with the layout column of every model column (-1 for columns outside the layout)
+        if isinstance(self.array_model, ArrayModel):
+            return self.array_model, self.array_model.layout_columns
+        layout = ArrayModel(self, reduction = self.presolve, linked_lot_size = self.build_options["linked_lot_size"])
+        if self.array_model is not None:
+            # Layout columns of a cached model are stored in the model cache
+            return layout, self.array_model.layout_columns
+
+        # Layout columns of the variables of a built model, fixed variables are numbers instead of columns
+        columns = np.full(self.model.num_cols, -1, dtype = np.int64)
+        for block, variables in self.variables.items():
+            keys = [key for key, var in variables.items() if isinstance(var, Var)]
+            if len(keys) == 0:
+                continue
+            idx = np.array([variables[key].idx for key in keys], dtype = np.int64)
+            s = np.array([layout.scenario_idx[key[0]] for key in keys], dtype = np.int64)
+            if block in ["INVENTORY_ON_HAND", "BACKORDER_QUANTITY"]:
+                columns[idx] = layout.col(block, s, [layout.product_idx[key[1]] for key in keys], [key[2] for key in keys])
+            elif block == "MACHINE_OCCUPIED":
+                columns[idx] = layout.col(block, s, layout.shared_machine_pos[[layout.machine_idx[key[1]] for key in keys]], [key[2] - 1 for key in keys])
+            else:
+                # Initial linked lot sizes exist for all machines, the other variables for lines only
+                m, p, t = np.array([layout.machine_idx[key[1]] for key in keys]), np.array([layout.product_idx[key[2]] for key in keys]), np.array([key[3] for key in keys])
+                initial = t == 0
+                columns[idx[initial]] = layout.col("LINKED_LOT_SIZE_0", s[initial], m[initial], p[initial])
+                lines = np.array([layout.line_idx.get(line, -1) for line in zip(m[~initial].tolist(), p[~initial].tolist())], dtype = np.int64)
+                columns[idx[~initial]] = layout.col(block, s[~initial], lines, t[~initial] - 1)
+        return layout, columns
+
+    def lot_sizing_result(self):
+        # Expected KPIs per material and plan per scenario of the last solution (see lib/lot_sizing_result.py)
+        return LotSizingResult(self)
+
+    def integer_variables(self):
+        # Binary and integer variables of the built model as (variable, product, period) triples
+        if self.array_model is not None:
+            columns, products, periods = self.array_model.integer_columns()
+            return [(self.model.vars[j], self.array_model.products[p], t) for j, p, t in zip(columns.tolist(), products.tolist(), periods.tolist())]
+        return [(var, key[-2], key[-1]) for variables in self.variables.values() for key, var in variables.items() if isinstance(var, Var) and var.var_type != CONTINUOUS]
+
+    def solve_heuristic(self, max_seconds = 100.0, window = 2, step = None, partition = "period", improve = True, mip_gap = 0.01):
+        # Relax-and-fix over windows of periods or products followed by fix-and-optimize passes on the built model
+        self.heuristic = FixAndOptimize(self, window = window, step = step, partition = partition, mip_gap = mip_gap)
+        status = self.heuristic.solve(max_seconds = max_seconds, improve = improve)
+        self.set_optimization_state(status, self.heuristic.objective_value, self.heuristic.objective_bound, no_solution = "no feasible solution found by the heuristic")
+        self.optimzation_status = status
+        self.solution_values = np.array(self.heuristic.values, dtype = float) if status == OptimizationStatus.OPTIMAL or status == OptimizationStatus.FEASIBLE else None
+        self.solution = self.read_solution(self.heuristic.values) if self.solution_values is not None else dict()
+
+        return status
+
+    def solve_decomposition(self, max_seconds = 100.0, processes = None, **build_options):
+        # Solve every scenario as an independent subproblem in a process pool, the build options are passed to each subproblem
+        self.decomposition = ScenarioDecomposition(self, processes)
+        status = self.decomposition.solve(max_seconds = max_seconds, build_options = build_options)
+        self.set_optimization_state(status, self.decomposition.objective_value, self.decomposition.objective_bound,
+                                    no_solution = "no feasible solution found for scenarios {}".format(self.decomposition.unsolved))
+        self.optimzation_status = status
+        # Subproblem solutions are only available by variable name
+        self.solution_values = None
+        self.solution = self.decomposition.solution if status == OptimizationStatus.OPTIMAL or status == OptimizationStatus.FEASIBLE else dict()
+
+        return status
@@ -0,0 +1,540 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from mip import LinExpr, BINARY, CONTINUOUS, INTEGER, CBC, EPS
+from lib.instrumentation import NULL_TIMER
+
+# Variable blocks of the MLCLSP-L-B in column order
+VARIABLE_BLOCKS = ["INVENTORY_ON_HAND", "BACKORDER_QUANTITY", "LINKED_LOT_SIZE_0", "PRODUCTION_QUANTITY", "TOTAL_SETUP", "SETUP_STATE", "LINKED_LOT_SIZE"]
+# Additional variable block of the aggregated linked lot-size formulation
+AGGREGATED_BLOCKS = ["MACHINE_OCCUPIED"]
+
+# Define array layout of the MLCLSP-L-B
+class ArrayModel:
+    def __init__(self, index_model, reduction = None, linked_lot_size = "pairwise", tightening = None, scenarios = None):
+        self.reduction = reduction
+        self.linked_lot_size = linked_lot_size
+
+        # Integer encoding of all index sets, the layout covers a subset of the scenarios for scenarios that are appended to a built model
+        self.scenarios = sorted(scenarios if scenarios is not None else index_model.simulation_instances)
+        self.products = sorted(index_model.products)
+        self.machines = sorted(index_model.machines)
+        self.periods = list(range(1, index_model.T + 1))
+
+        self.scenario_idx = {scenario: i for i, scenario in enumerate(self.scenarios)}
+        self.product_idx = {product: i for i, product in enumerate(self.products)}
+        self.machine_idx = {machine: i for i, machine in enumerate(self.machines)}
+
+        self.S = len(self.scenarios)
+        self.probability = np.array([index_model.scenario_probability[scenario] for scenario in self.scenarios], dtype = float)
+        self.P = len(self.products)
+        self.M = len(self.machines)
+        self.T = index_model.T
+
+        # Product-to-line allocations (lines) as pairs of machine and product indices
+        self.lines = sorted((self.machine_idx[machine], self.product_idx[product]) for product in self.products for machine in index_model.product_to_line[product])
+        self.L = len(self.lines)
+        self.line_machine = np.array([line[0] for line in self.lines], dtype = np.int64)
+        self.line_product = np.array([line[1] for line in self.lines], dtype = np.int64)
+        self.line_idx = {line: i for i, line in enumerate(self.lines)}
+
+        # Machines with more than one product, only these require linked lot-size synchronizations
+        lines_per_machine = np.bincount(self.line_machine, minlength = self.M)
+        self.shared_machines = np.flatnonzero(lines_per_machine > 1)
+        self.shared_machine_pos = np.full(self.M, -1, dtype = np.int64)
+        self.shared_machine_pos[self.shared_machines] = np.arange(self.shared_machines.size)
+
+        # Contiguous column blocks, (S, P, T + 1) for inventory and backorders, (S, M, P) for initial linked lot sizes and (S, L, T) otherwise
+        self.block_shape = {
+            "INVENTORY_ON_HAND": (self.S, self.P, self.T + 1),
+            "BACKORDER_QUANTITY": (self.S, self.P, self.T + 1),
+            "LINKED_LOT_SIZE_0": (self.S, self.M, self.P),
+            "PRODUCTION_QUANTITY": (self.S, self.L, self.T),
+            "TOTAL_SETUP": (self.S, self.L, self.T),
+            "SETUP_STATE": (self.S, self.L, self.T),
+            "LINKED_LOT_SIZE": (self.S, self.L, self.T),
+            "MACHINE_OCCUPIED": (self.S, self.shared_machines.size, self.T)
+        }
+        self.blocks = VARIABLE_BLOCKS + AGGREGATED_BLOCKS if linked_lot_size == "aggregated" else VARIABLE_BLOCKS
+        self.block_start = dict()
+        n = 0
+        for block in self.blocks:
+            self.block_start[block] = n
+            n += int(np.prod(self.block_shape[block]))
+        self.n_cols = n
+
+        # Coefficient arrays
+        self.load_coefficients(index_model)
+
+        # Tightened bounds replace big-M, setups and linked lot sizes have separate coefficients (index sets are sorted in both)
+        self.big_M_setup = self.big_M
+        if tightening is not None:
+            position = {scenario: i for i, scenario in enumerate(tightening.scenarios)}
+            s = [position[scenario] for scenario in self.scenarios]
+            self.big_M_setup = tightening.big_M_setup.values[s]
+            self.big_M = tightening.big_M_linked.values[s]
+
+    def load_coefficients(self, index_model):
+        if index_model.compact:
+            self.load_coefficient_arrays(index_model)
+            return
+        S, P, T, L = self.S, self.P, self.T, self.L
+        periods = self.periods
+
+        self.inventory_holding_cost = np.array([[index_model.inventory_holding_cost[(product, period)] for period in periods] for product in self.products], dtype = float).reshape(P, T)
+        self.backorder_cost = np.array([[index_model.backorder_cost[(product, period)] for period in periods] for product in self.products], dtype = float).reshape(P, T)
+        self.demand = np.array([[[index_model.demand[scenario][(product, period)] for period in periods] for product in self.products] for scenario in self.scenarios], dtype = float).reshape(S, P, T)
+        self.capacity = np.array([[[index_model.capacity[scenario][(machine, period)] for period in periods] for machine in self.machines] for scenario in self.scenarios], dtype = float).reshape(S, self.M, T)
+
+        lines = [(self.machines[m], self.products[p]) for m, p in self.lines]
+        self.setup_cost = np.array([[index_model.setup_cost[(machine, product, period)] for period in periods] for machine, product in lines], dtype = float).reshape(L, T)
+        self.setup_time = np.array([[index_model.setup_time[(machine, product, period)] for period in periods] for machine, product in lines], dtype = float).reshape(L, T)
+        self.production_time = np.array([[index_model.production_time[(machine, product, period)] for period in periods] for machine, product in lines], dtype = float).reshape(L, T)
+        self.lead_time = np.rint(np.array([[index_model.lead_time[(machine, product, period)] for period in periods] for machine, product in lines], dtype = float).reshape(L, T)).astype(np.int64)
+        self.big_M = np.array([[[index_model.big_M[scenario][(machine, product, period)] for period in periods] for machine, product in lines] for scenario in self.scenarios], dtype = float).reshape(S, L, T)
+
+        self.is_integer = np.array([index_model.material_uom[product] == INTEGER for product in self.products], dtype = bool)
+
+        # Initial values as (scenario, index, value) triples
+        self.init_inventory = [(self.scenario_idx[scenario], self.product_idx[product], value) for scenario, values in index_model.init_inventory.items() if scenario in self.scenario_idx
+                               for product, value in values.items()]
+        self.init_backorder = [(self.scenario_idx[scenario], self.product_idx[product], value) for scenario, values in index_model.init_backorder.items() if scenario in self.scenario_idx
+                               for product, value in values.items()]
+        self.init_linked_lot_size = [(self.scenario_idx[scenario], self.machine_idx[key[0]], self.product_idx[key[1]], value) for scenario, values in index_model.init_linked_lot_size.items()
+                                     if scenario in self.scenario_idx for key, value in values.items()]
+
+    def load_coefficient_arrays(self, index_model):
+        # Select the coefficient arrays of a compact index model in the order of the array layout, index sets are sorted in both
+        scenario_pos = {scenario: i for i, scenario in enumerate(index_model.scenario_axis)}
+        period_pos = {period: i for i, period in enumerate(index_model.period_axis)}
+        line_pos = {line: i for i, line in enumerate(index_model.line_axis)}
+        s = [scenario_pos[scenario] for scenario in self.scenarios]
+        t = [period_pos[period] for period in self.periods]
+        lines = [line_pos[(self.machines[m], self.products[p])] for m, p in self.lines]
+
+        self.inventory_holding_cost = dense(index_model.inventory_holding_cost.values[:, t])
+        self.backorder_cost = dense(index_model.backorder_cost.values[:, t])
+        self.demand = dense(index_model.demand.scenario_values()[s][:, :, t])
+        self.capacity = dense(index_model.capacity.scenario_values()[s][:, :, t])
+
+        self.setup_cost = dense(index_model.setup_cost.values[lines][:, t])
+        self.setup_time = dense(index_model.setup_time.values[lines][:, t])
+        self.production_time = dense(index_model.production_time.values[lines][:, t])
+        self.lead_time = np.rint(dense(index_model.lead_time.values[lines][:, t])).astype(np.int64)
+        self.big_M = dense(index_model.big_M.scenario_values()[s][:, lines][:, :, t])
+
+        self.is_integer = np.array([index_model.material_uom[product] == INTEGER for product in self.products], dtype = bool)
+
+        # Initial values as (scenario, index, value) triples
+        init_inventory, init_backorder, init_linked_lot_size = (x.scenario_values()[s] for x in [index_model.init_inventory, index_model.init_backorder, index_model.init_linked_lot_size])
+        s, p = np.nonzero(~np.isnan(init_inventory))
+        self.init_inventory = list(zip(s.tolist(), p.tolist(), init_inventory[s, p].tolist()))
+        s, p = np.nonzero(~np.isnan(init_backorder))
+        self.init_backorder = list(zip(s.tolist(), p.tolist(), init_backorder[s, p].tolist()))
+        s, l = np.nonzero(~np.isnan(init_linked_lot_size))
+        line_machine = np.array([self.machine_idx[machine] for machine, product in index_model.line_axis], dtype = np.int64)
+        line_product = np.array([self.product_idx[product] for machine, product in index_model.line_axis], dtype = np.int64)
+        self.init_linked_lot_size = list(zip(s.tolist(), line_machine[l].tolist(), line_product[l].tolist(), init_linked_lot_size[s, l].tolist()))
+
+    # %% Column indices
+    def col(self, block, *idx):
+        return self.block_start[block] + np.ravel_multi_index(tuple(np.asarray(i) for i in idx), self.block_shape[block])
+
+    def col_linked_lot_size(self, s, l, t):
+        # Linked lot size of a line in period t (t = 0 refers to the initial linked lot size)
+        s, l, t = np.broadcast_arrays(np.asarray(s), np.asarray(l), np.asarray(t))
+        initial = self.col("LINKED_LOT_SIZE_0", s, self.line_machine[l], self.line_product[l])
+        return np.where(t == 0, initial, self.col("LINKED_LOT_SIZE", s, l, np.maximum(t - 1, 0)))
+
+    def var_name(self, idx):
+        for block in reversed(self.blocks):
+            if idx >= self.block_start[block]:
+                break
+        i = np.unravel_index(idx - self.block_start[block], self.block_shape[block])
+        scenario = self.scenarios[i[0]]
+        if block in ["INVENTORY_ON_HAND", "BACKORDER_QUANTITY"]:
+            return "{}_{}_{}_{}".format(block, scenario, self.products[i[1]], i[2])
+        if block == "LINKED_LOT_SIZE_0":
+            return "LINKED_LOT_SIZE_{}_{}_{}_0".format(scenario, self.machines[i[1]], self.products[i[2]])
+        if block == "MACHINE_OCCUPIED":
+            return "MACHINE_OCCUPIED_{}_{}_{}".format(scenario, self.machines[self.shared_machines[i[1]]], i[2] + 1)
+        machine, product = self.lines[i[1]]
+        return "{}_{}_{}_{}_{}".format(block, scenario, self.machines[machine], self.products[product], i[2] + 1)
+
+    # %% Columns
+    def columns(self):
+        # Variable types
+        var_type = np.empty(self.n_cols, dtype = object)
+        product_type = np.where(self.is_integer, INTEGER, CONTINUOUS)
+        for block in ["INVENTORY_ON_HAND", "BACKORDER_QUANTITY"]:
+            var_type[self.block_start[block]:self.block_start[block] + self.S * self.P * (self.T + 1)] = np.broadcast_to(product_type[None, :, None], self.block_shape[block]).ravel()
+        var_type[self.block_start["LINKED_LOT_SIZE_0"]:self.block_start["PRODUCTION_QUANTITY"]] = BINARY
+        var_type[self.block_start["PRODUCTION_QUANTITY"]:self.block_start["TOTAL_SETUP"]] = np.broadcast_to(product_type[self.line_product][None, :, None], self.block_shape["PRODUCTION_QUANTITY"]).ravel()
+        var_type[self.block_start["TOTAL_SETUP"]:] = BINARY
+        ub = np.where(var_type == BINARY, 1.0, np.inf)
+        if self.linked_lot_size == "aggregated":
+            # Machine occupation states are continuous within [0, 1]
+            var_type[self.block_start["MACHINE_OCCUPIED"]:] = CONTINUOUS
+
+        # Objective coefficients weighted by the scenario probabilities
+        obj = np.zeros(self.n_cols)
+        s, p, t = np.meshgrid(np.arange(self.S), np.arange(self.P), np.arange(1, self.T + 1), indexing = "ij")
+        obj[self.col("INVENTORY_ON_HAND", s, p, t).ravel()] = (self.probability[:, None, None] * self.inventory_holding_cost[None, :, :]).ravel()
+        obj[self.col("BACKORDER_QUANTITY", s, p, t).ravel()] = (self.probability[:, None, None] * self.backorder_cost[None, :, :]).ravel()
+        start = self.block_start["SETUP_STATE"]
+        obj[start:start + self.S * self.L * self.T] = (self.probability[:, None, None] * self.setup_cost[None, :, :]).ravel()
+
+        return var_type, obj, ub
+
+    # %% Rows in batch, each family is returned as (row, col, coefficient, sense, rhs) arrays
+    def rows_initial_values(self):
+        rows = list()
+        if len(self.init_inventory) > 0:
+            s, p, value = (np.array(x) for x in zip(*self.init_inventory))
+            rows.append(self.single_entry_rows(self.col("INVENTORY_ON_HAND", s, p, 0), "=", value))
+            rows.append(self.single_entry_rows(self.col("INVENTORY_ON_HAND", s, p, self.T), "=", 0))
+        if len(self.init_backorder) > 0:
+            s, p, value = (np.array(x) for x in zip(*self.init_backorder))
+            rows.append(self.single_entry_rows(self.col("BACKORDER_QUANTITY", s, p, 0), "=", value))
+            rows.append(self.single_entry_rows(self.col("BACKORDER_QUANTITY", s, p, self.T), "=", 0))
+        if len(self.init_linked_lot_size) > 0:
+            s, m, p, value = (np.array(x) for x in zip(*self.init_linked_lot_size))
+            rows.append(self.single_entry_rows(self.col("LINKED_LOT_SIZE_0", s, m, p), "=", value))
+        return rows
+
+    def rows_lead_time(self):
+        # Production quantities equal zero if t + lead time > T, every column is fixed once. The dictionary build does not support positive lead times,
+        # so both engines are only compared for instances without lead times (see check_build_engines.py)
+        max_lead_time = self.lead_time.max(axis = 1) if self.T > 0 else np.zeros(self.L, dtype = np.int64)
+        l, t = np.nonzero((max_lead_time[:, None] > 0) & (np.arange(1, self.T + 1)[None, :] >= self.T + 1 - max_lead_time[:, None]))
+        s = np.repeat(np.arange(self.S), len(l))
+        l, t = np.tile(l, self.S), np.tile(t, self.S)
+        return [self.single_entry_rows(self.col("PRODUCTION_QUANTITY", s, l, t), "=", 0)]
+
+    def rows_material_balance(self):
+        # x_inv[t - 1] + x_bo[t] + sum_m x_p[t + lead time] - x_inv[t] - x_bo[t - 1] = demand[t]
+        S, P, T = self.S, self.P, self.T
+        row = np.arange(S * P * T).reshape(S, P, T)
+        s, p, t = np.meshgrid(np.arange(S), np.arange(P), np.arange(1, T + 1), indexing = "ij")
+        entries = [
+            (row, self.col("INVENTORY_ON_HAND", s, p, t - 1), 1.0),
+            (row, self.col("BACKORDER_QUANTITY", s, p, t), 1.0),
+            (row, self.col("INVENTORY_ON_HAND", s, p, t), -1.0),
+            (row, self.col("BACKORDER_QUANTITY", s, p, t - 1), -1.0)
+        ]
+
+        # Production quantities of all lines of a product shifted by its lead time
+        s, l, t = np.meshgrid(np.arange(S), np.arange(self.L), np.arange(T), indexing = "ij")
+        t_shift = t + self.lead_time[None, :, :]
+        valid = t_shift < T
+        entries.append((row[s, self.line_product[l], t][valid], self.col("PRODUCTION_QUANTITY", s[valid], l[valid], t_shift[valid]), 1.0))
+
+        return [self.merge_entries(entries, np.full(S * P * T, "="), self.demand.ravel())]
+
+    def rows_capacity(self):
+        # sum_p production_time * x_p + setup_time * x_su <= capacity
+        S, T = self.S, self.T
+        row = np.arange(S * self.M * T).reshape(S, self.M, T)
+        s, l, t = np.meshgrid(np.arange(S), np.arange(self.L), np.arange(T), indexing = "ij")
+        r = row[s, self.line_machine[l], t]
+        entries = [
+            (r, self.col("PRODUCTION_QUANTITY", s, l, t), np.broadcast_to(self.production_time[None, :, :], s.shape)),
+            (r, self.col("SETUP_STATE", s, l, t), np.broadcast_to(self.setup_time[None, :, :], s.shape))
+        ]
+        return [self.merge_entries(entries, np.full(S * self.M * T, "<"), self.capacity.ravel())]
+
+    def rows_big_M(self):
+        # x_p - big_M_setup * x_su - big_M * x_l[t - 1] <= 0 and x_tsu - x_su - x_l[t - 1] = 0
+        S, L, T = self.S, self.L, self.T
+        n = S * L * T
+        row = np.arange(n).reshape(S, L, T)
+        s, l, t = np.meshgrid(np.arange(S), np.arange(L), np.arange(T), indexing = "ij")
+        x_su = self.col("SETUP_STATE", s, l, t)
+        x_l_prev = self.col_linked_lot_size(s, l, t)
+        big_M = [
+            (row, self.col("PRODUCTION_QUANTITY", s, l, t), 1.0),
+            (row, x_su, -self.big_M_setup),
+            (row, x_l_prev, -self.big_M)
+        ]
+        total_setup = [
+            (row, self.col("TOTAL_SETUP", s, l, t), 1.0),
+            (row, x_su, -1.0),
+            (row, x_l_prev, -1.0)
+        ]
+        if self.reduction is not None:
+            # Total setup states are substituted by their definition
+            return [self.merge_entries(big_M, np.full(n, "<"), np.zeros(n))]
+        return [self.merge_entries(big_M, np.full(n, "<"), np.zeros(n)), self.merge_entries(total_setup, np.full(n, "="), np.zeros(n))]
+
+    def rows_linked_lot_size(self, pairwise = True):
+        S, L, T = self.S, self.L, self.T
+        rows = list()
+
+        # At most one linked lot size per machine and period
+        n = S * self.M * T
+        row = np.arange(n).reshape(S, self.M, T)
+        s, l, t = np.meshgrid(np.arange(S), np.arange(L), np.arange(T), indexing = "ij")
+        rows.append(self.merge_entries([(row[s, self.line_machine[l], t], self.col("LINKED_LOT_SIZE", s, l, t), 1.0)], np.full(n, "<"), np.ones(n)))
+
+        # x_l[t] - x_su[t] - x_l[t - 1] <= 0
+        n = S * L * T
+        row = np.arange(n).reshape(S, L, T)
+        entries = [
+            (row, self.col("LINKED_LOT_SIZE", s, l, t), 1.0),
+            (row, self.col("SETUP_STATE", s, l, t), -1.0),
+            (row, self.col_linked_lot_size(s, l, t), -1.0)
+        ]
+        rows.append(self.merge_entries(entries, np.full(n, "<"), np.zeros(n)))
+
+        # x_l[p, t] + x_l[p, t - 1] - x_su[p, t] + x_su[p2, t] <= 2 for all products p != p2 on the same machine
+        pairs = [(l1, l2) for l1 in range(L) for l2 in range(L) if l1 != l2 and self.line_machine[l1] == self.line_machine[l2]] if pairwise else list()
+        if len(pairs) > 0:
+            l1, l2 = (np.array(x, dtype = np.int64) for x in zip(*pairs))
+            s, k, t = np.meshgrid(np.arange(S), np.arange(len(pairs)), np.arange(T), indexing = "ij")
+            n = s.size
+            row = np.arange(n).reshape(s.shape)
+            entries = [
+                (row, self.col("LINKED_LOT_SIZE", s, l1[k], t), 1.0),
+                (row, self.col_linked_lot_size(s, l1[k], t), 1.0),
+                (row, self.col("SETUP_STATE", s, l1[k], t), -1.0),
+                (row, self.col("SETUP_STATE", s, l2[k], t), 1.0)
+            ]
+            rows.append(self.merge_entries(entries, np.full(n, "<"), np.full(n, 2.0)))
+        return rows
+
+    def rows_linked_lot_size_aggregated(self):
+        # At most one linked lot size per machine and period and x_l[t] - x_su[t] - x_l[t - 1] <= 0
+        S, T = self.S, self.T
+        rows = self.rows_linked_lot_size(pairwise = False)
+
+        # x_l[p, t] + x_l[p, t - 1] - x_su[p, t] - x_occ[t] <= 1 and x_occ[t] + x_su[p, t] <= 1 for all products p on a machine with more than one product
+        shared = np.flatnonzero(self.shared_machine_pos[self.line_machine] >= 0)
+        if shared.size > 0:
+            s, k, t = np.meshgrid(np.arange(S), np.arange(shared.size), np.arange(T), indexing = "ij")
+            l = shared[k]
+            x_occ = self.col("MACHINE_OCCUPIED", s, self.shared_machine_pos[self.line_machine[l]], t)
+            n = s.size
+            row = np.arange(n).reshape(s.shape)
+            entries = [
+                (row, self.col("LINKED_LOT_SIZE", s, l, t), 1.0),
+                (row, self.col_linked_lot_size(s, l, t), 1.0),
+                (row, self.col("SETUP_STATE", s, l, t), -1.0),
+                (row, x_occ, -1.0)
+            ]
+            rows.append(self.merge_entries(entries, np.full(n, "<"), np.ones(n)))
+            rows.append(self.merge_entries([(row, x_occ, 1.0), (row, self.col("SETUP_STATE", s, l, t), 1.0)], np.full(n, "<"), np.ones(n)))
+        return rows
+
+    def row_families(self):
+        # Constraint families with their names in row order
+        rows_linked_lot_size = self.rows_linked_lot_size_aggregated if self.linked_lot_size == "aggregated" else self.rows_linked_lot_size
+        families = [("MATERIAL_BALANCE", self.rows_material_balance), ("CAPACITY", self.rows_capacity), ("BIG_M", self.rows_big_M), ("LINKED_LOT_SIZE", rows_linked_lot_size)]
+        if self.reduction is not None:
+            # Initial values and lead times are fixed in the columns
+            return families
+        return [("INITIAL_VALUES", self.rows_initial_values), ("LEAD_TIME", self.rows_lead_time)] + families
+
+    def rows(self):
+        return [rows for name, family in self.row_families() for rows in family()]
+
+    # %% Model reduction
+    def fixed_columns(self):
+        # Values of fixed columns, NaN for free columns
+        fixed = np.full(self.n_cols, np.nan)
+        reduction = self.reduction
+        for block, values in [("INVENTORY_ON_HAND", reduction.fixed_inventory), ("BACKORDER_QUANTITY", reduction.fixed_backorder)]:
+            for (scenario, product, period), value in values.items():
+                if scenario not in self.scenario_idx:
+                    continue
+                fixed[self.col(block, self.scenario_idx[scenario], self.product_idx[product], period)] = value
+
+        # Initial linked lot sizes of products that are not allocated on a machine are never used
+        allocated = np.zeros((self.M, self.P), dtype = bool)
+        allocated[self.line_machine, self.line_product] = True
+        s, m, p = np.nonzero(np.broadcast_to(~allocated[None, :, :], self.block_shape["LINKED_LOT_SIZE_0"]))
+        fixed[self.col("LINKED_LOT_SIZE_0", s, m, p)] = 0
+        for (scenario, machine, product, period), value in reduction.fixed_linked_lot_size.items():
+            if scenario not in self.scenario_idx:
+                continue
+            fixed[self.col("LINKED_LOT_SIZE_0", self.scenario_idx[scenario], self.machine_idx[machine], self.product_idx[product])] = value
+
+        for (scenario, machine, product, period) in reduction.fixed_production:
+            if scenario not in self.scenario_idx:
+                continue
+            fixed[self.col("PRODUCTION_QUANTITY", self.scenario_idx[scenario], self.line_idx[(self.machine_idx[machine], self.product_idx[product])], period - 1)] = 0
+
+        # Total setup states are substituted by their definition
+        start = self.block_start["TOTAL_SETUP"]
+        fixed[start:start + self.S * self.L * self.T] = 0
+        return fixed
+
+    def reduce(self, row, col, val, sense, rhs, ub, obj):
+        fixed = self.fixed_columns()
+        is_fixed = ~np.isnan(fixed)
+
+        # Move fixed columns to the right-hand side and the objective constant
+        entry_fixed = is_fixed[col]
+        np.subtract.at(rhs, row[entry_fixed], val[entry_fixed] * fixed[col[entry_fixed]])
+        self.objective_const = float(np.sum(obj[is_fixed] * fixed[is_fixed]))
+        keep = ~entry_fixed & (np.abs(val) > EPS)
+        row, col, val = row[keep], col[keep], val[keep]
+
+        # Skip rows that are satisfied for all values within the variable bounds
+        with np.errstate(invalid = "ignore"):
+            activity_min = np.bincount(row, weights = np.where(val > 0, 0.0, val * ub[col]), minlength = len(sense))
+            activity_max = np.bincount(row, weights = np.where(val > 0, val * ub[col], 0.0), minlength = len(sense))
+        sense = np.asarray(sense)
+        redundant = np.where(sense == "<", activity_max <= rhs + EPS, np.where(sense == ">", activity_min >= rhs - EPS, (np.abs(activity_min - rhs) <= EPS) & (np.abs(activity_max - rhs) <= EPS)))
+        keep_rows = np.flatnonzero(~redundant)
+        row_map = np.full(len(sense), -1, dtype = np.int64)
+        row_map[keep_rows] = np.arange(keep_rows.size)
+        keep = row_map[row] >= 0
+
+        # Compact the remaining columns
+        self.columns_kept = np.flatnonzero(~is_fixed)
+        col_map = np.full(self.n_cols, -1, dtype = np.int64)
+        col_map[self.columns_kept] = np.arange(self.columns_kept.size)
+        return row_map[row[keep]], col_map[col[keep]], val[keep], sense[keep_rows].tolist(), rhs[keep_rows].tolist()
+
+    # %% Helper functions
+    def single_entry_rows(self, cols, sense, rhs):
+        cols = np.asarray(cols, dtype = np.int64).ravel()
+        n = cols.size
+        return (np.arange(n), cols, np.ones(n), np.full(n, sense), np.broadcast_to(np.asarray(rhs, dtype = float), (n,)).copy())
+
+    def merge_entries(self, entries, sense, rhs):
+        row = np.concatenate([np.broadcast_to(np.asarray(e[0]), np.shape(e[1])).ravel() for e in entries])
+        col = np.concatenate([np.asarray(e[1]).ravel() for e in entries])
+        val = np.concatenate([np.broadcast_to(np.asarray(e[2], dtype = float), np.shape(e[1])).ravel() for e in entries])
+        return (row, col, val, sense, rhs)
+
+    def column_name(self, idx):
+        # Variable name of a model column
+        return self.var_name(int(self.layout_columns[idx]))
+
+    def integer_columns(self):
+        # Model columns of all binary and integer variables with their product index and period (t = 0 for initial values)
+        columns = self.layout_columns
+        var_type = self.columns()[0]
+        model_columns, products, periods = list(), list(), list()
+        for block in ["INVENTORY_ON_HAND", "BACKORDER_QUANTITY", "LINKED_LOT_SIZE_0", "PRODUCTION_QUANTITY", "TOTAL_SETUP", "SETUP_STATE", "LINKED_LOT_SIZE"]:
+            start = self.block_start[block]
+            j = np.flatnonzero((columns >= start) & (columns < start + int(np.prod(self.block_shape[block]))) & (var_type[columns] != CONTINUOUS))
+            i = np.unravel_index(columns[j] - start, self.block_shape[block])
+            model_columns.append(j)
+            if block in ["INVENTORY_ON_HAND", "BACKORDER_QUANTITY"]:
+                products.append(i[1])
+                periods.append(i[2])
+            elif block == "LINKED_LOT_SIZE_0":
+                products.append(i[2])
+                periods.append(np.zeros(j.size, dtype = np.int64))
+            else:
+                products.append(self.line_product[i[1]])
+                periods.append(i[2] + 1)
+        return np.concatenate(model_columns), np.concatenate(products), np.concatenate(periods)
+
+    def map_columns(self, columns, layout):
+        # Columns of this layout in a layout of the same instance with other scenarios, -1 for columns of scenarios outside that layout
+        # Both layouts have to share the machines, products, lines and periods, only the scenario position of a column is mapped
+        scenario = np.array([layout.scenario_idx.get(scenario, -1) for scenario in self.scenarios], dtype = np.int64)
+        columns = np.asarray(columns, dtype = np.int64)
+        mapped = np.full(columns.size, -1, dtype = np.int64)
+        for block in self.blocks:
+            start = self.block_start[block]
+            j = np.flatnonzero((columns >= start) & (columns < start + int(np.prod(self.block_shape[block]))))
+            i = np.unravel_index(columns[j] - start, self.block_shape[block])
+            s = scenario[i[0]]
+            inside = s >= 0
+            mapped[j[inside]] = layout.col(block, s[inside], *(x[inside] for x in i[1:]))
+        return mapped
+
+    def set_objective(self, model):
+        # Objective coefficients of all model columns, e.g. after the scenario probabilities changed
+        var_type, obj, ub = self.columns()
+        if model.solver_name.upper() == CBC:
+            from mip.cbc import cbclib
+            for j, value in enumerate(obj[self.layout_columns].tolist()):
+                cbclib.Cbc_setObjCoeff(model.solver._model, j, value)
+        else:
+            for var, value in zip(model.vars, obj[self.layout_columns].tolist()):
+                var.obj = value
+        if self.reduction is not None:
+            fixed = self.fixed_columns()
+            is_fixed = ~np.isnan(fixed)
+            self.objective_const = float(np.sum(obj[is_fixed] * fixed[is_fixed]))
+            model.objective_const = self.objective_const
+
+    def load(self, model, use_names = True, clock = NULL_TIMER):
+        # Columns and rows are appended to the columns and rows of the model
+        first_column, first_row = model.num_cols, model.num_rows
+        var_type, obj, ub = self.columns()
+        clock.stage("COLUMNS")
+
+        # Stack all row families into one sparse matrix
+        row, col, val, sense, rhs = list(), list(), list(), list(), list()
+        n_rows = 0
+        for name, family in self.row_families():
+            nonzeros = 0
+            for rows in family():
+                row.append(rows[0] + n_rows)
+                col.append(rows[1])
+                val.append(rows[2])
+                sense.append(rows[3])
+                rhs.append(rows[4])
+                n_rows += len(rows[3])
+                nonzeros += len(rows[2])
+            clock.stage(name, rows = n_rows, nonzeros = nonzeros)
+        row, col, val = np.concatenate(row), np.concatenate(col), np.concatenate(val)
+        sense, rhs = np.concatenate(sense), np.concatenate(rhs).astype(float)
+
+        # Sum up duplicate entries
+        key, inverse = np.unique(row * self.n_cols + col, return_inverse = True)
+        val = np.bincount(inverse, weights = val, minlength = key.size)
+        row, col = key // self.n_cols, key % self.n_cols
+
+        if self.reduction is not None:
+            row, col, val, sense, rhs = self.reduce(row, col, val, sense, rhs, ub, obj)
+            n_rows = len(sense)
+            self.layout_columns = self.columns_kept
+            clock.stage("REDUCTION", rows = n_rows)
+        else:
+            sense, rhs = sense.tolist(), rhs.tolist()
+            self.layout_columns = np.arange(self.n_cols)
+        columns = self.layout_columns.tolist()
+
+        # Add all columns with their objective coefficients
+        for idx in columns:
+            model.solver.add_var(obj[idx], 0.0, ub[idx], var_type[idx], None, self.var_name(idx) if use_names else "")
+        model.vars.update_vars(first_column + len(columns))
+        if self.reduction is not None:
+            model.objective_const = self.objective_const
+        clock.stage("ADD_COLUMNS", columns = len(columns))
+
+        # Add all rows sorted by row index
+        order = np.argsort(row, kind = "stable")
+        row, col, val = row[order], (col[order] + first_column).tolist(), val[order].tolist()
+        bounds = np.searchsorted(row, np.arange(n_rows + 1)).tolist()
+        if model.solver_name.upper() == CBC:
+            # Pass the row slices straight to the CBC interface
+            from mip.cbc import cbclib
+            for i in range(n_rows):
+                start, end = bounds[i], bounds[i + 1]
+                cbclib.Cbc_addRow(model.solver._model, "constr({})".format(first_row + i).encode("utf-8") if use_names else b"", int(end - start), col[start:end], val[start:end], sense[i].encode("utf-8"), rhs[i])
+        else:
+            variables = model.vars
+            for i in range(n_rows):
+                start, end = bounds[i], bounds[i + 1]
+                model.solver.add_constr(LinExpr([variables[j] for j in col[start:end]], val[start:end], -rhs[i], sense[i]), "constr({})".format(first_row + i) if use_names else "")
+        model.constrs.update_constrs(first_row + n_rows)
+        self.n_rows = n_rows
+        clock.stage("ADD_ROWS")
+
+        if self.reduction is not None:
+            self.reduction.report(model.num_rows, model.num_cols)
+
+
+# %% Helper functions
+def dense(values):
+    # Missing coefficients of a compact index model are NaN
+    if np.isnan(values).any():
+        raise KeyError("Missing coefficients in the compact index model")
+    return values
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import re
+import statistics
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Phases of the benchmark suite, synthetic instances have no disk or DB load
+BENCHMARK_PHASES = ["DISK_LOAD", "DB_LOAD", "INSTANTIATE", "BUILD", "SOLVE"]
+# Version of the result files, results of other versions are not compared
+BENCHMARK_VERSION = 1
+# Synthetic instances are given by their number of scenarios, products, periods and machines, e.g. S4P20T24M3
+SYNTHETIC_INSTANCE = re.compile(r"^S(\d+)P(\d+)T(\d+)M(\d+)$")
+
+# Define phase-level benchmark of problem instances and synthetic instances
+class BenchmarkSuite:
+    def __init__(self, problem_instances_path = None, results_path = None):
+        # Every repetition of an instance runs in a fresh process, so the peak memory of a phase is not distorted by earlier runs
+        self.project_path = os.path.dirname(os.path.realpath("__file__"))
+        self.problem_instances_path = problem_instances_path if problem_instances_path is not None else self.project_path + "/ProblemInstances.csv"
+        self.results_path = results_path if results_path is not None else self.project_path + "/logs/benchmark"
+
+        with open(self.problem_instances_path, "r") as f:
+            rows = [row for row in csv.reader(line.replace("\r", "") for line in f) if len(row) == 3]
+        self.problem_instances = [{"Source": source.strip(), "ProblemInstance": problem_instance.strip(), "DataPath": data_path.strip()} for source, problem_instance, data_path in rows]
+
+    def instances(self, problem_instance_ids = list(), synthetic_instances = list()):
+        # Selected problem instances of ProblemInstances.csv, "ALL" selects all of them
+        instances = list()
+        for row in self.problem_instances:
+            if "ALL" in problem_instance_ids or row["ProblemInstance"] in problem_instance_ids:
+                instances.append({"Instance": row["ProblemInstance"], "Synthetic": False, **row})
+        for synthetic_instance in synthetic_instances:
+            match = SYNTHETIC_INSTANCE.match(synthetic_instance)
+            if match is None:
+                raise ValueError("Unknown synthetic instance {}, use S<scenarios>P<products>T<periods>M<machines>".format(synthetic_instance))
+            instances.append({"Instance": synthetic_instance, "Synthetic": True, "Source": "SYNTHETIC", "ProblemInstance": synthetic_instance, "DataPath": None,
+                              "Size": [int(value) for value in match.groups()]})
+        return instances
+
+    def run(self, problem_instance_ids = list(), synthetic_instances = list(), phases = BENCHMARK_PHASES, ct_limit = 60, repetitions = 1, build_options = dict(), concurrency = 4):
+        for phase in phases:
+            if phase not in BENCHMARK_PHASES:
+                raise ValueError("Unknown phase {}, choose from {}".format(phase, BENCHMARK_PHASES))
+        instances = self.instances(problem_instance_ids, synthetic_instances)
+        print("# Benchmark of %s instances with %s repetitions: %s #" % (len(instances), repetitions, ", ".join(phases)))
+
+        st = time.time()
+        results = list()
+        context = multiprocessing.get_context("spawn")
+        for instance in instances:
+            for repetition in range(repetitions):
+                with ProcessPoolExecutor(max_workers = 1, mp_context = context, max_tasks_per_child = 1) as executor:
+                    instance_results = executor.submit(run_instance, instance, phases, ct_limit, build_options, concurrency).result()
+                for result in instance_results:
+                    result["Repetition"] = repetition
+                    print("# %s %s %s: %s seconds, peak RSS %s MB #" % (result["Instance"], result["Phase"], result["Status"], result["Time"], result["PeakRSS"]))
+                results += instance_results
+
+        report = {"version": BENCHMARK_VERSION, "created": time.strftime("%Y-%m-%d %H:%M:%S"), "execution_time": time.time() - st, "environment": environment(),
+                  "options": {"phases": phases, "ct_limit": ct_limit, "repetitions": repetitions, "build_options": build_options, "concurrency": concurrency}, "results": results}
+        os.makedirs(self.results_path, exist_ok = True)
+        report_path = self.results_path + "/benchmark_%s.json" % (time.strftime("%Y%m%d_%H%M%S"))
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent = 1, default = str)
+        print("# Benchmark results saved to %s #" % (report_path))
+        return report_path
+
+    def save_baseline(self, report_path, baseline_path = None):
+        # The baseline is a copy of a result file
+        baseline_path = baseline_path if baseline_path is not None else self.results_path + "/baseline.json"
+        with open(report_path, "r") as f:
+            report = json.load(f)
+        os.makedirs(os.path.dirname(baseline_path), exist_ok = True)
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent = 1)
+        print("# Baseline %s saved from %s #" % (baseline_path, report_path))
+        return baseline_path
+
+    def compare(self, report_path, baseline_path = None, time_tolerance = 0.1, memory_tolerance = 0.1, min_time = 0.05, min_memory = 10.0):
+        # Phases of equal instances are compared by their median time and peak memory, model sizes have to be equal
+        baseline_path = baseline_path if baseline_path is not None else self.results_path + "/baseline.json"
+        with open(report_path, "r") as f:
+            report = json.load(f)
+        with open(baseline_path, "r") as f:
+            baseline = json.load(f)
+        if report["version"] != baseline["version"]:
+            raise ValueError("Benchmark version {} of {} differs from version {} of the baseline".format(report["version"], report_path, baseline["version"]))
+        if report["environment"] != baseline["environment"]:
+            print("# Warning: Environment differs from the baseline: %s vs. %s #" % (report["environment"], baseline["environment"]))
+        if report["options"]["ct_limit"] != baseline["options"]["ct_limit"] or report["options"]["build_options"] != baseline["options"]["build_options"]:
+            print("# Warning: Time limit or build options differ from the baseline #")
+
+        current, previous = summary(report["results"]), summary(baseline["results"])
+        comparison = list()
+        for key, result in current.items():
+            if key not in previous:
+                continue
+            base = previous[key]
+            regressions = list()
+            if result["Time"] - base["Time"] > max(min_time, time_tolerance * base["Time"]):
+                regressions.append("TIME")
+            if result["PeakRSS"] - base["PeakRSS"] > max(min_memory, memory_tolerance * base["PeakRSS"]):
+                regressions.append("MEMORY")
+            if any(result.get(column) != base.get(column) for column in ["Rows", "Columns", "NonZeros"]):
+                regressions.append("SIZE")
+            if result["Status"] != "DONE" and base["Status"] == "DONE":
+                regressions.append("STATUS")
+            comparison.append({"Instance": key[0], "Phase": key[1], "Time": result["Time"], "BaselineTime": base["Time"],
+                               "TimeRatio": result["Time"] / base["Time"] if base["Time"] > 0 else None, "PeakRSS": result["PeakRSS"], "BaselinePeakRSS": base["PeakRSS"],
+                               "Rows": result.get("Rows"), "BaselineRows": base.get("Rows"), "Regression": ",".join(regressions)})
+        comparison = pd.DataFrame(comparison, columns = ["Instance", "Phase", "Time", "BaselineTime", "TimeRatio", "PeakRSS", "BaselinePeakRSS", "Rows", "BaselineRows", "Regression"])
+        missing = sorted(set(previous) - set(current))
+        if len(missing) > 0:
+            print("# Warning: %s phases of the baseline are not in the results: %s #" % (len(missing), ", ".join("%s %s" % key for key in missing)))
+        return comparison
+
+
+# %% Helper functions
+def run_instance(instance, phases, ct_limit, build_options, concurrency):
+    # Run the phases of an instance in a worker process, a phase without the data of its previous phase is skipped
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    results = list()
+    state = {"data": None, "model": None}
+
+    def record(phase, function):
+        # Phases that are not selected only run for the data of later phases, they are recorded if they fail
+        result = {"Instance": instance["Instance"], "Source": instance["Source"], "Synthetic": instance["Synthetic"], "Phase": phase}
+        try:
+            if phase not in phases:
+                function()
+                return True
+            values, elapsed, peak_rss, rss = measure(function)
+            result.update({"Status": "DONE", "Time": elapsed, "PeakRSS": peak_rss, "RSSIncrease": peak_rss - rss, **values})
+        except Exception as e:
+            traceback.print_exc()
+            result.update({"Status": "FAILED", "Time": None, "PeakRSS": None, "RSSIncrease": None, "Error": "%s: %s" % (type(e).__name__, str(e).splitlines()[0] if str(e) else "")})
+        results.append(result)
+        return result["Status"] == "DONE"
+
+    def disk_load():
+        from lib.prepare_data_in_memory import DataDiskLoader
+        state["data"] = DataDiskLoader(instance["ProblemInstance"], os.path.dirname(os.path.realpath("__file__")) + instance["DataPath"]).data_disk_load
+        return {"DataRows": sum(frame.shape[0] for frame in state["data"].values())}
+
+    def db_load():
+        from lib.model_client import ModelClient
+        client = ModelClient(instance["ProblemInstance"], [], load_connection = True)
+        client.load_data(concurrency)
+        client.engine.dispose()
+        if state["data"] is None:
+            state["data"] = client.data
+        return {"DataRows": sum(frame.shape[0] for frame in client.data.values())}
+
+    def instantiate():
+        state["model"] = MLCLSP_L_B(instance["ProblemInstance"], [], load_connection = False, disk_data = state["data"])
+        m = state["model"]
+        return {"Scenarios": m.S, "Products": m.P, "Periods": m.T, "Machines": m.M}
+
+    def build():
+        m = state["model"]
+        m.build(**build_options)
+        return {"Rows": m.model.num_rows, "Columns": m.model.num_cols, "NonZeros": m.model.num_nz}
+
+    def solve():
+        m = state["model"]
+        m.model.verbose = 0
+        status = m.solve(max_seconds = ct_limit)
+        return {"SolverStatus": status.name, "ObjectiveValue": m.objective_value if m.objective_value < float("inf") else None, "LowerBound": m.model_lb}
+
+    # Synthetic instances are generated, the disk load of problem instances is repeated unmeasured if only later phases are selected
+    if instance["Synthetic"]:
+        state["data"] = synthetic_instance(*instance["Size"])
+    else:
+        if "DISK_LOAD" in phases:
+            record("DISK_LOAD", disk_load)
+        if "DB_LOAD" in phases:
+            record("DB_LOAD", db_load)
+        if state["data"] is None and "DISK_LOAD" not in phases and any(phase in phases for phase in ["INSTANTIATE", "BUILD", "SOLVE"]):
+            record("DISK_LOAD", disk_load)
+
+    for phase, function in [("INSTANTIATE", instantiate), ("BUILD", build), ("SOLVE", solve)]:
+        if state["data"] is None or not any(later in phases for later in BENCHMARK_PHASES[BENCHMARK_PHASES.index(phase):]):
+            break
+        if not record(phase, function):
+            break
+    return results
+
+
+def append_report(report_path, results):
+    # Rows of a benchmark script are appended to its CSV report, relative paths are relative to the project path. The report is only
+    # written again if the columns changed, then to a temporary file that replaces the report at once
+    results = pd.DataFrame(results)
+    report_path = os.path.join(os.path.dirname(os.path.realpath("__file__")), report_path)
+    os.makedirs(os.path.dirname(report_path), exist_ok = True)
+    columns = list()
+    if os.path.exists(report_path) and os.path.getsize(report_path) > 0:
+        with open(report_path, "r", newline = "") as f:
+            columns = next(csv.reader(f, delimiter = ";"))
+    if len(columns) > 0 and set(columns) != set(str(column) for column in results.columns):
+        tmp_path = "%s.%s.tmp" % (report_path, os.getpid())
+        pd.concat([pd.read_csv(report_path, sep = ";"), results]).to_csv(tmp_path, index = False, sep = ";")
+        os.replace(tmp_path, report_path)
+        return
+    if len(columns) > 0:
+        results = results.rename(columns = str)[columns]
+    with open(report_path, "a", newline = "") as f:
+        results.to_csv(f, index = False, header = len(columns) == 0, sep = ";")
+
+
+def measure(function):
+    # Wall time of the function and peak resident memory of the process during the function in MB
+    import psutil
+    from memory_profiler import memory_usage
+    rss = psutil.Process().memory_info().rss / 1024 ** 2
+    def timed():
+        st = time.perf_counter()
+        values = function()
+        return values, time.perf_counter() - st
+    peak_rss, (values, elapsed) = memory_usage((timed, (), {}), interval = 0.01, max_usage = True, retval = True)
+    return values, elapsed, max(peak_rss, rss), rss
+
+
+def summary(results):
+    # Median time and maximum peak memory of the repetitions of a phase
+    phases = dict()
+    for result in results:
+        phases.setdefault((result["Instance"], result["Phase"]), list()).append(result)
+    summaries = dict()
+    for key, repetitions in phases.items():
+        done = [result for result in repetitions if result["Status"] == "DONE"]
+        summaries[key] = {"Status": "DONE" if len(done) == len(repetitions) else "FAILED", "Time": statistics.median(result["Time"] for result in done) if len(done) > 0 else float("inf"),
+                          "PeakRSS": max(result["PeakRSS"] for result in done) if len(done) > 0 else float("inf"),
+                          **{column: repetitions[0].get(column) for column in ["Rows", "Columns", "NonZeros"]}}
+    return summaries
+
+
+def environment():
+    import mip
+    return {"python": platform.python_version(), "machine": platform.machine(), "processor": platform.processor(), "cpu_count": os.cpu_count(), "mip": mip.__version__,
+            "pandas": pd.__version__, "numpy": np.__version__}
+
+
+def synthetic_instance(S, P, T, M, seed = 0):
+    # Multi-level instance in the layout of the EER model views: machines are production stages, products of a stage are produced on its machine and consume
+    # two products of the next stage, finished goods of the first stage have normally distributed demand in every scenario
+    from lib.model_client import VIEW_SCHEMA
+    rng = np.random.default_rng(seed)
+    problem_instance_id = "S%sP%sT%sM%s" % (S, P, T, M)
+    scenarios = ["SIM%03d" % (s + 1) for s in range(S)]
+    products = ["P%04d" % (p + 1) for p in range(P)]
+    machines = ["M%03d" % (m + 1) for m in range(M)]
+    stage = np.minimum(np.arange(P) * M // P, M - 1)
+    periods = np.arange(1, T + 1)
+    dates = pd.Timestamp("2020-01-06") + pd.to_timedelta(7 * (periods - 1), unit = "D")
+
+    # Bill of materials and the demand it implies for every product
+    structures = list()
+    for k in range(M - 1):
+        parents, components = np.flatnonzero(stage == k), np.flatnonzero(stage == k + 1)
+        for i, parent in enumerate(parents):
+            for component in sorted({components[i % len(components)], components[(i + 1) % len(components)]}):
+                structures.append((parent, component))
+    mean_demand = np.where(stage == 0, rng.uniform(20, 100, P).round(), 0.0)
+    requirement = mean_demand.copy()
+    for k in range(M - 1):
+        for parent, component in structures:
+            if stage[parent] == k:
+                requirement[component] += requirement[parent]
+    production_time = rng.uniform(0.5, 1.5, P).round(2)
+    setup_time = rng.uniform(5, 15, P).round()
+    setup_cost = rng.uniform(200, 800, P).round()
+    holding_cost = rng.uniform(1, 5, P).round()
+
+    # Capacities with a utilization of about 85 % including the setups
+    load = np.array([(requirement * production_time + setup_time)[stage == m].sum() for m in range(M)])
+    capacity = (load / 0.85).round(2)
+
+    def frame(key, columns):
+        return pd.DataFrame(columns).assign(ProblemInstanceId = problem_instance_id)[list(VIEW_SCHEMA[key])].astype(VIEW_SCHEMA[key])
+
+    s_axis, p_axis, t_axis = np.repeat(np.arange(S), P * T), np.tile(np.repeat(np.arange(P), T), S), np.tile(np.arange(T), S * P)
+    s_m_axis, m_axis, t_m_axis = np.repeat(np.arange(S), M * T), np.tile(np.repeat(np.arange(M), T), S), np.tile(np.arange(T), S * M)
+    pt_p_axis, pt_t_axis = np.repeat(np.arange(P), T), np.tile(np.arange(T), P)
+    demand = np.maximum(rng.normal(mean_demand[p_axis], 0.3 * mean_demand[p_axis]), 0).round()
+    big_M = np.floor(capacity[stage[p_axis]] / production_time[p_axis])
+    bom = np.array(structures, dtype = np.int64).reshape(-1, 2)
+    bom_p, bom_t = np.repeat(np.arange(len(bom)), T), np.tile(np.arange(T), len(bom))
+    material = {"MaterialId": products, "BaseUOM": "PC", "ShelfLifeTolerance": np.nan, "AlphaServiceLevelTarget": np.nan, "BetaServiceLevelTarget": np.nan, "BaseCurrency": "EUR",
+                "MaterialType": np.where(stage == 0, "FINISHED_GOOD", "INTERMEDIATE")}
+
+    return {
+        "probleminstance": frame("probleminstance", {"ProblemInstanceName": problem_instance_id, "SimulationInstanceId": scenarios, "SimulationInstanceName": scenarios, "ProductionStages": M}),
+        "capacity": frame("capacity", {"SimulationInstanceId": np.array(scenarios)[s_m_axis], "MachineId": np.array(machines)[m_axis], "PlanningDate": dates[t_m_axis],
+                                       "PlanningPeriod": periods[t_m_axis], "PlanningBuckets": "1 WEEK", "CapacityPerPeriod": capacity[m_axis]}),
+        "demand": frame("demand", {"SimulationInstanceId": np.array(scenarios)[s_axis], "MaterialId": np.array(products)[p_axis], "DeliveryDate": dates[t_axis], "Quantity": demand,
+                                   "PlanningPeriod": periods[t_axis], "BaseUOM": "PC", "BaseCurrency": "EUR"}),
+        "material": frame("material", material),
+        "material_cost": frame("material_cost", {"MaterialId": np.array(products)[pt_p_axis], "LostSales": 0.0, "Destruction": 0.0, "InventoryHolding": holding_cost[pt_p_axis],
+                                                 "Backorder": 10 * holding_cost[pt_p_axis], "PlanningDate": dates[pt_t_axis], "PlanningPeriod": periods[pt_t_axis]}),
+        "material_type": frame("material_type", material),
+        "planning_period": frame("planning_period", {"PlanningStartDate": dates[0], "PlanningEndDate": dates[-1], "PlanningBuckets": "1 WEEK", "PlanningDate": dates,
+                                                     "PlanningDateIntervalEnd": dates + pd.Timedelta(days = 6), "PlanningPeriod": periods}),
+        "production": frame("production", {"MachineId": np.array(machines)[stage[pt_p_axis]], "MaterialId": np.array(products)[pt_p_axis], "PlanningDate": dates[pt_t_axis],
+                                           "PlanningPeriod": periods[pt_t_axis], "LeadTime": 0.0, "ProductionTimePerBaseUOM": production_time[pt_p_axis], "ProductionCostPerBaseUOM": 0.0,
+                                           "BatchSizeFix": np.nan, "LotSizeMin": np.nan, "LotSizeMax": np.nan, "ShelfLifeFix": 0.0, "ShelfLifeType": None}),
+        "production_structures": frame("production_structures", {"MachineIdGoodsReceived": np.array(machines)[stage[bom[bom_p, 0]]], "GoodsReceived": np.array(products)[bom[bom_p, 0]],
+                                                                 "MachineIdGoodsIssued": np.array(machines)[stage[bom[bom_p, 1]]], "GoodsIssued": np.array(products)[bom[bom_p, 1]],
+                                                                 "PlanningDate": dates[bom_t], "PlanningPeriod": periods[bom_t], "BOMAlternative": "ALT001", "Ratio": 1.0, "ScrapFix": 0.0,
+                                                                 "ScrapVariable": 0.0, "ShelfLifeVariable": 0.0}),
+        "product_to_line": frame("product_to_line", {"MachineId": np.array(machines)[stage], "MaterialId": products}),
+        "setup_matrix": frame("setup_matrix", {"MachineId": np.array(machines)[stage[pt_p_axis]], "MaterialId": np.array(products)[pt_p_axis], "PlanningDate": dates[pt_t_axis],
+                                               "PlanningPeriod": periods[pt_t_axis], "SetupTime": setup_time[pt_p_axis], "SetupCost": setup_cost[pt_p_axis]}),
+        "initial_lot_sizing_values": frame("initial_lot_sizing_values", {"SimulationInstanceId": np.repeat(scenarios, P), "MaterialId": np.tile(products, S), "InitialInventory": 0.0,
+                                                                         "InitialBackorder": 0.0, "FinalInventory": 0.0}),
+        "initial_linked_lot_sizing_values": frame("initial_linked_lot_sizing_values", {"SimulationInstanceId": np.repeat(scenarios, P), "MachineId": np.tile(np.array(machines)[stage], S),
+                                                                                       "MaterialId": np.tile(products, S), "InitialLinkedLotSize": 0}),
+        "max_production_quantity": frame("max_production_quantity", {"SimulationInstanceId": np.array(scenarios)[s_axis], "MachineId": np.array(machines)[stage[p_axis]],
+                                                                     "MaterialId": np.array(products)[p_axis], "PlanningPeriod": periods[t_axis], "BigM": big_M})
+    }
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+from lib.coefficient_array import CoefficientArray
+
+# Define bound tightening stage of the big-M constraints between instantiation and model build
+class BoundTightening:
+    def __init__(self, index_model):
+        # Production quantities are bounded separately for setups and linked lot sizes: x_p <= big_M_setup * x_su + big_M_linked * x_l[t - 1]
+        # Both bounds are the net echelon requirement of the whole horizon capped by the capacity, a setup additionally takes its setup time from the capacity
+        st = time.time()
+        m = index_model
+        self.scenarios = sorted(m.simulation_instances)
+        self.products = sorted(m.products)
+        self.periods = list(m.periods)
+        self.lines = sorted((machine, product) for product in self.products for machine in m.product_to_line[product])
+        S, P, L, T = len(self.scenarios), len(self.products), len(self.lines), len(self.periods)
+        product_idx = {product: i for i, product in enumerate(self.products)}
+        period_idx = {period: i for i, period in enumerate(self.periods)}
+        line_product = np.array([product_idx[product] for machine, product in self.lines], dtype = np.int64)
+
+        demand = np.array([[[m.demand[scenario][(product, period)] for period in self.periods] for product in self.products] for scenario in self.scenarios], dtype = float).reshape(S, P, T)
+        capacity = np.array([[[m.capacity[scenario][(machine, period)] for period in self.periods] for machine, product in self.lines] for scenario in self.scenarios], dtype = float).reshape(S, L, T)
+        production_time = np.array([[m.production_time[(machine, product, period)] for period in self.periods] for machine, product in self.lines], dtype = float).reshape(L, T)
+        setup_time = np.array([[m.setup_time[(machine, product, period)] for period in self.periods] for machine, product in self.lines], dtype = float).reshape(L, T)
+        lead_time = np.rint(np.array([[m.lead_time[(machine, product, period)] for period in self.periods] for machine, product in self.lines], dtype = float).reshape(L, T)).astype(np.int64)
+        init_inventory = np.array([[m.init_inventory[scenario].get(product, 0) if scenario in m.init_inventory else 0 for product in self.products] for scenario in self.scenarios], dtype = float).reshape(S, P)
+        init_backorder = np.array([[m.init_backorder[scenario].get(product, 0) if scenario in m.init_backorder else 0 for product in self.products] for scenario in self.scenarios], dtype = float).reshape(S, P)
+
+        # Echelon demand: primary demand plus the echelon demand of all successors times their production coefficient (the largest over machines and BOM alternatives)
+        ratio = np.zeros((P, P, T))
+        for (machine_received, received, machine_issued, issued, period), value in m.production_coefficient.items():
+            if received in product_idx and issued in product_idx and period in period_idx:
+                i = (product_idx[issued], product_idx[received], period_idx[period])
+                ratio[i] = max(ratio[i], value)
+        self.echelon_demand = demand
+        for level in range(P):
+            echelon_demand = demand + np.einsum("pqt,sqt->spt", ratio, self.echelon_demand)
+            if np.allclose(echelon_demand, self.echelon_demand):
+                break
+            self.echelon_demand = echelon_demand
+
+        # Net requirement of the whole horizon, initial inventories are subtracted and initial backorders are added. A lot may build inventory for later
+        # periods as well as serve backorders of earlier periods, so neither the demand up to the period nor the demand from the period on bounds it
+        requirement = np.maximum(self.echelon_demand.sum(axis = 2) - init_inventory + init_backorder, 0)[:, line_product, None]
+
+        # Capacity bounds, production quantities without production time are not bounded by the capacity and a setup longer than the capacity is not possible
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            linked_capacity = np.where(production_time > 0, capacity / production_time, np.inf)
+            setup_capacity = np.where(production_time > 0, np.maximum(capacity - setup_time, 0) / production_time, np.where(capacity >= setup_time, np.inf, 0))
+
+        # Lots that supply no period of the material balance are never needed
+        supplies = np.zeros((L, T), dtype = bool)
+        l, t = np.nonzero(np.arange(T)[None, :] + lead_time < T)
+        supplies[l, t + lead_time[l, t]] = True
+
+        # Tightened bounds never exceed the big-M values of the max production quantities, missing big-M values do not bound
+        big_M = np.array([[[m.big_M[scenario].get((machine, product, period), np.inf) for period in self.periods] for machine, product in self.lines] for scenario in self.scenarios], dtype = float).reshape(S, L, T)
+        axes = [self.scenarios, self.lines, self.periods]
+        self.big_M_linked = CoefficientArray(np.minimum(np.where(supplies, np.minimum(requirement, linked_capacity), 0), big_M), axes, nested = True)
+        self.big_M_setup = CoefficientArray(np.minimum(np.where(supplies, np.minimum(requirement, setup_capacity), 0), big_M), axes, nested = True)
+        self.tightening_time = time.time() - st
+
+        # Compare the setup bounds with the big-M values of the max production quantities
+        tightened = (self.big_M_setup.values < big_M - 1e-6) & np.isfinite(big_M)
+        self.tightened = int(np.sum(tightened))
+        self.relative_reduction = float(np.mean(1 - self.big_M_setup.values[tightened] / big_M[tightened])) if self.tightened > 0 else 0.0
+        print("Bound tightening reduced %s of %s big-M values by %s on average" % (self.tightened, big_M.size, self.relative_reduction))
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import fcntl
+import os
+import shutil
+import tempfile
+
+# %% Helper functions of the on-disk caches (see lib/model_cache.py and lib/disk_cache.py)
+@contextlib.contextmanager
+def cache_lock(cache_path, shared = False):
+    # Advisory lock of a cache directory, readers share the lock, installing and removing entries holds it exclusively
+    with open(cache_path + "/.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def entry_tmp_path(cache_path, key):
+    # Unique temporary directory of an entry, parallel writers of the same key do not share files
+    return tempfile.mkdtemp(prefix = key + ".", suffix = ".tmp", dir = cache_path)
+
+
+def install_entry(tmp_path, entry_path):
+    # Move a completely written entry into place, the caller holds the exclusive lock. Keys are content hashes,
+    # an existing complete entry has the same content and is kept
+    if os.path.exists(entry_path + "/manifest.json"):
+        shutil.rmtree(tmp_path, ignore_errors = True)
+        return
+    shutil.rmtree(entry_path, ignore_errors = True)
+    os.replace(tmp_path, entry_path)
+
+
+def append_line(path, line):
+    # Lines are appended with a single write, parallel processes do not lose each other's lines
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (line + "\n").encode("utf-8"))
+    finally:
+        os.close(fd)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+# Define dictionary-compatible read access to a dense coefficient array
+class CoefficientArray:
+    def __init__(self, values, axes: list, nested = False, scenario_variant = None, positions = None):
+        # Every axis is a sorted list of index keys, a key of an axis can be a tuple (e.g. lines as machine and product)
+        # Missing entries are NaN and behave like missing dictionary keys
+        # Scenarios with equal coefficients can share one slice of the values, scenario_variant maps every scenario to its slice
+        # Slices of a nested array share the positions of its sub-axes instead of encoding them again
+        self.values = values
+        self.axes = axes
+        self.nested = nested
+        self.scenario_variant = scenario_variant
+        self.positions = positions if positions is not None else [{key: i for i, key in enumerate(axis)} for axis in axes]
+        self.arity = [len(axis[0]) if len(axis) > 0 and isinstance(axis[0], tuple) else 1 for axis in axes]
+        self.slices = dict()
+
+    def position(self, key):
+        if self.nested:
+            return self.positions[0][key]
+        key = key if isinstance(key, tuple) else (key,)
+        idx = list()
+        n = 0
+        for positions, arity in zip(self.positions, self.arity):
+            idx.append(positions[key[n] if arity == 1 else key[n:n + arity]])
+            n += arity
+        if n != len(key):
+            raise KeyError(key)
+        return tuple(idx)
+
+    def __getitem__(self, key):
+        # Nested arrays return the coefficients of a scenario like a dictionary of dictionaries
+        if self.nested:
+            # One view per slice is kept, scenarios of a shared variant return the same view
+            position = self.position(key) if self.scenario_variant is None else int(self.scenario_variant[self.position(key)])
+            if position not in self.slices:
+                self.slices[position] = CoefficientArray(self.values[position], self.axes[1:], positions = self.positions[1:])
+            return self.slices[position]
+        value = self.values[self.position(key)]
+        if np.isnan(value):
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default = None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return [key for key, value in self.items()]
+
+    def scenario_values(self):
+        # Values with one slice per scenario
+        if self.scenario_variant is None:
+            return self.values
+        return self.values[self.scenario_variant]
+
+    def items(self):
+        if self.nested:
+            return [(key, self[key]) for key in self.axes[0]]
+        idx = np.nonzero(~np.isnan(self.values))
+        keys = list()
+        for axis, i, arity in zip(self.axes, idx, self.arity):
+            keys.append([axis[j] if arity > 1 else (axis[j],) for j in i.tolist()])
+        keys = [sum(key, ()) for key in zip(*keys)]
+        return [(key if len(key) > 1 else key[0], value) for key, value in zip(keys, self.values[idx].tolist())]
+
+
+# %% Helper functions
+def encode(axis, *columns):
+    # Positions of the values of one or several columns on an axis, -1 if a value is not on the axis
+    if len(columns) == 1:
+        return pd.Index(axis).get_indexer(pd.Index(np.asarray(columns[0], dtype = object)))
+    return pd.MultiIndex.from_tuples(axis).get_indexer(pd.MultiIndex.from_arrays([np.asarray(column, dtype = object) for column in columns]))
+
+
+def coefficient_array(data, value, axes: list, columns: list, nested = False):
+    # Scatter a value column into a dense array, every axis is addressed by one or several columns of the data
+    values = np.full(tuple(len(axis) for axis in axes), np.nan)
+    idx = [encode(axis, *[data[column] for column in axis_columns]) for axis, axis_columns in zip(axes, columns)]
+    valid = np.ones(data.shape[0], dtype = bool)
+    for i in idx:
+        valid &= i >= 0
+    values[tuple(i[valid] for i in idx)] = data[value].to_numpy(dtype = float)[valid]
+    return CoefficientArray(values, axes, nested)
+
+
+def shared_coefficient_array(data, value, axes: list, columns: list):
+    # Rows without 'SimulationInstanceIds' are shared by all scenarios (base), the other rows hold the deltas of the listed scenarios
+    # Scenarios with the same deltas share one variant, the array has one slice per distinct variant instead of one per scenario
+    data = data.reset_index(drop = True)
+    shared = data["SimulationInstanceIds"].isnull().to_numpy()
+    scenario_ids = data["SimulationInstanceIds"][~shared].astype(str).str.split(",").explode()
+    delta_row = scenario_ids.index.to_numpy(dtype = np.int64)
+    delta_scenario = pd.Index([str(scenario) for scenario in axes[0]]).get_indexer(scenario_ids.to_numpy())
+    delta_row, delta_scenario = delta_row[delta_scenario >= 0], delta_scenario[delta_scenario >= 0]
+
+    # Variants are identified by the delta rows of a scenario
+    signatures = pd.Series(delta_row).groupby(delta_scenario).agg(tuple).to_dict()
+    variants = dict()
+    scenario_variant = np.array([variants.setdefault(signatures.get(i, ()), len(variants)) for i in range(len(axes[0]))], dtype = np.int64)
+
+    values = np.full((len(variants),) + tuple(len(axis) for axis in axes[1:]), np.nan)
+    idx = [encode(axis, *[data[column] for column in axis_columns]) for axis, axis_columns in zip(axes[1:], columns[1:])]
+    valid = np.ones(data.shape[0], dtype = bool)
+    for i in idx:
+        valid &= i >= 0
+    coefficients = data[value].to_numpy(dtype = float)
+
+    # Scatter the base into all variants and the deltas into the variants of their scenarios
+    base = shared & valid
+    values[(slice(None),) + tuple(i[base] for i in idx)] = coefficients[base]
+    variant_row = np.unique(np.stack([scenario_variant[delta_scenario], delta_row]), axis = 1)
+    variant_row = variant_row[:, valid[variant_row[1]]]
+    values[(variant_row[0],) + tuple(i[variant_row[1]] for i in idx)] = coefficients[variant_row[1]]
+    return CoefficientArray(values, axes, nested = True, scenario_variant = scenario_variant)
+
+
+def join_scenarios(arrays: list, scenario_axis: list):
+    # Join nested arrays of disjoint scenarios along the scenario axis, the variants of shared arrays are kept per array
+    values, variants, scenarios = list(), list(), list()
+    n = 0
+    for array in arrays:
+        variant = array.scenario_variant if array.scenario_variant is not None else np.arange(len(array.axes[0]))
+        values.append(array.values)
+        variants.append(variant + n)
+        scenarios += list(array.axes[0])
+        n += array.values.shape[0]
+    position = {scenario: i for i, scenario in enumerate(scenarios)}
+    variant = np.concatenate(variants)[[position[scenario] for scenario in scenario_axis]]
+    values = np.concatenate(values)
+    if all(array.scenario_variant is None for array in arrays):
+        return CoefficientArray(values[variant], [scenario_axis] + arrays[0].axes[1:], nested = True)
+    return CoefficientArray(values, [scenario_axis] + arrays[0].axes[1:], nested = True, scenario_variant = variant)
+
+
+def subset_scenarios(array, scenario_axis: list):
+    # Nested array of a subset of its scenarios, variants of shared arrays without scenarios are dropped
+    position = [array.positions[0][scenario] for scenario in scenario_axis]
+    if array.scenario_variant is None:
+        return CoefficientArray(array.values[position], [scenario_axis] + array.axes[1:], nested = True)
+    variants, variant = np.unique(array.scenario_variant[position], return_inverse = True)
+    return CoefficientArray(array.values[variants], [scenario_axis] + array.axes[1:], nested = True, scenario_variant = variant.astype(np.int64).ravel())
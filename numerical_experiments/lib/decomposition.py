@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+import math
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from mip import OptimizationStatus
+from lib.model_client import select_scenarios
+
+# Define scenario decomposition of the MLCLSP-L-B
+class ScenarioDecomposition:
+    def __init__(self, model, processes = None):
+        # Scenarios are only linked by the averaged objective, every scenario is solved as an independent subproblem
+        self.model = model
+        self.processes = processes if processes is not None else os.cpu_count()
+
+    def solve(self, max_seconds = 100.0, build_options = dict()):
+        # The time limit applies to the whole decomposition, the subproblems are solved in rounds of at most processes scenarios
+        # and every subproblem gets the share of its round, capped by the time left until the deadline
+        model = self.model
+        scenarios = sorted(model.simulation_instances)
+        rounds = math.ceil(len(scenarios) / self.processes)
+        st = time.time()
+        deadline = st + max_seconds
+        with ProcessPoolExecutor(max_workers = self.processes) as executor:
+            futures = [executor.submit(solve_scenario, model.problem_instance_id, scenario, select_scenarios(model.data, [scenario]), model.compact, build_options, max_seconds / rounds, deadline) for scenario in scenarios]
+            self.results = [scenario_result(future, scenario) for future, scenario in zip(futures, scenarios)]
+        self.solve_time = time.time() - st
+
+        # Objective value and bound of the monolithic model are the probability-weighted averages over all scenarios
+        statuses = [result["status"] for result in self.results]
+        if OptimizationStatus.INFEASIBLE in statuses:
+            status = OptimizationStatus.INFEASIBLE
+        elif any(status not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE] for status in statuses):
+            status = OptimizationStatus.NO_SOLUTION_FOUND
+        elif all(status == OptimizationStatus.OPTIMAL for status in statuses):
+            status = OptimizationStatus.OPTIMAL
+        else:
+            status = OptimizationStatus.FEASIBLE
+        self.status = status
+        # Scenarios without solution, including failed subproblems, have no objective value, the averaged objective value is not defined
+        self.unsolved = [result["scenario"] for result in self.results if result["status"] not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]]
+        if len(self.unsolved) > 0:
+            print("No solution found for scenarios %s of problem instance %s" % (self.unsolved, model.problem_instance_id))
+        probability = [model.scenario_probability[result["scenario"]] for result in self.results]
+        self.objective_value = float(np.average([result["objective_value"] for result in self.results], weights = probability)) if len(self.unsolved) == 0 else None
+        self.objective_bound = float(np.average([result["objective_bound"] for result in self.results], weights = probability))
+        self.solution = dict()
+        for result in self.results:
+            self.solution.update(result["solution"])
+        return status
+
+
+# %% Helper functions
+def scenario_result(future, scenario):
+    # A failed subproblem, e.g. a crashed worker process, is reported as a scenario without solution, costs are nonnegative so zero bounds its objective
+    try:
+        return future.result()
+    except Exception as e:
+        print("Subproblem of scenario %s failed: %s: %s" % (scenario, type(e).__name__, e))
+        return {"scenario": scenario, "status": OptimizationStatus.ERROR, "objective_value": float("inf"), "objective_bound": 0.0, "solution": dict(),
+                "build_time": None, "solve_time": None}
+
+
+def solve_scenario(problem_instance_id, scenario, data, compact, build_options, max_seconds, deadline):
+    # Build and solve the subproblem of one scenario in a worker process, the time limit ends at the latest at the deadline of the decomposition
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    st = time.time()
+    m = MLCLSP_L_B(problem_instance_id = problem_instance_id, simulation_instance_ids = [scenario], load_connection = False, disk_data = data, compact = compact)
+    m.build(**build_options)
+    m.model.threads = 1
+    m.model.verbose = 0
+    bt = time.time()
+    status = m.solve(max_seconds = max(min(max_seconds, deadline - time.time()), 1.0))
+    et = time.time()
+    print("Solved scenario %s of problem instance %s: %s" % (scenario, problem_instance_id, m.optimzation_state))
+    return {"scenario": scenario, "status": status, "objective_value": m.objective_value, "objective_bound": m.model.objective_bound, "solution": m.solution,
+            "build_time": bt - st, "solve_time": et - bt}
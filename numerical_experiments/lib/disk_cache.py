@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from lib.cache_lock import cache_lock, entry_tmp_path, install_entry
+from lib.prepare_data_in_memory import DataDiskLoader, LOADER_VERSION, load_workbook
+
+# Define columnar on-disk cache of the prepared disk data
+class DataDiskCache:
+    def __init__(self, cache_path = None, max_size = 2 * 1024 ** 3):
+        # Every entry is a directory with one memory-mappable .npy file per column and a manifest
+        self.project_path = os.path.dirname(os.path.realpath("__file__"))
+        self.cache_path = cache_path if cache_path is not None else self.project_path + "/research_data/disk_cache"
+        self.max_size = max_size
+        os.makedirs(self.cache_path, exist_ok = True)
+
+    def load(self, problem_instance_id, data_path):
+        # Return the prepared data of a problem instance, the workbook is only parsed on a cache miss
+        key = self.key(problem_instance_id, data_path)
+        data = self.read(key)
+        if data is not None:
+            print("Read data of problem instance %s from disk cache %s" % (problem_instance_id, key))
+            return data
+
+        data = DataDiskLoader(problem_instance_id, data_path).data_disk_load
+        self.write(key, problem_instance_id, data_path, data)
+        print("Stored data of problem instance %s in disk cache %s" % (problem_instance_id, key))
+        return data
+
+    def load_workbook(self, problem_instance_ids: list, data_path):
+        # Return the prepared data of several problem instances, the workbook is parsed once for all cache misses
+        workbook_hash = self.workbook_hash(data_path)
+        keys = {problem_instance_id: self.key(problem_instance_id, data_path, workbook_hash) for problem_instance_id in problem_instance_ids}
+        data = dict()
+        for problem_instance_id in problem_instance_ids:
+            data[problem_instance_id] = self.read(keys[problem_instance_id])
+        missing = [problem_instance_id for problem_instance_id in problem_instance_ids if data[problem_instance_id] is None]
+        print("Read data of %s problem instances from disk cache, %s problem instances are prepared from %s" % (len(problem_instance_ids) - len(missing), len(missing), data_path))
+
+        if len(missing) > 0:
+            for disk_load in load_workbook(data_path, missing):
+                data[disk_load.PROBLEM_INSTANCE] = disk_load.data_disk_load
+                self.write(keys[disk_load.PROBLEM_INSTANCE], disk_load.PROBLEM_INSTANCE, data_path, disk_load.data_disk_load)
+        return data
+
+    def key(self, problem_instance_id, data_path, workbook_hash = None):
+        # Workbook content hash, problem instance and loader version identify an entry
+        if workbook_hash is None:
+            workbook_hash = self.workbook_hash(data_path)
+        return hashlib.sha256(("%s|%s|%s" % (workbook_hash, problem_instance_id, LOADER_VERSION)).encode("utf-8")).hexdigest()[:32]
+
+    def workbook_hash(self, data_path):
+        workbook_hash = hashlib.sha256()
+        with open(data_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 ** 2), b""):
+                workbook_hash.update(chunk)
+        return workbook_hash.hexdigest()
+
+    def read(self, key):
+        entry_path = self.cache_path + "/" + key
+        # The shared lock keeps the entry from being evicted by a parallel writer while its files are opened,
+        # mapped files stay readable after a later eviction removed them
+        with cache_lock(self.cache_path, shared = True):
+            if not os.path.exists(entry_path + "/manifest.json"):
+                return None
+            with open(entry_path + "/manifest.json", "r") as f:
+                manifest = json.load(f)
+
+            data = dict()
+            for data_key, columns in manifest["data"].items():
+                frame = dict()
+                for i, column in enumerate(columns):
+                    if column["encoding"] == "pickle":
+                        frame[column["name"]] = np.load("%s/%s_%s.npy" % (entry_path, data_key, i), allow_pickle = True)
+                        continue
+                    values = np.load("%s/%s_%s.npy" % (entry_path, data_key, i), mmap_mode = "r")
+                    if column["encoding"] == "str":
+                        # Restore missing values of string columns
+                        values = pd.Series(values, dtype = object)
+                        values[np.load("%s/%s_%s_null.npy" % (entry_path, data_key, i))] = np.nan
+                    frame[column["name"]] = values
+                # Columns are not copied into consolidated blocks, numeric columns stay memory-mapped and read-only
+                data[data_key] = pd.DataFrame(frame, columns = [column["name"] for column in columns], copy = False)
+
+            # Mark entry as recently used for the eviction
+            os.utime(entry_path + "/manifest.json")
+        return data
+
+    def write(self, key, problem_instance_id, data_path, data):
+        entry_path = self.cache_path + "/" + key
+        tmp_path = entry_tmp_path(self.cache_path, key)
+
+        manifest = {"problem_instance_id": problem_instance_id, "data_path": os.path.realpath(data_path), "loader_version": LOADER_VERSION, "data": dict()}
+        for data_key, frame in data.items():
+            columns = list()
+            for i, column in enumerate(frame.columns):
+                values = frame[column]
+                null = values.isnull().to_numpy()
+                if values.dtype != object:
+                    encoding = "array"
+                    values = values.to_numpy()
+                elif values[~null].map(lambda x: isinstance(x, str)).all():
+                    # Strings are stored as fixed width unicode arrays with a mask of missing values
+                    encoding = "str"
+                    np.save("%s/%s_%s_null.npy" % (tmp_path, data_key, i), null)
+                    values = np.where(null, "", values.astype(str)).astype(str)
+                else:
+                    # Mixed python objects can not be memory-mapped
+                    encoding = "pickle"
+                    values = values.to_numpy()
+                np.save("%s/%s_%s.npy" % (tmp_path, data_key, i), values, allow_pickle = encoding == "pickle")
+                columns.append({"name": column, "dtype": str(frame[column].dtype), "encoding": encoding})
+            manifest["data"][data_key] = columns
+        with open(tmp_path + "/manifest.json", "w") as f:
+            json.dump(manifest, f)
+
+        # Install the entry at once, readers and parallel writers never see an incomplete entry
+        with cache_lock(self.cache_path):
+            install_entry(tmp_path, entry_path)
+
+            # Entries of a previous workbook content are outdated
+            for entry in self.entries():
+                if entry["key"] != key and entry["problem_instance_id"] == problem_instance_id and entry["data_path"] == manifest["data_path"]:
+                    self.remove(entry["key"])
+            self.evict(keep = key)
+
+    def entries(self):
+        # Cache entries with manifest, size and time of last use
+        entries = list()
+        for key in os.listdir(self.cache_path):
+            entry_path = self.cache_path + "/" + key
+            # Temporary directories of writers are not entries
+            if key.endswith(".tmp") or not os.path.exists(entry_path + "/manifest.json"):
+                continue
+            with open(entry_path + "/manifest.json", "r") as f:
+                manifest = json.load(f)
+            size = sum(os.path.getsize(entry_path + "/" + file_name) for file_name in os.listdir(entry_path))
+            entries.append({"key": key, "problem_instance_id": manifest["problem_instance_id"], "data_path": manifest["data_path"], "loader_version": manifest["loader_version"],
+                            "size": size, "last_used": os.path.getmtime(entry_path + "/manifest.json")})
+        return entries
+
+    def evict(self, keep = None):
+        # Called with the exclusive lock held. Remove entries of outdated loader versions and least recently used entries above the maximum cache size
+        entries = sorted(self.entries(), key = lambda x: x["last_used"])
+        for entry in [entry for entry in entries if entry["loader_version"] != LOADER_VERSION]:
+            self.remove(entry["key"])
+            entries.remove(entry)
+        size = sum(entry["size"] for entry in entries)
+        for entry in entries:
+            if size <= self.max_size:
+                break
+            if entry["key"] == keep:
+                continue
+            self.remove(entry["key"])
+            size -= entry["size"]
+
+    def invalidate(self, problem_instance_id = None):
+        # Remove all entries or all entries of a problem instance
+        with cache_lock(self.cache_path):
+            for entry in self.entries():
+                if problem_instance_id is None or entry["problem_instance_id"] == problem_instance_id:
+                    self.remove(entry["key"])
+
+    def remove(self, key):
+        shutil.rmtree(self.cache_path + "/" + key, ignore_errors = True)
+        print("Removed entry %s from disk cache" % (key))
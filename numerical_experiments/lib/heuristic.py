@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import time
+from mip import OptimizationStatus, BINARY, CONTINUOUS, INTEGER
+
+# Partitions of the binary variables into windows
+HEURISTIC_PARTITIONS = ["period", "product"]
+# CBC is not interrupted within less than a second per subproblem
+MIN_SUBPROBLEM_SECONDS = 1.0
+
+# Define relax-and-fix and fix-and-optimize heuristic of the MLCLSP-L-B
+class FixAndOptimize:
+    def __init__(self, model, window = 2, step = None, partition = "period", mip_gap = 0.01):
+        if partition not in HEURISTIC_PARTITIONS:
+            raise ValueError("Unknown partition {}, choose one of {}".format(partition, HEURISTIC_PARTITIONS))
+
+        # Binary variables (setup states and linked lot sizes) and integer quantities of the built model grouped by period or product
+        # Initial values belong to the first period
+        self.model = model
+        self.window = window
+        self.step = step if step is not None else window
+        self.partition = partition
+        self.mip_gap = mip_gap
+        self.groups = dict()
+        self.quantities = dict()
+        for var, product, period in model.integer_variables():
+            key = max(period, 1) if partition == "period" else product
+            (self.groups if var.var_type == BINARY else self.quantities).setdefault(key, list()).append(var)
+            self.groups.setdefault(key, list())
+        keys = sorted(self.groups)
+
+        # MIP starts are passed by variable name, integer quantities are part of the start
+        self.integers = [var for variables in self.quantities.values() for var in variables]
+        self.use_start = model.has_names()
+
+        # Windows move by step keys, the keys before the next window are fixed after a window is solved
+        self.windows = list()
+        for start in range(0, len(keys), self.step):
+            self.windows.append((keys[start:start + self.window], keys[start:start + self.step] if start + self.window < len(keys) else keys[start:]))
+            if start + self.window >= len(keys):
+                break
+
+    def solve(self, max_seconds = 100.0, improve = True):
+        model = self.model.model
+        st = time.time()
+        self.values = None
+        self.objective_value = float("inf")
+        self.objective_bound = float("-inf")
+        self.iterations = list()
+
+        # Subproblems are only solved to a relative gap, proving optimality of a window does not pay off
+        max_mip_gap = model.max_mip_gap
+        model.max_mip_gap = self.mip_gap
+
+        # Relax-and-fix: binaries and quantities of the window are integer, later ones are relaxed and earlier binaries are fixed
+        for var in self.variables() + self.integers:
+            var.var_type = CONTINUOUS
+        status = OptimizationStatus.NO_SOLUTION_FOUND
+        relaxation_infeasible = False
+        for i, (window, fix) in enumerate(self.windows):
+            for key in window:
+                for var in self.groups[key]:
+                    if var.lb != var.ub:
+                        var.var_type = BINARY
+                for var in self.quantities.get(key, list()):
+                    var.var_type = INTEGER
+            status = model.optimize(max_seconds = max(self.remaining(st, max_seconds) / (len(self.windows) - i), MIN_SUBPROBLEM_SECONDS))
+            if status not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE] and i > 0:
+                # Fixed binaries of the previous window can cut off all solutions, they are released once and solved together with the window
+                for key in self.windows[i - 1][1]:
+                    for var in self.groups[key]:
+                        var.lb, var.ub = 0.0, 1.0
+                        var.var_type = BINARY
+                status = model.optimize(max_seconds = max(2 * self.remaining(st, max_seconds) / (len(self.windows) - i), MIN_SUBPROBLEM_SECONDS))
+                for key in self.windows[i - 1][1]:
+                    for var in self.groups[key]:
+                        if status in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
+                            self.fix(var, round(var.x))
+            if status not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
+                relaxation_infeasible = i == 0 and status == OptimizationStatus.INFEASIBLE
+                break
+            # The first subproblem relaxes the original model, its bound is a valid lower bound
+            if i == 0:
+                self.objective_bound = model.objective_bound
+            self.iterations.append({"Phase": "RELAX_AND_FIX", "Window": i, "ObjectiveValue": model.objective_value, "Time": time.time() - st})
+            for key in fix:
+                for var in self.groups[key]:
+                    self.fix(var, round(var.x))
+
+        if status not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE] and not relaxation_infeasible:
+            # Fixed binaries can make the remaining windows infeasible, then the first solution of the full model is the start of the improvement
+            self.restore()
+            status = model.optimize(max_seconds = max(self.remaining(st, max_seconds), MIN_SUBPROBLEM_SECONDS), max_solutions = 1)
+            if status in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
+                self.objective_bound = max(self.objective_bound, model.objective_bound)
+                self.iterations.append({"Phase": "FIRST_SOLUTION", "Window": None, "ObjectiveValue": model.objective_value, "Time": time.time() - st})
+                for var in self.variables():
+                    self.fix(var, round(var.x))
+
+        if status in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
+            self.store(model)
+
+            # Fix-and-optimize: free the binaries of one window at a time until a full pass brings no improvement
+            improved = improve
+            while improved and self.remaining(st, max_seconds) >= MIN_SUBPROBLEM_SECONDS:
+                improved = False
+                for i, (window, fix) in enumerate(self.windows):
+                    if self.remaining(st, max_seconds) < MIN_SUBPROBLEM_SECONDS:
+                        break
+                    variables = [var for key in window for var in self.groups[key]]
+                    start = [(var, self.values[var.idx]) for var in variables + self.integers]
+                    for var in variables:
+                        var.lb, var.ub = 0.0, 1.0
+                        var.var_type = BINARY
+                    if self.use_start:
+                        model.start = start
+                    status = model.optimize(max_seconds = max(self.remaining(st, max_seconds) / len(self.windows), MIN_SUBPROBLEM_SECONDS))
+                    if status in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE] and model.objective_value < self.objective_value - 1e-6:
+                        self.store(model)
+                        improved = True
+                        self.iterations.append({"Phase": "FIX_AND_OPTIMIZE", "Window": i, "ObjectiveValue": model.objective_value, "Time": time.time() - st})
+                    for var in variables:
+                        self.fix(var, round(self.values[var.idx]))
+        self.restore()
+        model.max_mip_gap = max_mip_gap
+        self.solve_time = time.time() - st
+
+        if self.values is None:
+            self.status = status if status == OptimizationStatus.INFEASIBLE else OptimizationStatus.NO_SOLUTION_FOUND
+        elif self.objective_value <= self.objective_bound + 1e-6:
+            self.status = OptimizationStatus.OPTIMAL
+        else:
+            self.status = OptimizationStatus.FEASIBLE
+        return self.status
+
+    # %% Helper functions
+    def variables(self):
+        return [var for variables in self.groups.values() for var in variables]
+
+    def fix(self, var, value):
+        var.var_type = CONTINUOUS
+        var.lb, var.ub = value, value
+
+    def store(self, model):
+        # Incumbent values of all variables
+        self.values = [var.x for var in model.vars]
+        self.objective_value = model.objective_value
+
+    def restore(self):
+        # Binaries are restored so that the built model can be solved again
+        model = self.model.model
+        for var in self.variables():
+            var.lb, var.ub = 0.0, 1.0
+            var.var_type = BINARY
+        for var in self.integers:
+            var.var_type = INTEGER
+        model.start = None
+
+    def remaining(self, st, max_seconds):
+        return max(max_seconds - (time.time() - st), 0)
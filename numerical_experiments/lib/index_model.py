@@ -1,45 +1,61 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-from lib.model_client import ModelClient
+from lib.model_client import ModelClient, SCENARIO_SHARED_VIEWS, PROBLEM_INSTANCE_VIEWS, share_scenarios, expand_scenarios, select_scenarios
+from lib.scenario_reduction import ScenarioReduction
 from mip import INTEGER, CONTINUOUS
 from collections import defaultdict
+from lib.coefficient_array import coefficient_array, shared_coefficient_array, join_scenarios, subset_scenarios
+from lib import instrumentation
+import pandas as pd
 import numpy as np
 
+# Scenario-dependent coefficients, dictionaries by scenario or nested arrays with the scenario axis first
+SCENARIO_COEFFICIENTS = ["init_inventory", "init_backorder", "init_linked_lot_size", "capacity", "demand", "big_M"]
+
 class IndexModel(ModelClient):
-    def __init__(self, problem_instance_id, simulation_instance_ids = [], load_connection = True, disk_data = dict()):
+    def __init__(self, problem_instance_id, simulation_instance_ids = [], load_connection = True, disk_data = dict(), data_path = None, concurrency = 4, materialized = False, shared = False):
         # Load client
         ModelClient.__init__(self, problem_instance_id, simulation_instance_ids, load_connection)
+        self.shared = shared
         if load_connection:
-            # Load from db
-            ModelClient.load_data(self)
+            # Load from db, views are fetched concurrently from the views or their materialized views
+            ModelClient.load_data(self, concurrency, materialized, shared)
         else:
-            # Load from disk
-            ModelClient.load_disk_data(self, data_dict = disk_data)
+            # Load from disk, prepared data of a workbook is read from the disk cache
+            if data_path is not None:
+                from lib.disk_cache import DataDiskCache
+                disk_data = DataDiskCache().load(problem_instance_id, data_path)
+            ModelClient.load_disk_data(self, data_dict = disk_data, copy = data_path is None)
+
+    def instantiate(self, compact = False):
+        self.compact = compact
+        if compact:
+            self.instantiate_compact()
+            return
+        clock = instrumentation.stages("instantiate", problem_instance_id = self.problem_instance_id, compact = False)
 
-    def instantiate(self):
         # Instantiate indice sets
         self.machines = set(self.data["capacity"]["MachineId"])
         self.products = set(self.data["material"]["MaterialId"])
         self.periods = sorted(list(self.data["planning_period"]["PlanningPeriod"]))
         self.simulation_instances = set(self.data["probleminstance"]["SimulationInstanceId"])
+        self.scenario_probability = {scenario: 1 / len(self.simulation_instances) for scenario in self.simulation_instances}
+
+        # Rows shared by all scenarios are repeated for every scenario
+        for key in SCENARIO_SHARED_VIEWS:
+            if "SimulationInstanceIds" in self.data[key].columns:
+                self.data[key] = expand_scenarios(self.data[key], sorted(self.simulation_instances))
         
         self.M = len(self.machines)
         self.P = len(self.products)
         self.T = len(self.periods)
         self.S = len(self.simulation_instances)
+        clock.stage("INDEX_SETS")
         
-        # Instantiate initial values
-        self.init_inventory = defaultdict(dict)
-        self.init_backorder = defaultdict(dict)
-        
-        for row in self.data["initial_lot_sizing_values"].itertuples():
-            self.init_inventory[row.SimulationInstanceId][row.MaterialId] = row.InitialInventory
-            self.init_backorder[row.SimulationInstanceId][row.MaterialId] = row.InitialBackorder
-
-        self.init_linked_lot_size = defaultdict(dict)
-
-        for row in self.data["initial_linked_lot_sizing_values"].itertuples():
-            self.init_linked_lot_size[row.SimulationInstanceId][row.MachineId, row.MaterialId] = row.InitialLinkedLotSize
+        # Instantiate initial values, capacities, demands and bigM values of all scenarios
+        for key in SCENARIO_COEFFICIENTS:
+            setattr(self, key, defaultdict(dict))
+        self.instantiate_scenarios(self.data, clock)
 
         # Instantiate material types and unit of measures
         self.material_type = dict()
@@ -49,12 +65,8 @@ class IndexModel(ModelClient):
             if row.MaterialId in self.products:
                 self.material_type[(row.MaterialId)] = row.MaterialType
                 self.material_uom[(row.MaterialId)] = INTEGER if row.BaseUOM == "PC" else CONTINUOUS
+        clock.stage("MATERIAL_TYPES")
 
-        # Instantiate capacities
-        self.capacity = defaultdict(dict)
-        for row in self.data["capacity"].itertuples():
-            self.capacity[row.SimulationInstanceId][(row.MachineId, row.PlanningPeriod)] = row.CapacityPerPeriod
-        
         # Instantiate material cost
         self.inventory_holding_cost = dict()
         self.backorder_cost = dict()
@@ -62,12 +74,7 @@ class IndexModel(ModelClient):
         for row in self.data["material_cost"].itertuples():
             self.inventory_holding_cost[(row.MaterialId, row.PlanningPeriod)] = row.InventoryHolding
             self.backorder_cost[(row.MaterialId, row.PlanningPeriod)] = row.Backorder
-
-        # Instantiate demands
-        self.demand = defaultdict(dict)
-
-        for row in self.data["demand"].itertuples():
-            self.demand[row.SimulationInstanceId][(row.MaterialId, row.PlanningPeriod)] = row.Quantity
+        clock.stage("MATERIAL_COST")
 
         # Instantiate setup cost and time (sequence independent)
         self.setup_time = dict()
@@ -75,6 +82,7 @@ class IndexModel(ModelClient):
         for row in self.data["setup_matrix"].itertuples():
             self.setup_time[(row.MachineId, row.MaterialId, row.PlanningPeriod)] = row.SetupTime
             self.setup_cost[(row.MachineId, row.MaterialId, row.PlanningPeriod)] = row.SetupCost
+        clock.stage("SETUP")
         
         # Instantiate production relevant coefficients
         self.production_time = dict()
@@ -82,6 +90,7 @@ class IndexModel(ModelClient):
         for row in self.data["production"].itertuples():
             self.production_time[(row.MachineId, row.MaterialId, row.PlanningPeriod)] = row.ProductionTimePerBaseUOM
             self.lead_time[(row.MachineId, row.MaterialId, row.PlanningPeriod)] = row.LeadTime
+        clock.stage("PRODUCTION")
         
         # Instantiate product-to-line allocations
         self.line_to_product = defaultdict(set)
@@ -89,6 +98,7 @@ class IndexModel(ModelClient):
         for row in self.data["product_to_line"].itertuples():
             self.line_to_product[row.MachineId].add(row.MaterialId)
             self.product_to_line[row.MaterialId].add(row.MachineId)
+        clock.stage("PRODUCT_TO_LINE")
         
         # Instantiate successor and predecessor sets 
         self.predecessor = dict()
@@ -106,8 +116,218 @@ class IndexModel(ModelClient):
                 self.predecessor[(row.MachineIdGoodsReceived, row.GoodsReceived, row.BOMAlternative)].add((row.MachineIdGoodsIssued, row.GoodsIssued))
                 self.successor[(row.MachineIdGoodsIssued, row.GoodsIssued)].add((row.MachineIdGoodsReceived, row.GoodsReceived, row.BOMAlternative))
                 self.production_coefficient[(row.MachineIdGoodsReceived, row.GoodsReceived, row.MachineIdGoodsIssued, row.GoodsIssued, row.PlanningPeriod)] = row.Ratio
-        
+        clock.stage("PRODUCTION_STRUCTURES")
+        clock.done(scenarios = self.S, products = self.P, periods = self.T, machines = self.M)
+
+    def instantiate_scenarios(self, data, clock = instrumentation.NULL_TIMER):
+        # Scenario-dependent coefficients of the simulation instances in the data, coefficients of other scenarios are kept
+        for row in data["initial_lot_sizing_values"].itertuples():
+            self.init_inventory[row.SimulationInstanceId][row.MaterialId] = row.InitialInventory
+            self.init_backorder[row.SimulationInstanceId][row.MaterialId] = row.InitialBackorder
+
+        for row in data["initial_linked_lot_sizing_values"].itertuples():
+            self.init_linked_lot_size[row.SimulationInstanceId][row.MachineId, row.MaterialId] = row.InitialLinkedLotSize
+        clock.stage("INITIAL_VALUES")
+
+        # Instantiate capacities
+        for row in data["capacity"].itertuples():
+            self.capacity[row.SimulationInstanceId][(row.MachineId, row.PlanningPeriod)] = row.CapacityPerPeriod
+        clock.stage("CAPACITY")
+
+        # Instantiate demands
+        for row in data["demand"].itertuples():
+            self.demand[row.SimulationInstanceId][(row.MaterialId, row.PlanningPeriod)] = row.Quantity
+        clock.stage("DEMAND")
+
         # Prepare bigM value for MIP formulation
-        self.big_M = defaultdict(dict)
-        for row in self.data["max_production_quantity"].itertuples():
+        for row in data["max_production_quantity"].itertuples():
             self.big_M[row.SimulationInstanceId][(row.MachineId, row.MaterialId, row.PlanningPeriod)] = row.BigM
+        clock.stage("BIG_M")
+
+    def reduce_scenarios(self, n_scenarios: int):
+        # Replace the simulation instances by representatives of their demand with probability weights
+        self.scenario_reduction = ScenarioReduction(self.data, n_scenarios)
+        self.data = select_scenarios(self.data, self.scenario_reduction.scenarios)
+        self.simulation_instance_ids = list(self.scenario_reduction.scenarios)
+        self.instantiate(self.compact)
+        self.scenario_probability = self.scenario_reduction.probability
+
+    def add_scenarios(self, simulation_instance_ids: list, disk_data = None, concurrency = 4, materialized = False):
+        # Append simulation instances to the instantiated model, only the rows of the new simulation instances are fetched
+        scenarios = sorted(self.simulation_instances)
+        new_scenarios = sorted(set(simulation_instance_ids) - self.simulation_instances)
+        if len(new_scenarios) == 0:
+            return new_scenarios
+        if disk_data is not None:
+            data = select_scenarios(disk_data, new_scenarios)
+        else:
+            data = self.load_scenario_data(new_scenarios, concurrency, materialized)
+
+        # Shared rows are repeated for the scenarios of their frame before both frames are joined
+        new_data = dict()
+        for key, frame in data.items():
+            if key in PROBLEM_INSTANCE_VIEWS:
+                continue
+            if "SimulationInstanceIds" in frame.columns:
+                frame = expand_scenarios(frame, new_scenarios)
+            if "SimulationInstanceIds" in self.data[key].columns:
+                self.data[key] = expand_scenarios(self.data[key], scenarios)
+            self.data[key] = pd.concat([self.data[key], frame], ignore_index = True)
+            new_data[key] = frame
+
+        # Probabilities of the previous scenarios keep their ratios, new scenarios are weighted by 1 / S
+        probability = dict(self.scenario_probability)
+        self.simulation_instance_ids = list(self.simulation_instance_ids) + new_scenarios if len(self.simulation_instance_ids) > 0 else self.simulation_instance_ids
+
+        # Only the coefficients of the new scenarios are instantiated, machines or lines outside the index sets require a full instantiation
+        lines = pd.concat([new_data[key][["MachineId", "MaterialId"]].astype(object) for key in ["max_production_quantity", "initial_linked_lot_sizing_values"]])
+        if not set(new_data["capacity"]["MachineId"]) <= self.machines or (self.compact and not set(zip(lines["MachineId"], lines["MaterialId"])) <= set(self.line_axis)):
+            self.instantiate(self.compact)
+        else:
+            self.simulation_instances = self.simulation_instances | set(new_scenarios)
+            self.S = len(self.simulation_instances)
+            if self.compact:
+                arrays = self.scenario_arrays(new_data, new_scenarios)
+                self.scenario_axis = sorted(self.simulation_instances)
+                for key in SCENARIO_COEFFICIENTS:
+                    setattr(self, key, join_scenarios([getattr(self, key), arrays[key]], self.scenario_axis))
+            else:
+                self.instantiate_scenarios(new_data)
+        self.scenario_probability = {scenario: probability[scenario] * len(scenarios) / self.S if scenario in probability else 1 / self.S for scenario in self.simulation_instances}
+        return new_scenarios
+
+    def remove_scenarios(self, simulation_instance_ids: list):
+        # Remove simulation instances from the instantiated model, probabilities of the remaining scenarios are renormalized
+        removed_scenarios = sorted(set(simulation_instance_ids) & self.simulation_instances)
+        remaining = sorted(self.simulation_instances - set(removed_scenarios))
+        if len(remaining) == 0:
+            raise ValueError("At least one simulation instance has to remain in the model")
+        if len(removed_scenarios) == 0:
+            return removed_scenarios
+        probability = dict(self.scenario_probability)
+        self.data = select_scenarios(self.data, remaining)
+        self.simulation_instance_ids = [scenario for scenario in self.simulation_instance_ids if scenario not in removed_scenarios]
+
+        # Coefficients of the removed scenarios are dropped, machines that only the removed scenarios have require a full instantiation
+        if set(self.data["capacity"]["MachineId"]) != self.machines:
+            self.instantiate(self.compact)
+        else:
+            self.simulation_instances = set(remaining)
+            self.S = len(self.simulation_instances)
+            if self.compact:
+                self.scenario_axis = remaining
+                for key in SCENARIO_COEFFICIENTS:
+                    setattr(self, key, subset_scenarios(getattr(self, key), remaining))
+            else:
+                for key in SCENARIO_COEFFICIENTS:
+                    for scenario in removed_scenarios:
+                        getattr(self, key).pop(scenario, None)
+        total = sum(probability[scenario] for scenario in remaining)
+        self.scenario_probability = {scenario: probability[scenario] / total for scenario in self.simulation_instances}
+        return removed_scenarios
+
+    def instantiate_compact(self):
+        clock = instrumentation.stages("instantiate", problem_instance_id = self.problem_instance_id, compact = True)
+
+        # Instantiate indice sets
+        self.machines = set(self.data["capacity"]["MachineId"])
+        self.products = set(self.data["material"]["MaterialId"])
+        self.periods = sorted(list(self.data["planning_period"]["PlanningPeriod"]))
+        self.simulation_instances = set(self.data["probleminstance"]["SimulationInstanceId"])
+        self.scenario_probability = {scenario: 1 / len(self.simulation_instances) for scenario in self.simulation_instances}
+
+        self.M = len(self.machines)
+        self.P = len(self.products)
+        self.T = len(self.periods)
+        self.S = len(self.simulation_instances)
+
+        # Integer encoding of all index sets, lines are all pairs of machine and product with coefficients
+        self.scenario_axis = sorted(self.simulation_instances)
+        self.product_axis = sorted(self.products)
+        self.machine_axis = sorted(self.machines)
+        self.period_axis = self.periods
+        lines = pd.concat([self.data[key][["MachineId", "MaterialId"]].astype(object) for key in ["product_to_line", "setup_matrix", "production", "max_production_quantity", "initial_linked_lot_sizing_values"]])
+        self.line_axis = sorted(set(zip(lines["MachineId"], lines["MaterialId"])))
+        product, period, line = ["MaterialId"], ["PlanningPeriod"], ["MachineId", "MaterialId"]
+        clock.stage("INDEX_SETS")
+
+        # Instantiate initial values, capacities, demands and bigM values of all scenarios
+        for key, array in self.scenario_arrays(self.data, self.scenario_axis, clock).items():
+            setattr(self, key, array)
+
+        # Instantiate material types and unit of measures
+        material_type = self.data["material_type"][self.data["material_type"]["MaterialId"].astype(object).isin(self.products)]
+        self.material_type = dict(zip(material_type["MaterialId"].astype(object), material_type["MaterialType"].astype(object)))
+        self.material_uom = dict(zip(material_type["MaterialId"].astype(object), [INTEGER if uom == "PC" else CONTINUOUS for uom in material_type["BaseUOM"].astype(object)]))
+        clock.stage("MATERIAL_TYPES")
+
+        # Instantiate material cost, (P, T) arrays
+        self.inventory_holding_cost = coefficient_array(self.data["material_cost"], "InventoryHolding", [self.product_axis, self.period_axis], [product, period])
+        self.backorder_cost = coefficient_array(self.data["material_cost"], "Backorder", [self.product_axis, self.period_axis], [product, period])
+        clock.stage("MATERIAL_COST")
+
+        # Instantiate setup cost and time (sequence independent), (L, T) arrays
+        self.setup_time = coefficient_array(self.data["setup_matrix"], "SetupTime", [self.line_axis, self.period_axis], [line, period])
+        self.setup_cost = coefficient_array(self.data["setup_matrix"], "SetupCost", [self.line_axis, self.period_axis], [line, period])
+        clock.stage("SETUP")
+
+        # Instantiate production relevant coefficients, (L, T) arrays
+        self.production_time = coefficient_array(self.data["production"], "ProductionTimePerBaseUOM", [self.line_axis, self.period_axis], [line, period])
+        self.lead_time = coefficient_array(self.data["production"], "LeadTime", [self.line_axis, self.period_axis], [line, period])
+        clock.stage("PRODUCTION")
+
+        # Instantiate product-to-line allocations
+        product_to_line = self.data["product_to_line"][["MachineId", "MaterialId"]].astype(object)
+        self.line_to_product = defaultdict(set, product_to_line.groupby("MachineId")["MaterialId"].agg(set).to_dict())
+        self.product_to_line = defaultdict(set, product_to_line.groupby("MaterialId")["MachineId"].agg(set).to_dict())
+        clock.stage("PRODUCT_TO_LINE")
+
+        # Instantiate successor and predecessor sets
+        production_structures = self.data["production_structures"][["MachineIdGoodsReceived", "GoodsReceived", "BOMAlternative", "MachineIdGoodsIssued", "GoodsIssued", "PlanningPeriod", "Ratio"]].astype(object)
+        received = list(zip(production_structures["MachineIdGoodsReceived"], production_structures["GoodsReceived"], production_structures["BOMAlternative"]))
+        issued = list(zip(production_structures["MachineIdGoodsIssued"], production_structures["GoodsIssued"]))
+        linked = (production_structures["MachineIdGoodsReceived"] != production_structures["MachineIdGoodsIssued"]) | (production_structures["GoodsReceived"] != production_structures["GoodsIssued"])
+        links = pd.DataFrame({"Received": received, "Issued": issued})[linked.to_numpy()]
+        self.predecessor = {key: set() for key in received}
+        self.predecessor.update(links.groupby("Received")["Issued"].agg(set).to_dict())
+        self.successor = {key: set() for key in issued}
+        self.successor.update(links.groupby("Issued")["Received"].agg(set).to_dict())
+        production_structures = production_structures[linked]
+        self.production_coefficient = dict(zip(zip(production_structures["MachineIdGoodsReceived"], production_structures["GoodsReceived"], production_structures["MachineIdGoodsIssued"],
+                                                   production_structures["GoodsIssued"], production_structures["PlanningPeriod"]), production_structures["Ratio"]))
+        clock.stage("PRODUCTION_STRUCTURES")
+        clock.done(scenarios = self.S, products = self.P, periods = self.T, machines = self.M)
+
+    def scenario_arrays(self, data, scenario_axis, clock = instrumentation.NULL_TIMER):
+        # Scenario-dependent coefficient arrays of the simulation instances on the scenario axis, the other axes are the axes of the instance
+        scenario, product, machine, period, line = ["SimulationInstanceId"], ["MaterialId"], ["MachineId"], ["PlanningPeriod"], ["MachineId", "MaterialId"]
+        arrays = dict()
+
+        # Scenario-invariant rows are stored once, scenarios with equal coefficients share one slice of the arrays
+        data = dict(data)
+        for key in SCENARIO_SHARED_VIEWS:
+            if self.shared and "SimulationInstanceIds" not in data[key].columns:
+                data[key] = share_scenarios(data[key], scenario_axis)
+        def scenario_array(key, value, axes, columns):
+            if "SimulationInstanceIds" in data[key].columns:
+                return shared_coefficient_array(data[key], value, axes, columns)
+            return coefficient_array(data[key], value, axes, columns, nested = True)
+
+        # Instantiate initial values, (S, P) and (S, L) arrays
+        arrays["init_inventory"] = scenario_array("initial_lot_sizing_values", "InitialInventory", [scenario_axis, self.product_axis], [scenario, product])
+        arrays["init_backorder"] = scenario_array("initial_lot_sizing_values", "InitialBackorder", [scenario_axis, self.product_axis], [scenario, product])
+        arrays["init_linked_lot_size"] = scenario_array("initial_linked_lot_sizing_values", "InitialLinkedLotSize", [scenario_axis, self.line_axis], [scenario, line])
+        clock.stage("INITIAL_VALUES")
+
+        # Instantiate capacities, (S, M, T) array
+        arrays["capacity"] = scenario_array("capacity", "CapacityPerPeriod", [scenario_axis, self.machine_axis, self.period_axis], [scenario, machine, period])
+        clock.stage("CAPACITY")
+
+        # Instantiate demands, (S, P, T) array
+        arrays["demand"] = coefficient_array(data["demand"], "Quantity", [scenario_axis, self.product_axis, self.period_axis], [scenario, product, period], nested = True)
+        clock.stage("DEMAND")
+
+        # Prepare bigM value for MIP formulation, (S, L, T) array
+        arrays["big_M"] = scenario_array("max_production_quantity", "BigM", [scenario_axis, self.line_axis, self.period_axis], [scenario, line, period])
+        clock.stage("BIG_M")
+        return arrays
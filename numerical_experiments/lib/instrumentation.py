@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import json
+import os
+import sys
+import time
+import pandas as pd
+
+# Registered sinks, events are only created while at least one sink is registered
+SINKS = list()
+
+# %% Event functions
+def add_sink(sink):
+    SINKS.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    SINKS.remove(sink)
+    sink.close()
+
+
+def enabled():
+    return len(SINKS) > 0
+
+
+def emit(event, **values):
+    # Pass an event to all sinks, without sinks the event is dropped before it is created
+    if len(SINKS) == 0:
+        return
+    record = {"event": event, "timestamp": time.time(), **values}
+    for sink in SINKS:
+        sink.write(record)
+
+
+@contextlib.contextmanager
+def instrument(*sinks):
+    # Register sinks for the duration of a block, e.g. with instrument(MemorySink()) as collector: ...
+    for sink in sinks:
+        add_sink(sink)
+    try:
+        yield sinks[0] if len(sinks) == 1 else sinks
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
+
+
+def stages(event, **values):
+    # Timer of the consecutive stages of a phase, a timer without function is returned if no sink is registered
+    return StageTimer(event, **values) if len(SINKS) > 0 else NULL_TIMER
+
+
+# Define timer of the stages of a phase, e.g. the structures of the instantiation or the constraint families of the build
+class StageTimer:
+    def __init__(self, event, **values):
+        self.event = event
+        self.values = values
+        self.start = self.last = time.perf_counter()
+        self.rows = 0
+        self.columns = 0
+
+    def stage(self, stage, rows = None, columns = None, **values):
+        # Rows and columns are the totals after the stage, the event contains the rows and columns added by the stage
+        now = time.perf_counter()
+        counts = dict()
+        if rows is not None:
+            counts["rows"] = rows - self.rows
+            self.rows = rows
+        if columns is not None:
+            counts["columns"] = columns - self.columns
+            self.columns = columns
+        emit(self.event, stage = stage, time = now - self.last, **counts, **self.values, **values)
+        self.last = now
+
+    def done(self, **values):
+        emit(self.event, stage = "TOTAL", time = time.perf_counter() - self.start, **self.values, **values)
+
+
+# Define timer without function for disabled instrumentation
+class NullTimer:
+    def stage(self, stage, rows = None, columns = None, **values):
+        pass
+
+    def done(self, **values):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+# %% Sinks
+# Define in-memory collector of events
+class MemorySink:
+    def __init__(self):
+        self.events = list()
+
+    def write(self, record):
+        self.events.append(record)
+
+    def close(self):
+        pass
+
+    def frame(self, event = None):
+        # Events as data frame, optionally of one event type
+        return pd.DataFrame([record for record in self.events if event is None or record["event"] == event])
+
+
+# Define structured log sink, every event is written as a JSON line
+class LogSink:
+    def __init__(self, log_path = None):
+        # Events are written to stdout if no log path is given
+        self.log_path = log_path
+        if log_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok = True)
+            self.stream = open(log_path, "a")
+        else:
+            self.stream = sys.stdout
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, default = str) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        if self.log_path is not None:
+            self.stream.close()
+
+
+# Define CSV sink, events are collected and appended to one CSV file per event type when the sink is closed
+class CsvSink:
+    def __init__(self, report_path = None):
+        self.report_path = report_path if report_path is not None else os.path.dirname(os.path.realpath("__file__")) + "/logs/instrumentation"
+        self.events = MemorySink()
+
+    def write(self, record):
+        self.events.write(record)
+
+    def close(self):
+        from lib.benchmark import append_report
+        for event in sorted({record["event"] for record in self.events.events}):
+            append_report(self.report_path + "/" + event + ".csv", self.events.frame(event))
+        self.events.events.clear()
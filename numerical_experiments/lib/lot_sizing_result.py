@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+import pandas as pd
+from mip import CBC
+from lib.coefficient_array import coefficient_array
+
+# Result tables of init.sql, KPIs per material and plans per scenario
+RESULT_TABLES = ["LotSizingResult", "LotSizingPlan", "LotSizingInventory"]
+# Tolerance of binary and quantity values of the solver
+SOLUTION_TOLERANCE = 1e-6
+
+# Define expected KPIs and plans of a solution of the MLCLSP-L-B
+class LotSizingResult:
+    def __init__(self, m):
+        # Solution values are scattered by column position into the array layout, variable names are not read
+        st = time.time()
+        if m.solution_values is None:
+            raise ValueError("No solution of the model available, solve the model with solve or solve_heuristic first")
+        if len(m.solution_values) != m.model.num_cols:
+            raise ValueError("Solution has %s values for %s model columns, solve the model again after adding or removing scenarios" % (len(m.solution_values), m.model.num_cols))
+        self.problem_instance_id = m.problem_instance_id
+        self.layout, columns = m.solution_layout()
+        layout = self.layout
+
+        # Fixed columns of the presolve hold their values, columns outside the model are zero
+        values = layout.fixed_columns() if layout.reduction is not None else np.full(layout.n_cols, np.nan)
+        inside = columns >= 0
+        values[columns[inside]] = m.solution_values[inside]
+        values[np.isnan(values)] = 0
+
+        # Dense solution arrays, (S, P, T + 1) for inventory and backorders and (S, L, T + 1) for linked lot sizes (t = 0 for initial values), (S, L, T) otherwise
+        self.inventory = self.block(values, "INVENTORY_ON_HAND")
+        self.backorder = self.block(values, "BACKORDER_QUANTITY")
+        self.production = self.block(values, "PRODUCTION_QUANTITY")
+        self.setup = self.block(values, "SETUP_STATE") > 0.5
+        initial_linked_lot_size = self.block(values, "LINKED_LOT_SIZE_0")[:, layout.line_machine, layout.line_product]
+        self.linked_lot_size = np.concatenate([initial_linked_lot_size[:, :, None], self.block(values, "LINKED_LOT_SIZE")], axis = 2) > 0.5
+
+        # Production cost per unit is not part of the model, (L, T) array
+        lines = [(layout.machines[machine], layout.products[product]) for machine, product in layout.lines]
+        production_cost = coefficient_array(m.data["production"], "ProductionCostPerBaseUOM", [lines, layout.periods], [["MachineId", "MaterialId"], ["PlanningPeriod"]]).values
+        self.production_cost = np.nan_to_num(production_cost)
+
+        self.kpis = self.aggregate()
+        self.aggregation_time = time.time() - st
+
+    def block(self, values, block):
+        start = self.layout.block_start[block]
+        return values[start:start + int(np.prod(self.layout.block_shape[block]))].reshape(self.layout.block_shape[block])
+
+    def aggregate(self):
+        # Expected KPIs per material across all scenarios, lines are summed up per product by the (L, P) incidence matrix
+        layout = self.layout
+        probability = layout.probability
+        incidence = np.zeros((layout.L, layout.P))
+        incidence[np.arange(layout.L), layout.line_product] = 1
+        def expected(values):
+            return probability @ values
+
+        # Lots start in a producing period with a setup or without production in the previous period
+        producing = self.production > SOLUTION_TOLERANCE
+        previous = np.concatenate([np.zeros((layout.S, layout.L, 1), dtype = bool), producing[:, :, :-1]], axis = 2)
+        lots = (producing & (self.setup | ~previous)).sum(axis = 2) @ incidence
+        production = self.production.sum(axis = 2) @ incidence
+        expected_lots = expected(lots)
+        lot_size = np.divide(expected(production), expected_lots, out = np.zeros(layout.P), where = expected_lots > 0)
+
+        # Alpha service level as share of periods with demand that end without backorders, beta service level as share of the demand that is not backordered
+        demand = layout.demand
+        demand_periods = (demand > SOLUTION_TOLERANCE).sum(axis = 2)
+        served_periods = ((demand > SOLUTION_TOLERANCE) & (self.backorder[:, :, 1:] <= SOLUTION_TOLERANCE)).sum(axis = 2)
+        alpha = np.divide(served_periods, demand_periods, out = np.ones(demand_periods.shape), where = demand_periods > 0)
+        new_backorder = np.maximum(np.diff(self.backorder, axis = 2), 0).sum(axis = 2)
+        total_demand = demand.sum(axis = 2)
+        beta = np.clip(1 - np.divide(new_backorder, total_demand, out = np.zeros(total_demand.shape), where = total_demand > SOLUTION_TOLERANCE), 0, 1)
+
+        # Utilization as share of the capacity of the allocated machines that is used by production and setups of a material
+        used_time = (layout.production_time[None, :, :] * self.production + layout.setup_time[None, :, :] * self.setup).sum(axis = 2) @ incidence
+        capacity = layout.capacity[:, layout.line_machine, :].sum(axis = 2) @ incidence
+        utilization = np.divide(used_time, capacity, out = np.zeros(used_time.shape), where = capacity > 0)
+
+        # Costs of the objective function (periods 1 to T) and production cost
+        inventory_cost = (layout.inventory_holding_cost[None, :, :] * self.inventory[:, :, 1:]).sum(axis = 2)
+        backorder_cost = (layout.backorder_cost[None, :, :] * self.backorder[:, :, 1:]).sum(axis = 2)
+        setup_cost = (layout.setup_cost[None, :, :] * self.setup).sum(axis = 2) @ incidence
+        manufacturing_cost = (self.production_cost[None, :, :] * self.production).sum(axis = 2) @ incidence
+
+        # Shelf lives, lost sales and destructions are not part of the MLCLSP-L-B
+        return pd.DataFrame({"ProblemInstanceId": self.problem_instance_id, "MaterialId": layout.products, "ConfiguredLotSize": lot_size, "ExpectedExpiredInventory": 0.0,
+                             "ExpectedAlphaServiceLevel": expected(alpha), "ExpectedBetaServiceLevel": expected(beta), "ExpectedUtilization": expected(utilization),
+                             "ExpectedTotalManufacturingCost": expected(manufacturing_cost), "ExpectedTotalInventoryCost": expected(inventory_cost),
+                             "ExpectedTotalBackorderCost": expected(backorder_cost), "ExpectedTotalSetupCost": expected(setup_cost), "ExpectedTotalLostSales": 0.0,
+                             "ExpectedTotalDestructionCost": 0.0})
+
+    def plan(self):
+        # Production plan per scenario, line and period, ids are categorical codes of the layout
+        layout = self.layout
+        s, l, t = (i.ravel() for i in np.indices((layout.S, layout.L, layout.T)))
+        return pd.DataFrame({"ProblemInstanceId": self.problem_instance_id, "SimulationInstanceId": pd.Categorical.from_codes(s, categories = layout.scenarios),
+                             "MachineId": pd.Categorical.from_codes(layout.line_machine[l], categories = layout.machines),
+                             "MaterialId": pd.Categorical.from_codes(layout.line_product[l], categories = layout.products), "PlanningPeriod": t + 1,
+                             "ProductionQuantity": self.production.ravel(), "SetupState": self.setup.ravel().astype(np.int64),
+                             "LinkedLotSize": self.linked_lot_size[:, :, 1:].ravel().astype(np.int64)})
+
+    def inventory_plan(self):
+        # Demand, inventory and backorders per scenario, material and period (t = 0 for initial values)
+        layout = self.layout
+        s, p, t = (i.ravel() for i in np.indices((layout.S, layout.P, layout.T + 1)))
+        demand = np.concatenate([np.zeros((layout.S, layout.P, 1)), layout.demand], axis = 2)
+        return pd.DataFrame({"ProblemInstanceId": self.problem_instance_id, "SimulationInstanceId": pd.Categorical.from_codes(s, categories = layout.scenarios),
+                             "MaterialId": pd.Categorical.from_codes(p, categories = layout.products), "PlanningPeriod": t, "Demand": demand.ravel(),
+                             "InventoryOnHand": self.inventory.ravel(), "BackorderQuantity": self.backorder.ravel()})
+
+    def save(self, client, plans = True):
+        # Replace the results of the problem instance in a single transaction, plans are optional for large scenario sets
+        st = time.time()
+        tables = {"LotSizingResult": self.kpis}
+        if plans:
+            tables["LotSizingPlan"] = self.plan()
+            tables["LotSizingInventory"] = self.inventory_plan()
+        client.problem_instance_id = self.problem_instance_id
+        client.copy_results(tables)
+        self.save_time = time.time() - st
+        return {table_name: data.shape[0] for table_name, data in tables.items()}
+
+
+# %% Helper functions
+def column_values(model):
+    # Values of all model columns as array, CBC returns the solution as one buffer
+    if model.solver_name.upper() == CBC:
+        from mip.cbc import cbclib, ffi
+        solution = cbclib.Cbc_getColSolution(model.solver._model)
+        if solution != ffi.NULL:
+            return np.frombuffer(ffi.buffer(solution, model.num_cols * np.dtype(np.float64).itemsize), dtype = np.float64).copy()
+    return np.array([v.x for v in model.vars], dtype = float)
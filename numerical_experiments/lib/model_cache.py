@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from lib.cache_lock import append_line, cache_lock, entry_tmp_path, install_entry
+
+# Version of the built model layout, entries of other versions are outdated
+MODEL_CACHE_VERSION = 2
+
+# Define on-disk cache of built models
+class ModelCache:
+    def __init__(self, cache_path = None, max_size = 2 * 1024 ** 3):
+        # Every entry is a directory with the compressed MPS file, the column names, the integer columns, the layout columns and a manifest
+        self.project_path = os.path.dirname(os.path.realpath("__file__"))
+        self.cache_path = cache_path if cache_path is not None else self.project_path + "/research_data/model_cache"
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.read_time = 0.0
+        self.write_time = 0.0
+        os.makedirs(self.cache_path, exist_ok = True)
+
+    def key(self, index_model, build_options):
+        # Content hash of the instance data, the scenario probabilities and the formulation options
+        key_hash = hashlib.sha256()
+        key_hash.update(json.dumps({"version": MODEL_CACHE_VERSION, "problem_instance_id": index_model.problem_instance_id, "compact": index_model.compact, "options": build_options,
+                                    "probability": sorted((str(scenario), float(probability)) for scenario, probability in index_model.scenario_probability.items())}, sort_keys = True).encode("utf-8"))
+        for data_key in sorted(index_model.data):
+            frame = index_model.data[data_key]
+            key_hash.update(("%s|%s" % (data_key, ",".join(str(column) for column in frame.columns))).encode("utf-8"))
+            key_hash.update(pd.util.hash_pandas_object(frame, index = False).to_numpy().tobytes())
+        return key_hash.hexdigest()[:32]
+
+    def read(self, key, m):
+        # Load the built model of an entry into the MLCLSP-L-B, returns False on a cache miss
+        st = time.time()
+        entry_path = self.cache_path + "/" + key
+        # The shared lock keeps the entry from being evicted by a parallel writer while its files are read
+        with cache_lock(self.cache_path, shared = True):
+            if not os.path.exists(entry_path + "/manifest.json"):
+                self.misses += 1
+                self.record("misses")
+                return False
+            with open(entry_path + "/manifest.json", "r") as f:
+                manifest = json.load(f)
+            m.model.read(entry_path + "/" + manifest["model_file"])
+            column_names = np.load(entry_path + "/column_names.npy")
+            integer_columns = np.load(entry_path + "/integer_columns.npy")
+            layout_columns = np.load(entry_path + "/layout_columns.npy")
+            # Mark entry as recently used for the eviction
+            os.utime(entry_path + "/manifest.json")
+
+        # Columns are matched by their name in the MPS file, CBC writes generic names C0000000, C0000001, ... for models without names
+        position = {(name if manifest["names"] else "C%07d" % i): i for i, name in enumerate(column_names.tolist())}
+        columns = [position[var.name] for var in m.model.vars]
+
+        # Columns without coefficients and objective are not written to the MPS file, they are added again at zero
+        dropped = sorted(set(range(len(column_names))) - set(columns))
+        for i in dropped:
+            m.model.add_var(name = column_names[i] if manifest["names"] else "", ub = 0.0)
+        columns = np.array(columns + dropped, dtype = np.int64)
+        model_column = np.empty(len(columns), dtype = np.int64)
+        model_column[columns] = np.arange(len(columns))
+        integer_columns = integer_columns[~np.isin(integer_columns[:, 0], dropped)]
+        integer_columns[:, 0] = model_column[integer_columns[:, 0]]
+        m.array_model = CachedModelLayout(column_names[columns], integer_columns, manifest["products"], layout_columns[columns])
+        m.variables = None
+        m.constraints = None
+        self.hits += 1
+        self.record("hits")
+        self.read_time += time.time() - st
+        print("Read built model of problem instance %s from model cache %s" % (m.problem_instance_id, key))
+        return True
+
+    def write(self, key, m):
+        # Store the built model of the MLCLSP-L-B with its column names and integer columns
+        st = time.time()
+        entry_path = self.cache_path + "/" + key
+        tmp_path = entry_tmp_path(self.cache_path, key)
+
+        # CBC compresses MPS files and appends its own extensions
+        m.model.write(tmp_path + "/model.mps")
+        model_file = os.path.basename(sorted(glob.glob(tmp_path + "/model.mps*"))[0])
+        products = sorted(m.products)
+        product_idx = {product: i for i, product in enumerate(products)}
+        integer_columns = np.array([(var.idx, product_idx[product], period) for var, product, period in m.integer_variables()], dtype = np.int64).reshape(-1, 3)
+        np.save(tmp_path + "/column_names.npy", np.array([m.column_name(var.idx) for var in m.model.vars], dtype = str))
+        np.save(tmp_path + "/integer_columns.npy", integer_columns)
+        np.save(tmp_path + "/layout_columns.npy", m.solution_layout()[1])
+        manifest = {"problem_instance_id": m.problem_instance_id, "scenarios": m.S, "version": MODEL_CACHE_VERSION, "options": m.build_options, "model_file": model_file,
+                    "rows": m.model.num_rows, "columns": m.model.num_cols, "products": products,
+                    "names": m.has_names()}
+        with open(tmp_path + "/manifest.json", "w") as f:
+            json.dump(manifest, f)
+
+        # Install the entry at once, readers and parallel writers never see an incomplete entry
+        with cache_lock(self.cache_path):
+            install_entry(tmp_path, entry_path)
+            self.evict(keep = key)
+        self.write_time += time.time() - st
+        print("Stored built model of problem instance %s in model cache %s" % (m.problem_instance_id, key))
+
+    def record(self, counter):
+        # Hits and misses of all runs are appended as one line per lookup to the statistics file of the cache
+        append_line(self.cache_path + "/statistics.log", counter)
+
+    def statistics(self):
+        # Hits and misses of this cache object and of all runs with size and number of entries
+        statistics_path = self.cache_path + "/statistics.log"
+        total = {"hits": 0, "misses": 0}
+        if os.path.exists(statistics_path):
+            with open(statistics_path, "r") as f:
+                for line in f:
+                    if line.strip() in total:
+                        total[line.strip()] += 1
+        entries = self.entries()
+        lookups = total["hits"] + total["misses"]
+        return {"Hits": self.hits, "Misses": self.misses, "ReadTime": self.read_time, "WriteTime": self.write_time, "TotalHits": total["hits"], "TotalMisses": total["misses"],
+                "TotalHitRate": total["hits"] / lookups if lookups > 0 else None, "Entries": len(entries), "Size": sum(entry["size"] for entry in entries)}
+
+    def entries(self):
+        # Cache entries with manifest, size and time of last use
+        entries = list()
+        for key in os.listdir(self.cache_path):
+            entry_path = self.cache_path + "/" + key
+            # Temporary directories of writers are not entries
+            if key.endswith(".tmp") or not os.path.exists(entry_path + "/manifest.json"):
+                continue
+            with open(entry_path + "/manifest.json", "r") as f:
+                manifest = json.load(f)
+            size = sum(os.path.getsize(entry_path + "/" + file_name) for file_name in os.listdir(entry_path))
+            entries.append({"key": key, "problem_instance_id": manifest["problem_instance_id"], "version": manifest["version"], "size": size,
+                            "last_used": os.path.getmtime(entry_path + "/manifest.json")})
+        return entries
+
+    def evict(self, keep = None):
+        # Called with the exclusive lock held. Remove entries of outdated versions and least recently used entries above the maximum cache size
+        entries = sorted(self.entries(), key = lambda x: x["last_used"])
+        for entry in [entry for entry in entries if entry["version"] != MODEL_CACHE_VERSION]:
+            self.remove(entry["key"])
+            entries.remove(entry)
+        size = sum(entry["size"] for entry in entries)
+        for entry in entries:
+            if size <= self.max_size:
+                break
+            if entry["key"] == keep:
+                continue
+            self.remove(entry["key"])
+            size -= entry["size"]
+
+    def invalidate(self, problem_instance_id = None):
+        # Remove all entries or all entries of a problem instance
+        with cache_lock(self.cache_path):
+            for entry in self.entries():
+                if problem_instance_id is None or entry["problem_instance_id"] == problem_instance_id:
+                    self.remove(entry["key"])
+
+    def remove(self, key):
+        shutil.rmtree(self.cache_path + "/" + key, ignore_errors = True)
+        print("Removed entry %s from model cache" % (key))
+
+
+# Define column layout of a cached model, replaces the array layout for reading solutions and integer columns
+class CachedModelLayout:
+    def __init__(self, column_names, integer_columns, products, layout_columns):
+        # Layout columns are the positions of the model columns in the array layout (see MLCLSP_L_B.solution_layout)
+        self.column_names = column_names
+        self.integer_column_index = integer_columns
+        self.products = products
+        self.layout_columns = layout_columns
+
+    def column_name(self, idx):
+        return str(self.column_names[idx])
+
+    def integer_columns(self):
+        return self.integer_column_index[:, 0], self.integer_column_index[:, 1], self.integer_column_index[:, 2]
@@ -1,10 +1,45 @@
 # -*- coding: utf-8 -*-
 from sqlalchemy import create_engine
 import pandas as pd
-from pyxlsb import convert_date
+import numpy as np
+from lib.prepare_data_in_memory import read_workbook
+from lib import instrumentation
 import json
 import os
-import tempfile
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Column types of the EER model views, ids are categorical, quantities are float64 and periods are int64
+ID, QUANTITY, PERIOD, DATE = "category", "float64", "int64", "datetime64[ns]"
+VIEW_SCHEMA = {
+    "probleminstance": {"ProblemInstanceId": ID, "ProblemInstanceName": ID, "SimulationInstanceId": ID, "SimulationInstanceName": ID, "ProductionStages": "Int64"},
+    "capacity": {"ProblemInstanceId": ID, "SimulationInstanceId": ID, "MachineId": ID, "PlanningDate": DATE, "PlanningPeriod": PERIOD, "PlanningBuckets": ID, "CapacityPerPeriod": QUANTITY},
+    "demand": {"ProblemInstanceId": ID, "SimulationInstanceId": ID, "MaterialId": ID, "DeliveryDate": DATE, "Quantity": QUANTITY, "PlanningPeriod": PERIOD, "BaseUOM": ID, "BaseCurrency": ID},
+    "material": {"ProblemInstanceId": ID, "MaterialId": ID, "BaseUOM": ID, "ShelfLifeTolerance": QUANTITY, "AlphaServiceLevelTarget": QUANTITY, "BetaServiceLevelTarget": QUANTITY,
+                 "BaseCurrency": ID, "MaterialType": ID},
+    "material_cost": {"ProblemInstanceId": ID, "MaterialId": ID, "LostSales": QUANTITY, "Destruction": QUANTITY, "InventoryHolding": QUANTITY, "Backorder": QUANTITY, "PlanningDate": DATE,
+                      "PlanningPeriod": PERIOD},
+    "material_type": {"ProblemInstanceId": ID, "MaterialId": ID, "AlphaServiceLevelTarget": QUANTITY, "ShelfLifeTolerance": QUANTITY, "BetaServiceLevelTarget": QUANTITY, "BaseUOM": ID,
+                      "BaseCurrency": ID, "MaterialType": ID},
+    "planning_period": {"ProblemInstanceId": ID, "PlanningStartDate": DATE, "PlanningEndDate": DATE, "PlanningBuckets": ID, "PlanningDate": DATE, "PlanningDateIntervalEnd": DATE,
+                        "PlanningPeriod": PERIOD},
+    "production": {"ProblemInstanceId": ID, "MachineId": ID, "MaterialId": ID, "PlanningDate": DATE, "PlanningPeriod": PERIOD, "LeadTime": QUANTITY, "ProductionTimePerBaseUOM": QUANTITY,
+                   "ProductionCostPerBaseUOM": QUANTITY, "BatchSizeFix": QUANTITY, "LotSizeMin": QUANTITY, "LotSizeMax": QUANTITY, "ShelfLifeFix": QUANTITY, "ShelfLifeType": ID},
+    "production_structures": {"ProblemInstanceId": ID, "MachineIdGoodsReceived": ID, "GoodsReceived": ID, "MachineIdGoodsIssued": ID, "GoodsIssued": ID, "PlanningDate": DATE,
+                              "PlanningPeriod": PERIOD, "BOMAlternative": ID, "Ratio": QUANTITY, "ScrapFix": QUANTITY, "ScrapVariable": QUANTITY, "ShelfLifeVariable": QUANTITY},
+    "product_to_line": {"ProblemInstanceId": ID, "MachineId": ID, "MaterialId": ID},
+    "setup_matrix": {"ProblemInstanceId": ID, "MachineId": ID, "MaterialId": ID, "PlanningDate": DATE, "PlanningPeriod": PERIOD, "SetupTime": QUANTITY, "SetupCost": QUANTITY},
+    "initial_lot_sizing_values": {"ProblemInstanceId": ID, "SimulationInstanceId": ID, "MaterialId": ID, "InitialInventory": QUANTITY, "InitialBackorder": QUANTITY, "FinalInventory": QUANTITY},
+    "initial_linked_lot_sizing_values": {"ProblemInstanceId": ID, "SimulationInstanceId": ID, "MachineId": ID, "MaterialId": ID, "InitialLinkedLotSize": PERIOD},
+    "max_production_quantity": {"ProblemInstanceId": ID, "SimulationInstanceId": ID, "MachineId": ID, "MaterialId": ID, "PlanningPeriod": PERIOD, "BigM": QUANTITY}
+}
+
+# Views that only depend on the problem instance
+PROBLEM_INSTANCE_VIEWS = ["material", "material_cost", "material_type", "planning_period", "production", "production_structures", "product_to_line", "setup_matrix"]
+
+# Views that mostly repeat the same rows for every simulation instance
+SCENARIO_SHARED_VIEWS = ["capacity", "max_production_quantity", "initial_lot_sizing_values", "initial_linked_lot_sizing_values"]
 
 class ModelClient:
     def __init__(self, problem_instance_id = None, simulation_instance_ids = [], load_connection = True):
@@ -39,40 +74,112 @@ class ModelClient:
             {"view": "V_MaxProductionQuantity", "data_key": "max_production_quantity"}
         ]
         self.table_names = ["ProblemInstance", "SimulationInstance", "Material", "Capacity", "Demand", "MaterialCost", "SetupMatrix", "BOMHeader", "BOMItem", "InitialLotSizingValues"]
+        # Rows per second of every copied table
+        self.upload_report = list()
 
     def set_problem_instance_id(self, problem_instance_id: str):
         self.problem_instance_id = problem_instance_id
 
-    def load_disk_data(self, data_dict):
+    def load_disk_data(self, data_dict, copy = True):
         for key, data in data_dict.items():
-            
-            self.data[key] = data.copy()
+            # Frames of the disk cache are not shared with the caller and stay memory-mapped without a copy
+            self.data[key] = data.copy() if copy else data
             print("Read data %s from disk sucessfully" % key)
 
     def upload_data(self, excel_path, problem_instance_id = None):
         if problem_instance_id is not None:
             self.problem_instance_id = problem_instance_id
+        self.upload_workbook(excel_path, [self.problem_instance_id])
 
-        self.truncate_data()
-        all_spreadsheets = pd.ExcelFile(self.project_path + excel_path).sheet_names
-
-        for table_name in self.table_names:
-            if table_name not in all_spreadsheets:
-                print("Info: Spreadsheet %s of the EER model was not found, using default values instead" % table_name)
+    def upload_workbook(self, excel_path, problem_instance_ids: list, use_copy = True, defer_constraints = False):
+        # Parse the workbook once and upload all problem instances from the partitioned sheets
+        tables = read_workbook(self.project_path + excel_path, problem_instance_ids, self.table_names)
+        self.upload_report = list()
+        for problem_instance_id in problem_instance_ids:
+            self.problem_instance_id = problem_instance_id
+            if use_copy:
+                self.copy_data(tables[problem_instance_id], defer_constraints)
                 continue
-            data = pd.read_excel(self.project_path + excel_path, sheet_name = table_name)
-            if "ValidityDateTo" in data.columns:
-                data["ValidityDateTo"] = data.apply(lambda x: convert_date(x['ValidityDateTo']), axis=1)
-            if "ValidityDateFrom" in data.columns:
-                data["ValidityDateFrom"] = data.apply(lambda x: convert_date(x['ValidityDateFrom']), axis=1)
-            if "DeliveryDate" in data.columns:
-                data["DeliveryDate"] = data.apply(lambda x: convert_date(x['DeliveryDate']), axis=1)
-            data = data[data["ProblemInstanceId"] == self.problem_instance_id]
-            with self.engine.begin() as connection:
-                data.to_sql(table_name, con = connection, if_exists = "append", index = False)
-                print("Uploaded data to table %s succesfully with problem instance id %s" % (table_name, self.problem_instance_id))
 
-    def truncate_data(self, delete_all = False):
+            # Fallback with row-batched inserts, the materialized views are refreshed once after the upload
+            self.truncate_data(refresh = False)
+            for table_name in self.table_names:
+                if table_name not in tables[problem_instance_id]:
+                    print("Info: Spreadsheet %s of the EER model was not found, using default values instead" % table_name)
+                    continue
+                with self.engine.begin() as connection:
+                    tables[problem_instance_id][table_name].to_sql(table_name, con = connection, if_exists = "append", index = False)
+                    print("Uploaded data to table %s succesfully with problem instance id %s" % (table_name, self.problem_instance_id))
+            self.refresh_views()
+
+    def copy_data(self, tables, defer_constraints = False):
+        # Load all tables of a problem instance with COPY FROM STDIN in a single transaction
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if defer_constraints:
+                # Foreign keys are checked on commit, the template tables have no secondary indexes besides their primary keys
+                cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+
+            tables_to_delete = self.table_names.copy()
+            tables_to_delete.reverse()
+            for table_name in tables_to_delete:
+                cursor.execute("DELETE FROM \"%s\" WHERE \"ProblemInstanceId\" = %%s" % (table_name), (self.problem_instance_id,))
+
+            for table_name in self.table_names:
+                if table_name not in tables:
+                    print("Info: Spreadsheet %s of the EER model was not found, using default values instead" % table_name)
+                    continue
+                st = time.time()
+                rows = self.__copy_frame(cursor, table_name, tables[table_name])
+                et = time.time()
+                rows_per_second = rows / max(et - st, 1e-9)
+                self.upload_report.append({"ProblemInstance": self.problem_instance_id, "Table": table_name, "Rows": rows, "UploadTime": et - st, "RowsPerSecond": rows_per_second})
+                print("Copied %s rows to table %s succesfully with problem instance id %s (%s rows per second)" % (rows, table_name, self.problem_instance_id, rows_per_second))
+
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        self.refresh_views()
+
+    def copy_results(self, tables):
+        # Replace the results of the problem instance with COPY FROM STDIN in a single transaction
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for table_name in tables:
+                cursor.execute("DELETE FROM \"%s\" WHERE \"ProblemInstanceId\" = %%s" % (table_name), (self.problem_instance_id,))
+            for table_name, data in tables.items():
+                st = time.time()
+                rows = self.__copy_frame(cursor, table_name, data)
+                et = time.time()
+                print("Copied %s rows to table %s succesfully with problem instance id %s (%s rows per second)" % (rows, table_name, self.problem_instance_id, rows / max(et - st, 1e-9)))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    def __copy_frame(self, cursor, table_name, data):
+        # Stream a frame through an in-memory CSV buffer in the column order of the target table
+        cursor.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position", (table_name,))
+        columns = [(column_name, data_type) for column_name, data_type in cursor.fetchall() if column_name in data.columns]
+        data = data[[column_name for column_name, data_type in columns]].copy()
+        for column_name, data_type in columns:
+            if data_type in ["smallint", "integer", "bigint"]:
+                data[column_name] = data[column_name].astype("Int64")
+
+        buffer = io.StringIO()
+        data.to_csv(buffer, header = False, index = False, na_rep = "\\N")
+        buffer.seek(0)
+        cursor.copy_expert("COPY \"%s\" (%s) FROM STDIN WITH (FORMAT csv, NULL '\\N')" % (table_name, ", ".join("\"%s\"" % column_name for column_name, data_type in columns)), buffer)
+        return data.shape[0]
+
+    def truncate_data(self, delete_all = False, refresh = True):
         tables_to_truncate = self.table_names.copy()
         tables_to_truncate.reverse()
         for table_name in tables_to_truncate:
@@ -83,29 +190,147 @@ class ModelClient:
                 else:
                     connection.execute("DELETE FROM \"%s\" WHERE \"ProblemInstanceId\" = '%s'" % (table_name, self.problem_instance_id))
                     print("Deleted data in table %s succesfully for the problem instance %s" % (table_name, self.problem_instance_id))
+        if refresh:
+            self.refresh_views(delete_all)
+
+    def refresh_views(self, delete_all = False):
+        # Refresh the materialized views of the problem instance, databases without materialized views are skipped
+        with self.engine.begin() as connection:
+            if connection.execute("SELECT to_regclass('\"%s\"')" % (materialized_view(self.data_def[0]["view"]))).scalar() is None:
+                return
+            for data_dict in self.data_def:
+                if delete_all:
+                    connection.execute("TRUNCATE TABLE \"%s\"" % (materialized_view(data_dict["view"])))
+                    continue
+                connection.execute("DELETE FROM \"%s\" WHERE \"ProblemInstanceId\" = '%s'" % (materialized_view(data_dict["view"]), self.problem_instance_id))
+                connection.execute("INSERT INTO \"%s\" SELECT * FROM \"%s\" WHERE \"ProblemInstanceId\" = '%s'" % (materialized_view(data_dict["view"]), data_dict["view"], self.problem_instance_id))
+        print("Refreshed materialized views succesfully for the problem instance %s" % (self.problem_instance_id))
 
-    def load_data(self):
+    def load_data(self, concurrency = 4, materialized = False, shared = False):
         si_filter = list()
         for i in self.simulation_instance_ids:
             si_filter.append("'" + i + "'")
 
-        connection = self.engine.raw_connection()
+        queries = dict()
         for data_dict in self.data_def:
+            # Read from the materialized views instead of re-executing the view chain
+            view = materialized_view(data_dict["view"]) if materialized else data_dict["view"]
             # Problem instance dependent views
-            if (len(self.simulation_instance_ids) == 0) | (data_dict["data_key"] in ["material", "material_cost", "material_type", "planning_period",
-                                         "production", "production_structures", "product_to_line", "setup_matrix"]):
-                self.data[data_dict["data_key"]] = self.__read_sql_tmpfile(conn = connection, query = "SELECT * FROM \"%s\" where \"ProblemInstanceId\" = '%s'" % (data_dict["view"], self.problem_instance_id))
+            if (len(self.simulation_instance_ids) == 0) | (data_dict["data_key"] in PROBLEM_INSTANCE_VIEWS):
+                queries[data_dict["data_key"]] = "SELECT * FROM \"%s\" where \"ProblemInstanceId\" = '%s'" % (view, self.problem_instance_id)
             # Problem and simulation instance dependent views
             else:
-                self.data[data_dict["data_key"]] = self.__read_sql_tmpfile(conn = connection, query = "SELECT * FROM \"%s\" where \"ProblemInstanceId\" = '%s' AND \"SimulationInstanceId\" IN (%s)" % (data_dict["view"], self.problem_instance_id, ",".join(si_filter)))
-            
-            print("Loaded model %s succesfully" % (data_dict["data_key"]))
-
-    def __read_sql_tmpfile(self, conn, query):
-        with tempfile.TemporaryFile() as tmpfile:
-            copy_sql = "COPY ({query}) TO STDOUT WITH CSV {head}".format(query=query, head="HEADER")
-            cur = conn.cursor()
-            cur.copy_expert(copy_sql, tmpfile)
-            tmpfile.seek(0)
-            df = pd.read_csv(tmpfile)
-            return df
\ No newline at end of file
+                queries[data_dict["data_key"]] = "SELECT * FROM \"%s\" where \"ProblemInstanceId\" = '%s' AND \"SimulationInstanceId\" IN (%s)" % (view, self.problem_instance_id, ",".join(si_filter))
+
+        # Rows of all simulation instances are fetched once, only rows that differ keep their list of simulation instances
+        schemas = {data_key: VIEW_SCHEMA[data_key] for data_key in queries}
+        if shared:
+            scenario_count = len(si_filter) if len(si_filter) > 0 else "(SELECT COUNT(*) FROM \"SimulationInstance\" WHERE \"ProblemInstanceId\" = '%s')" % (self.problem_instance_id)
+            for data_key in SCENARIO_SHARED_VIEWS:
+                columns = ", ".join("\"%s\"" % column for column in VIEW_SCHEMA[data_key] if column != "SimulationInstanceId")
+                queries[data_key] = "SELECT %s, CASE WHEN COUNT(*) = %s THEN NULL ELSE STRING_AGG(\"SimulationInstanceId\", ',') END AS \"SimulationInstanceIds\" FROM (%s) AS v GROUP BY %s" % (
+                    columns, scenario_count, queries[data_key], columns)
+                schemas[data_key] = {column: dtype for column, dtype in VIEW_SCHEMA[data_key].items() if column != "SimulationInstanceId"}
+                schemas[data_key]["SimulationInstanceIds"] = "object"
+
+        # Views are independent, each worker fetches a view on a connection of the engine pool
+        self.view_latency = list()
+        with ThreadPoolExecutor(max_workers = max(concurrency, 1)) as executor:
+            futures = {data_key: executor.submit(self.__read_view, query, schemas[data_key]) for data_key, query in queries.items()}
+            for data_dict in self.data_def:
+                self.data[data_dict["data_key"]], latency = futures[data_dict["data_key"]].result()
+                self.view_latency.append({"View": data_dict["view"], "Rows": self.data[data_dict["data_key"]].shape[0], "Latency": latency})
+                instrumentation.emit("view_fetch", problem_instance_id = self.problem_instance_id, view = data_dict["view"], rows = self.data[data_dict["data_key"]].shape[0],
+                                     latency = latency, materialized = materialized, shared = shared)
+                print("Loaded model %s succesfully" % (data_dict["data_key"]))
+
+        slowest_views = sorted(self.view_latency, key = lambda x: x["Latency"], reverse = True)[:3]
+        print("Slowest views: %s" % (", ".join("%s (%s seconds)" % (view["View"], view["Latency"]) for view in slowest_views)))
+
+    def load_scenario_data(self, simulation_instance_ids: list, concurrency = 4, materialized = False):
+        # Rows of the simulation instance dependent views for the given simulation instances only, problem instance dependent views are not fetched again
+        si_filter = ",".join("'" + i + "'" for i in simulation_instance_ids)
+        queries = dict()
+        views = {data_dict["data_key"]: data_dict["view"] for data_dict in self.data_def}
+        for data_dict in self.data_def:
+            if data_dict["data_key"] in PROBLEM_INSTANCE_VIEWS:
+                continue
+            view = materialized_view(data_dict["view"]) if materialized else data_dict["view"]
+            queries[data_dict["data_key"]] = "SELECT * FROM \"%s\" where \"ProblemInstanceId\" = '%s' AND \"SimulationInstanceId\" IN (%s)" % (view, self.problem_instance_id, si_filter)
+
+        data = dict()
+        with ThreadPoolExecutor(max_workers = max(concurrency, 1)) as executor:
+            futures = {data_key: executor.submit(self.__read_view, query, VIEW_SCHEMA[data_key]) for data_key, query in queries.items()}
+            for data_key, future in futures.items():
+                data[data_key], latency = future.result()
+                instrumentation.emit("view_fetch", problem_instance_id = self.problem_instance_id, view = views[data_key], rows = data[data_key].shape[0], latency = latency,
+                                     materialized = materialized, shared = False, simulation_instances = len(simulation_instance_ids))
+        print("Loaded %s simulation instances succesfully" % (len(simulation_instance_ids)))
+        return data
+
+    def __read_view(self, query, schema):
+        st = time.time()
+        connection = self.engine.raw_connection()
+        try:
+            data = self.__read_sql_buffer(conn = connection, query = query, schema = schema)
+        finally:
+            connection.close()
+        return data, time.time() - st
+
+    def __read_sql_buffer(self, conn, query, schema):
+        # Stream the COPY output into an in-memory buffer and parse it with the explicit column types of the view
+        buffer = io.BytesIO()
+        copy_sql = "COPY ({query}) TO STDOUT WITH CSV {head}".format(query=query, head="HEADER")
+        cur = conn.cursor()
+        cur.copy_expert(copy_sql, buffer)
+        buffer.seek(0)
+        dates = [column for column, dtype in schema.items() if dtype == DATE]
+        df = pd.read_csv(buffer, dtype = {column: dtype for column, dtype in schema.items() if dtype != DATE})
+        buffer.close()
+        for column in dates:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], format = "%Y-%m-%d")
+        return df
+
+
+# %% Helper functions
+def materialized_view(view):
+    # Materialized view of a view of the EER model, e.g. V_Capacity -> MV_Capacity
+    return "MV_" + view[2:]
+
+
+def share_scenarios(data, scenarios: list):
+    # Rows that are equal for all scenarios are kept once without 'SimulationInstanceIds', the other rows list their scenarios
+    columns = [column for column in data.columns if column != "SimulationInstanceId"]
+    group = data.groupby(columns, dropna = False, sort = False, observed = True).ngroup().to_numpy()
+    shared = np.bincount(group)[group] == len(scenarios)
+    base = data.loc[shared, columns].drop_duplicates()
+    base["SimulationInstanceIds"] = np.nan
+    delta = data.loc[~shared].astype({"SimulationInstanceId": str}).groupby(columns, dropna = False, sort = False, observed = True)["SimulationInstanceId"].agg(",".join)
+    delta = delta.reset_index().rename(columns = {"SimulationInstanceId": "SimulationInstanceIds"})
+    return pd.concat([base, delta], ignore_index = True)
+
+
+def expand_scenarios(data, scenarios: list):
+    # Repeat the rows of all scenarios and split the scenario lists of the other rows
+    shared = data["SimulationInstanceIds"].isnull()
+    base = data[shared].loc[data.index[shared].repeat(len(scenarios))].drop(columns = ["SimulationInstanceIds"])
+    base.insert(1, "SimulationInstanceId", np.tile(np.asarray(scenarios, dtype = object), shared.sum()))
+    delta = data[~shared].assign(SimulationInstanceId = data.loc[~shared, "SimulationInstanceIds"].astype(str).str.split(",")).explode("SimulationInstanceId").drop(columns = ["SimulationInstanceIds"])
+    delta = delta[base.columns]
+    return pd.concat([base, delta], ignore_index = True)
+
+
+def select_scenarios(data, scenarios: list):
+    # Rows of a subset of the simulation instances, rows shared by all scenarios remain shared
+    scenario_ids = set(str(scenario) for scenario in scenarios)
+    selection = dict()
+    for key, frame in data.items():
+        if "SimulationInstanceIds" in frame.columns:
+            shared = frame["SimulationInstanceIds"].isnull()
+            ids = frame["SimulationInstanceIds"].astype(str).str.split(",").map(lambda x: ",".join(i for i in x if i in scenario_ids))
+            frame = frame.assign(SimulationInstanceIds = ids.where(~shared, np.nan))[(shared | (ids != "")).to_numpy()]
+        elif "SimulationInstanceId" in frame.columns:
+            frame = frame[frame["SimulationInstanceId"].astype(str).isin(scenario_ids).to_numpy()]
+        selection[key] = frame
+    return selection
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import csv
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Phases of an experiment run, a phase starts when all jobs of the previous phase are finished
+EXPERIMENT_PHASES = ["UPLOAD", "INSTANTIATE", "SOLVE"]
+# Loading types of the instantiation jobs, DISK_CACHE reads the prepared data from the disk cache
+LOADING_TYPES = ["DISK", "DISK_CACHE", "DB"]
+# Columns of the job store, every job appends one row
+JOB_COLUMNS = ["JobId", "Phase", "Source", "ProblemInstance", "DataPath", "LoadingType", "Status", "Worker", "StartTime", "ExecutionTime", "Scenarios", "ObjectiveValue",
+               "LowerBound", "OptimizationState", "Error"]
+
+# Define parallel orchestrator of the upload, instantiation and solve experiments
+class ExperimentOrchestrator:
+    def __init__(self, problem_instances_path = None, store_path = None, workers = None, max_connections = 16):
+        # Jobs are generated from ProblemInstances.csv and run in a process pool, every job runs in a fresh worker process with its own DB connections
+        self.project_path = os.path.dirname(os.path.realpath("__file__"))
+        self.problem_instances_path = problem_instances_path if problem_instances_path is not None else self.project_path + "/ProblemInstances.csv"
+        self.store_path = store_path if store_path is not None else self.project_path + "/logs/experiments/jobs.csv"
+        self.log_path = os.path.dirname(self.store_path) + "/jobs"
+
+        # Workers and solver threads together do not exceed the cores, views are fetched by at most max_connections connections in total
+        cores = os.cpu_count()
+        self.workers = max(1, min(workers if workers is not None else cores, cores))
+        self.solver_threads = max(1, cores // self.workers)
+        self.concurrency = max(1, min(4, max_connections // self.workers))
+
+        with open(self.problem_instances_path, "r") as f:
+            rows = [row for row in csv.reader(line.replace("\r", "") for line in f) if len(row) == 3]
+        self.problem_instances = [{"Source": source.strip(), "ProblemInstance": problem_instance.strip(), "DataPath": data_path.strip()} for source, problem_instance, data_path in rows]
+
+    def jobs(self, phases, loading_types = ["DISK", "DB"], ct_limit = 600, build_options = dict()):
+        # Upload jobs parse a workbook once for all of its problem instances, instantiation and solve jobs run per problem instance
+        jobs = list()
+        if "UPLOAD" in phases:
+            workbooks = dict()
+            for row in self.problem_instances:
+                workbooks.setdefault(row["DataPath"], list()).append(row)
+            for data_path, rows in workbooks.items():
+                problem_instances = list(dict.fromkeys(row["ProblemInstance"] for row in rows))
+                jobs.append({"JobId": "UPLOAD|%s" % (data_path), "Phase": "UPLOAD", "Source": rows[0]["Source"], "ProblemInstance": ",".join(problem_instances), "DataPath": data_path,
+                             "LoadingType": None})
+        if "INSTANTIATE" in phases:
+            for row in self.problem_instances:
+                for loading_type in loading_types:
+                    jobs.append({"JobId": "INSTANTIATE|%s|%s|%s" % (loading_type, row["Source"], row["ProblemInstance"]), "Phase": "INSTANTIATE", "LoadingType": loading_type, **row})
+        if "SOLVE" in phases:
+            for row in self.problem_instances:
+                jobs.append({"JobId": "SOLVE|%s|%s" % (row["Source"], row["ProblemInstance"]), "Phase": "SOLVE", "LoadingType": "DB", "CtLimit": ct_limit, "BuildOptions": build_options,
+                             **row})
+        return jobs
+
+    def run(self, phases = EXPERIMENT_PHASES, loading_types = ["DISK", "DB"], ct_limit = 600, build_options = dict(), resume = True):
+        for phase in phases:
+            if phase not in EXPERIMENT_PHASES:
+                raise ValueError("Unknown phase {}, choose from {}".format(phase, EXPERIMENT_PHASES))
+        for loading_type in loading_types:
+            if loading_type not in LOADING_TYPES:
+                raise ValueError("Unknown loading type {}, choose from {}".format(loading_type, LOADING_TYPES))
+
+        # Jobs that finished in a previous run are skipped after a crash
+        done = self.finished_jobs() if resume else set()
+        jobs = [job for job in self.jobs(phases, loading_types, ct_limit, build_options) if job["JobId"] not in done]
+        print("# %s jobs to run, %s jobs finished in previous runs, %s workers with %s solver threads each #" % (len(jobs), len(done), self.workers, self.solver_threads))
+
+        # BLAS and OpenMP libraries of the workers are limited to the solver threads
+        for variable in ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]:
+            os.environ[variable] = str(self.solver_threads)
+        os.makedirs(self.log_path, exist_ok = True)
+
+        st = time.time()
+        self.results = list()
+        failed_uploads = set()
+        for phase in EXPERIMENT_PHASES:
+            phase_jobs = [job for job in jobs if job["Phase"] == phase]
+            # Problem instances of a failed upload are not instantiated or solved from the DB
+            skipped = [job for job in phase_jobs if job["LoadingType"] == "DB" and job["DataPath"] in failed_uploads]
+            for job in skipped:
+                self.store(job_result(job, "SKIPPED", error = "Upload of %s failed" % (job["DataPath"])))
+            phase_jobs = [job for job in phase_jobs if job not in skipped]
+            if len(phase_jobs) == 0:
+                continue
+
+            # Every job runs in a fresh interpreter like the former shell loops, the parent process is the only writer of the job store
+            workers = min(self.workers, len(phase_jobs))
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers = workers, mp_context = context, max_tasks_per_child = 1) as executor:
+                futures = [executor.submit(run_job, job, self.solver_threads, self.concurrency, self.log_path) for job in phase_jobs]
+                for future in as_completed(futures):
+                    result = future.result()
+                    self.store(result)
+                    if result["Phase"] == "UPLOAD" and result["Status"] != "DONE":
+                        failed_uploads.add(result["DataPath"])
+                    print("# %s %s after %s seconds #" % (result["JobId"], result["Status"], result["ExecutionTime"]))
+        self.execution_time = time.time() - st
+        print("# %s jobs finished after %s seconds, %s failed #" % (len(self.results), self.execution_time, sum(1 for result in self.results if result["Status"] != "DONE")))
+        return self.results
+
+    def store(self, result):
+        # Rows are appended and flushed one by one, a crash leaves at most an incomplete last row
+        self.results.append(result)
+        os.makedirs(os.path.dirname(self.store_path), exist_ok = True)
+        new_file = not os.path.exists(self.store_path) or os.path.getsize(self.store_path) == 0
+        incomplete = False
+        if not new_file:
+            with open(self.store_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                incomplete = f.read(1) != b"\n"
+        with open(self.store_path, "a", newline = "") as f:
+            if incomplete:
+                f.write("\n")
+            writer = csv.DictWriter(f, fieldnames = JOB_COLUMNS, delimiter = ";", extrasaction = "ignore")
+            if new_file:
+                writer.writeheader()
+            writer.writerow(result)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def finished_jobs(self):
+        # Jobs with a complete row and status DONE in the job store, the last column of an incomplete row is missing
+        if not os.path.exists(self.store_path):
+            return set()
+        with open(self.store_path, "r", newline = "") as f:
+            rows = list(csv.DictReader(f, delimiter = ";"))
+        return {row["JobId"] for row in rows if row.get("Status") == "DONE" and row.get("Error") is not None}
+
+
+# %% Helper functions
+def job_result(job, status, worker = None, start_time = None, execution_time = None, error = None, **values):
+    result = {column: job.get(column) for column in ["JobId", "Phase", "Source", "ProblemInstance", "DataPath", "LoadingType"]}
+    result.update({"Status": status, "Worker": worker, "StartTime": start_time, "ExecutionTime": execution_time, "Error": error if error is not None else ""})
+    result.update(values)
+    return result
+
+
+def run_job(job, solver_threads, concurrency, log_path):
+    # Run a job in a worker process, the output of the job is written to its own log file
+    st = time.time()
+    log_file = log_path + "/" + job["JobId"].replace("|", "_").replace("/", "_") + ".log"
+    try:
+        with open(log_file, "w") as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+            if job["Phase"] == "UPLOAD":
+                values = upload_job(job)
+            elif job["Phase"] == "INSTANTIATE":
+                values = instantiate_job(job, concurrency)
+            else:
+                values = solve_job(job, solver_threads, concurrency)
+        return job_result(job, "DONE", os.getpid(), st, time.time() - st, **values)
+    except Exception as e:
+        with open(log_file, "a") as f:
+            f.write(traceback.format_exc())
+        return job_result(job, "FAILED", os.getpid(), st, time.time() - st, error = "%s: %s" % (type(e).__name__, str(e).splitlines()[0] if str(e) else ""))
+
+
+def upload_job(job):
+    from lib.model_client import ModelClient
+    problem_instance_ids = job["ProblemInstance"].split(",")
+    client = ModelClient(problem_instance_id = problem_instance_ids[0])
+    try:
+        client.upload_workbook(excel_path = job["DataPath"], problem_instance_ids = problem_instance_ids)
+    finally:
+        client.engine.dispose()
+    return dict()
+
+
+def instantiate_job(job, concurrency):
+    from lib.index_model import IndexModel
+    if job["LoadingType"] == "DB":
+        index_model = IndexModel(problem_instance_id = job["ProblemInstance"], load_connection = True, concurrency = concurrency)
+        index_model.engine.dispose()
+    elif job["LoadingType"] == "DISK_CACHE":
+        index_model = IndexModel(problem_instance_id = job["ProblemInstance"], load_connection = False, data_path = os.path.dirname(os.path.realpath("__file__")) + job["DataPath"])
+    else:
+        from lib.prepare_data_in_memory import DataDiskLoader
+        disk_load = DataDiskLoader(job["ProblemInstance"], os.path.dirname(os.path.realpath("__file__")) + job["DataPath"])
+        index_model = IndexModel(problem_instance_id = job["ProblemInstance"], load_connection = False, disk_data = disk_load.data_disk_load)
+    index_model.instantiate()
+    return {"Scenarios": index_model.S}
+
+
+def solve_job(job, solver_threads, concurrency):
+    from lib.MLCLSP_L_B import MLCLSP_L_B
+    st = time.time()
+    m = MLCLSP_L_B(problem_instance_id = job["ProblemInstance"], simulation_instance_ids = [], load_connection = True, concurrency = concurrency)
+    m.engine.dispose()
+    m.build(**job["BuildOptions"])
+    m.model.threads = solver_threads
+    # With one worker per core the solver runs single-threaded, the progress log of CBC is not stored then (see MLCLSP_L_B.solve)
+    m.solve(max_seconds = max(0, job["CtLimit"] - (time.time() - st)), progress_log = False)
+    return {"Scenarios": m.S, "ObjectiveValue": m.objective_value, "LowerBound": m.model_lb, "OptimizationState": m.optimzation_state}
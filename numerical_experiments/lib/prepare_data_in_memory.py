@@ -4,28 +4,45 @@ import pandas as pd
 import numpy as np
 from pyxlsb import convert_date
 
+# Version of the data preparation, increase if the derived views change
+LOADER_VERSION = 3
+# Columns with Excel serial dates
+DATE_COLUMNS = ["ValidityDateTo", "ValidityDateFrom", "DeliveryDate"]
+# Latest date of the in-memory preparation, later dates (e.g. the open-ended validity date 31.12.9999) exceed the nanosecond range of pandas
+MAX_DATE = pd.Timestamp.max.floor("D")
+
+# Spreadsheets of the data template
+SHEET_NAMES = ["ProblemInstance", "SimulationInstance", "Material", "Capacity", "Demand", "MaterialCost", "SetupMatrix", "BOMHeader", "BOMItem", "InitialLotSizingValues"]
+
 class DataDiskLoader():
-    def __init__(self, PROBLEM_INSTANCE, DATA_PATH):
+    def __init__(self, PROBLEM_INSTANCE, DATA_PATH, tables = None):
         # Store metadata
         self.PROBLEM_INSTANCE = PROBLEM_INSTANCE
         self.DATA_PATH = DATA_PATH
 
-        # Read data template
-        all_spreadsheets = pd.ExcelFile(DATA_PATH).sheet_names
-
-        ProblemInstance = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "ProblemInstance"))
-        SimulationInstance = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "SimulationInstance"))
-        Material = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "Material"))
-        Capacity = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "Capacity"))
-        Demand = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "Demand"))
-        MaterialCost = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "MaterialCost"))
-        SetupMatrix = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "SetupMatrix"))
-        BOMHeader = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "BOMHeader"))
-        BOMItem = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "BOMItem"))
-        if "InitialLotSizingValues" in all_spreadsheets:
-            InitialLotSizingValues = self.convert_dates(pd.read_excel(DATA_PATH, sheet_name = "InitialLotSizingValues"))
+        # Read data template, sheets of a batch ingestion are already partitioned by problem instance
+        if tables is None:
+            tables = read_workbook(DATA_PATH, [PROBLEM_INSTANCE])[PROBLEM_INSTANCE]
+        # Dates after MAX_DATE are set to MAX_DATE in the prepared data only, the uploaded sheets keep them
+        tables = {sheet_name: clamp_dates(data) for sheet_name, data in tables.items()}
+
+        ProblemInstance = tables["ProblemInstance"].copy()
+        SimulationInstance = tables["SimulationInstance"].copy()
+        Material = tables["Material"].copy()
+        Capacity = tables["Capacity"].copy()
+        Demand = tables["Demand"].copy()
+        MaterialCost = tables["MaterialCost"].copy()
+        SetupMatrix = tables["SetupMatrix"].copy()
+        BOMHeader = tables["BOMHeader"].copy()
+        BOMItem = tables["BOMItem"].copy()
+        if "InitialLotSizingValues" in tables:
+            InitialLotSizingValues = tables["InitialLotSizingValues"].copy()
         else:
-            InitialLotSizingValues = pd.DataFrame(columns=["ProblemInstanceId", "SimulationInstanceId", "MaterialId", "InitialInventory", "InitialBackorder"])
+            InitialLotSizingValues = pd.DataFrame(columns=["ProblemInstanceId", "SimulationInstanceId", "MaterialId", "MachineId", "InitialInventory", "InitialBackorder", "InitialLinkedLotSize"])
+        for column in ["MachineId", "InitialLinkedLotSize"]:
+            if column not in InitialLotSizingValues.columns:
+                InitialLotSizingValues[column] = None
+        InitialLotSizingValues["MachineId"] = InitialLotSizingValues["MachineId"].astype(object)
 
         # Fill default values
         Material["BaseUOM"] = np.where(Material["BaseUOM"].isnull(), "PC", Material["BaseUOM"])
@@ -51,6 +68,7 @@ class DataDiskLoader():
 
         InitialLotSizingValues["InitialInventory"] = np.where(InitialLotSizingValues["InitialInventory"].isnull(), 0.0, InitialLotSizingValues["InitialInventory"])
         InitialLotSizingValues["InitialBackorder"] = np.where(InitialLotSizingValues["InitialBackorder"].isnull(), 0.0, InitialLotSizingValues["InitialBackorder"])
+        InitialLotSizingValues["InitialLinkedLotSize"] = np.where(InitialLotSizingValues["InitialLinkedLotSize"].isnull(), 0, InitialLotSizingValues["InitialLinkedLotSize"]).astype(int)
 
         # Create V_PlanningBuckets
         planning_bucket = ProblemInstance["PlanningBuckets"].iloc[0]
@@ -90,8 +108,7 @@ class DataDiskLoader():
                     "PlanningBuckets", "PlanningDate", "PlanningPeriod"])
 
         # Create V_Capacity
-        V_Capacity = V_PlanningPeriod.merge(Capacity, how = "inner", on = ["ProblemInstanceId"])
-        V_Capacity = V_Capacity[(V_Capacity["ValidityDateTo"] >= V_Capacity["PlanningDate"]) & (V_Capacity["ValidityDateFrom"] <= V_Capacity["PlanningDate"])]
+        V_Capacity = interval_join(Capacity, V_PlanningPeriod, period_major = True)
         V_Capacity["DaysInPlanningHorizon"] = ((V_PlanningBuckets["PlanningEndDate"] - V_PlanningBuckets["PlanningStartDate"]).dt.days + 1).max()
         V_Capacity["CapacityDayRange"] = ((V_Capacity["ValidityDateTo"] - V_Capacity["ValidityDateFrom"]).dt.days + 1).max()
         V_Capacity["MaxPlanningPeriods"] = V_PlanningPeriod["PlanningPeriod"].max()
@@ -104,24 +121,21 @@ class DataDiskLoader():
             .rename(columns = {"MaterialIdFrom": "MaterialId"})
 
         # Create V_SetupMatrix
-        V_SetupMatrix = SetupMatrix.merge(V_PlanningPeriod, how = "inner", on = ["ProblemInstanceId"])
-        V_SetupMatrix = V_SetupMatrix[(V_SetupMatrix["ValidityDateTo"] >= V_SetupMatrix["PlanningDate"]) & (V_SetupMatrix["ValidityDateFrom"] <= V_SetupMatrix["PlanningDate"])]
+        V_SetupMatrix = interval_join(SetupMatrix, V_PlanningPeriod)
         V_SetupMatrix = V_SetupMatrix.groupby(["ProblemInstanceId", "MachineId", "MaterialIdFrom", "PlanningDate", "PlanningPeriod"])[["SetupTime", "SetupCost"]].agg(np.mean).reset_index() \
             .rename(columns = {"MaterialIdFrom": "MaterialId"}) \
             .filter(["ProblemInstanceId", "MachineId", "MaterialId", "PlanningDate", 
                     "PlanningPeriod", "SetupTime", "SetupCost"])
 
         # Create V_Production
-        V_Production = BOMHeader.merge(V_PlanningPeriod, how = "inner", on = ["ProblemInstanceId"])
-        V_Production = V_Production[(V_Production["ValidityDateTo"] >= V_Production["PlanningDate"]) & (V_Production["ValidityDateFrom"] <= V_Production["PlanningDate"])]
+        V_Production = interval_join(BOMHeader, V_PlanningPeriod)
         V_Production = V_Production.rename(columns = {"ProductionTime": "ProductionTimePerBaseUOM", "ProductionCost": "ProductionCostPerBaseUOM"})
         V_Production = V_Production.filter(["ProblemInstanceId", "MachineId", "MaterialId", "PlanningDate", "PlanningPeriod", 
                                             "LeadTime", "ProductionTimePerBaseUOM", "ProductionCostPerBaseUOM", "BatchSizeFix", 
                                             "LotSizeMin", "LotSizeMax", "ShelfLifeFix", "ShelfLifeType"])
 
         # Create V_ProductStructures
-        V_ProductStructures = BOMHeader.merge(V_PlanningPeriod, how = "inner", on = ["ProblemInstanceId"])
-        V_ProductStructures = V_ProductStructures[(V_ProductStructures["ValidityDateTo"] >= V_ProductStructures["PlanningDate"]) & (V_ProductStructures["ValidityDateFrom"] <= V_ProductStructures["PlanningDate"])]
+        V_ProductStructures = interval_join(BOMHeader, V_PlanningPeriod)
 
         production_structure_helper = BOMItem.merge(
                     BOMHeader[["ProblemInstanceId", "MaterialId", "MachineId"]].drop_duplicates(), 
@@ -174,10 +188,10 @@ class DataDiskLoader():
         V_Material = V_MaterialType[V_MaterialType["MaterialType"] != "RAW_MATERIAL"].copy()
 
         # Create V_MaterialCost
-        V_MaterialCost = MaterialCost.merge(V_PlanningPeriod, how = "inner", on = ["ProblemInstanceId"]) \
+        V_MaterialCost = interval_join(MaterialCost, V_PlanningPeriod) \
             .merge(V_Material, how = "inner", on = ["ProblemInstanceId", "MaterialId"])
 
-        V_MaterialCost = V_MaterialCost[(V_MaterialCost["ValidityDateTo"] >= V_MaterialCost["PlanningDate"]) & (V_MaterialCost["ValidityDateFrom"] <= V_MaterialCost["PlanningDate"]) & (~V_MaterialCost["InventoryHolding"].isnull()) & (~V_MaterialCost["Backorder"].isnull())]
+        V_MaterialCost = V_MaterialCost[(~V_MaterialCost["InventoryHolding"].isnull()) & (~V_MaterialCost["Backorder"].isnull())]
         V_MaterialCost = V_MaterialCost.filter(["ProblemInstanceId", "MaterialId", "InventoryHolding", "Backorder", "PlanningDate", "PlanningPeriod"])
 
         # Create V_PrimaryDemand
@@ -192,8 +206,7 @@ class DataDiskLoader():
         V_PrimaryDemand = V_PrimaryDemand[V_PrimaryDemand["PlanningDate"] <= V_PlanningBuckets["PlanningEndDate"].iloc[0]]
         V_PrimaryDemand["PlanningDateTo"] = date_range_demand_to[1:(V_PrimaryDemand.shape[0] + 1)].tolist()
         V_PrimaryDemand["ProblemInstanceId"] = PROBLEM_INSTANCE
-        V_PrimaryDemand = V_PrimaryDemand.merge(Demand, how = "inner", on = ["ProblemInstanceId"])
-        V_PrimaryDemand = V_PrimaryDemand[(V_PrimaryDemand["DeliveryDate"] >= V_PrimaryDemand["PlanningDate"]) & (V_PrimaryDemand["DeliveryDate"] < V_PrimaryDemand["PlanningDateTo"])]
+        V_PrimaryDemand = period_join(Demand, V_PrimaryDemand)
         V_PrimaryDemand = V_PrimaryDemand.merge(V_PeriodExpand, how = "right", on = ["ProblemInstanceId", "PlanningDate", "MaterialId", "SimulationInstanceId"])
         V_PrimaryDemand["Quantity"] = np.where(V_PrimaryDemand["Quantity"].isnull(), 0 , V_PrimaryDemand["Quantity"])
         V_PrimaryDemand = V_PrimaryDemand.groupby(["ProblemInstanceId", "SimulationInstanceId", "MaterialId", "PlanningDate", "PlanningPeriod"])["Quantity"].agg("sum").reset_index() \
@@ -223,6 +236,13 @@ class DataDiskLoader():
             .filter(["ProblemInstanceId", "SimulationInstanceId", "MaterialId", "InitialInventory", "InitialBackorder", "InitialLinkedLotSize"]) \
             .fillna(0)
 
+        # Create V_InitialLinkedLotSizingValues
+        V_InitialLinkedLotSizingValues = Material.merge(SimulationInstance, how = "inner", on = ["ProblemInstanceId"]) \
+            .merge(V_ProductToLine, how = "inner", on = ["ProblemInstanceId", "MaterialId"]) \
+            .merge(InitialLotSizingValues[["ProblemInstanceId", "SimulationInstanceId", "MaterialId", "MachineId", "InitialLinkedLotSize"]], how = "left", on = ["ProblemInstanceId", "SimulationInstanceId", "MaterialId", "MachineId"]) \
+            .filter(["ProblemInstanceId", "SimulationInstanceId", "MachineId", "MaterialId", "InitialLinkedLotSize"])
+        V_InitialLinkedLotSizingValues["InitialLinkedLotSize"] = np.where(V_InitialLinkedLotSizingValues["InitialLinkedLotSize"].isnull(), 0, V_InitialLinkedLotSizingValues["InitialLinkedLotSize"]).astype(int)
+
         # Save data
         self.ProblemInstance = ProblemInstance
         self.SimulationInstance = SimulationInstance
@@ -248,6 +268,7 @@ class DataDiskLoader():
         self.V_ProductToLine = V_ProductToLine
         self.V_SetupMatrix = V_SetupMatrix
         self.V_InitialLotSizingValues = V_InitialLotSizingValues
+        self.V_InitialLinkedLotSizingValues = V_InitialLinkedLotSizingValues
         self.V_MaxProductionQuantity = V_MaxProductionQuantity
         
         # Prepare data for model consumption
@@ -264,16 +285,106 @@ class DataDiskLoader():
             "product_to_line": V_ProductToLine,
             "setup_matrix": V_SetupMatrix,
             "initial_lot_sizing_values": V_InitialLotSizingValues,
+            "initial_linked_lot_sizing_values": V_InitialLinkedLotSizingValues,
             "max_production_quantity": V_MaxProductionQuantity
             }
 
         # %% Helperfunctions
     def convert_dates(self, data):
-        data = data[data["ProblemInstanceId"] == self.PROBLEM_INSTANCE].copy()
-        if "ValidityDateTo" in data.columns:
-            data["ValidityDateTo"] = data.apply(lambda x: convert_date(x['ValidityDateTo']), axis=1)
-        if "ValidityDateFrom" in data.columns:
-            data["ValidityDateFrom"] = data.apply(lambda x: convert_date(x['ValidityDateFrom']), axis=1)
-        if "DeliveryDate" in data.columns:
-            data["DeliveryDate"] = data.apply(lambda x: convert_date(x['DeliveryDate']), axis=1)
-        return data
\ No newline at end of file
+        return clamp_dates(convert_dates(data[data["ProblemInstanceId"] == self.PROBLEM_INSTANCE].copy()))
+
+# %% Interval joins, data and periods refer to a single problem instance
+def interval_join(data, periods, date_from = "ValidityDateFrom", date_to = "ValidityDateTo", period_major = False):
+    # Join every row with the periods whose PlanningDate lies within [date_from, date_to] by sorted searches instead of a cross join with all periods
+    periods = periods.sort_values("PlanningDate", kind = "stable")
+    dates = to_datetime64(periods["PlanningDate"])
+    valid_from, valid_to = to_datetime64(data[date_from]), to_datetime64(data[date_to])
+    start = np.searchsorted(dates, valid_from, side = "left")
+    end = np.searchsorted(dates, valid_to, side = "right")
+    counts = np.where(np.isnat(valid_from) | np.isnat(valid_to), 0, np.maximum(end - start, 0))
+
+    # Row positions of the data and of the matching periods
+    rows = np.repeat(np.arange(data.shape[0]), counts)
+    period_rows = np.repeat(start - np.cumsum(counts) + counts, counts) + np.arange(rows.size)
+    if period_major:
+        # Order rows by period first, like a join of the periods with the data
+        order = np.argsort(period_rows, kind = "stable")
+        rows, period_rows = rows[order], period_rows[order]
+    return join_rows(data, periods, rows, period_rows)
+
+def period_join(data, periods, date = "DeliveryDate", period_from = "PlanningDate", period_to = "PlanningDateTo"):
+    # Join every row with the period [period_from, period_to) that contains its date
+    periods = periods.sort_values(period_from, kind = "stable")
+    dates = to_datetime64(data[date])
+    position = np.searchsorted(to_datetime64(periods[period_from]), dates, side = "right") - 1
+    valid = (position >= 0) & ~np.isnat(dates)
+    valid[valid] = dates[valid] < to_datetime64(periods[period_to])[position[valid]]
+    return join_rows(data, periods, np.flatnonzero(valid), position[valid])
+
+def join_rows(data, periods, rows, period_rows):
+    data = data.iloc[rows].reset_index(drop = True)
+    periods = periods.iloc[period_rows].reset_index(drop = True)
+    return pd.concat([data, periods.drop(columns = [column for column in periods.columns if column in data.columns])], axis = 1)
+
+def to_datetime64(values):
+    # Microseconds cover dates like 31.12.9999 that exceed the nanosecond range of pandas
+    return np.array(values.to_numpy(), dtype = "datetime64[us]")
+
+# %% Batch ingestion
+def read_workbook(data_path, problem_instance_ids = None, sheet_names = SHEET_NAMES):
+    # Parse every sheet of a workbook once and partition all sheets by problem instance
+    workbook = pd.ExcelFile(data_path)
+    sheets = dict()
+    for sheet_name in sheet_names:
+        if sheet_name not in workbook.sheet_names:
+            continue
+        data = pd.read_excel(workbook, sheet_name = sheet_name)
+        if problem_instance_ids is not None:
+            data = data[data["ProblemInstanceId"].isin(problem_instance_ids)]
+        sheets[sheet_name] = convert_dates(data.copy())
+    workbook.close()
+
+    if problem_instance_ids is None:
+        problem_instance_ids = list(sheets["ProblemInstance"]["ProblemInstanceId"].unique())
+    tables = {problem_instance_id: dict() for problem_instance_id in problem_instance_ids}
+    for sheet_name, data in sheets.items():
+        partitions = dict(tuple(data.groupby("ProblemInstanceId", sort = False)))
+        for problem_instance_id in problem_instance_ids:
+            tables[problem_instance_id][sheet_name] = partitions.get(problem_instance_id, data.iloc[0:0])
+    return tables
+
+def load_workbook(data_path, problem_instance_ids = None):
+    # Prepare the data of several problem instances from a single parse of the workbook
+    tables = read_workbook(data_path, problem_instance_ids)
+    for problem_instance_id in list(tables.keys()):
+        yield DataDiskLoader(problem_instance_id, data_path, tables = tables.pop(problem_instance_id))
+
+def convert_dates(data):
+    for column in DATE_COLUMNS:
+        if column in data.columns:
+            data[column] = convert_serial_dates(data[column])
+    return data
+
+def clamp_dates(data):
+    # Dates of the in-memory preparation have nanosecond precision, dates after MAX_DATE are set to MAX_DATE which keeps open validity intervals open
+    data = data.copy()
+    for column in DATE_COLUMNS:
+        if column in data.columns:
+            dates = np.minimum(to_datetime64(data[column]), np.datetime64(MAX_DATE.to_pydatetime(), "us"))
+            data[column] = pd.Series(dates.astype("datetime64[ns]"), index = data.index)
+    return data
+
+def convert_serial_dates(values):
+    # Convert a column of Excel serial dates at once, same results as pyxlsb.convert_date per value
+    # Microseconds keep dates like 31.12.9999 that exceed the nanosecond range of pandas, e.g. for the upload
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    serial = pd.to_numeric(values, errors = "coerce").to_numpy(dtype = float)
+    valid = ~np.isnan(serial)
+    days = np.trunc(serial[valid]).astype(np.int64)
+    seconds = np.round(np.mod(serial[valid], 1) * 24 * 60 * 60).astype(np.int64)
+    # Serial dates from 61 on include the non-existing 29th of February 1900, fractions of day zero start at the 1st of January 1900
+    days = np.where(days == 0, 1, np.where(days >= 61, days - 1, days))
+    dates = np.full(serial.size, np.datetime64("NaT"), dtype = "datetime64[us]")
+    dates[valid] = np.datetime64("1899-12-31", "us") + days.astype("timedelta64[D]") + seconds.astype("timedelta64[s]")
+    return pd.Series(dates, index = values.index)
\ No newline at end of file
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from mip import EPS
+
+# Define model reduction stage between instantiation and model build
+class ModelReduction:
+    def __init__(self, index_model, linked_lot_size = "pairwise", tightening = None):
+        self.index_model = index_model
+        self.linked_lot_size = linked_lot_size
+
+        # Initial and final inventories/backorders are fixed by the initial lot-sizing values
+        self.fixed_inventory = dict()
+        self.fixed_backorder = dict()
+        for scenario, dict_values in index_model.init_inventory.items():
+            for product, initial_inventory in dict_values.items():
+                self.fixed_inventory[(scenario, product, 0)] = initial_inventory
+                self.fixed_inventory[(scenario, product, index_model.T)] = 0
+        for scenario, dict_values in index_model.init_backorder.items():
+            for product, initial_backorder in dict_values.items():
+                self.fixed_backorder[(scenario, product, 0)] = initial_backorder
+                self.fixed_backorder[(scenario, product, index_model.T)] = 0
+
+        # Initial linked lot sizes are fixed, initial linked lot sizes of products that are not allocated on a machine are never used
+        self.fixed_linked_lot_size = dict()
+        for scenario, dict_values in index_model.init_linked_lot_size.items():
+            for key, initial_linked_lot_size in dict_values.items():
+                self.fixed_linked_lot_size[(scenario, key[0], key[1], 0)] = initial_linked_lot_size
+
+        # Production quantities equal zero if t + lead time > T or if no capacity or no demand of the horizon is available (big-M equals zero)
+        # Tightened bounds replace big-M, the bound of linked lot sizes is the larger one
+        self.fixed_production = set()
+        for key, values in index_model.lead_time.items():
+            if values > 0:
+                for t in range(index_model.T + 1 - int(round(values)), index_model.T + 1):
+                    for scenario in index_model.simulation_instances:
+                        self.fixed_production.add((scenario, key[0], key[1], t))
+        big_M = tightening.big_M_linked if tightening is not None else index_model.big_M
+        for scenario, dict_values in big_M.items():
+            for key, big_M in dict_values.items():
+                if big_M <= 0:
+                    self.fixed_production.add((scenario, key[0], key[1], key[2]))
+
+    def is_allocated(self, machine, product):
+        return machine in self.index_model.product_to_line[product]
+
+    def original_size(self):
+        # Rows and columns of the model without reduction
+        index_model = self.index_model
+        S, P, M, T = index_model.S, index_model.P, index_model.M, index_model.T
+        L = sum(len(index_model.product_to_line[product]) for product in index_model.products)
+        lines_per_machine = [len(index_model.line_to_product[machine]) for machine in index_model.machines]
+
+        columns = 2 * S * P * (T + 1) + S * M * P + 4 * S * L * T
+        rows = len(self.fixed_inventory) + len(self.fixed_backorder) + len(self.fixed_linked_lot_size)
+        for product in index_model.products:
+            for machine in index_model.product_to_line[product]:
+                max_lead_time = max(int(round(index_model.lead_time[(machine, product, period)])) for period in index_model.periods)
+                rows += S * min(max(max_lead_time, 0), T)
+        rows += S * P * T + 2 * S * M * T + 3 * S * L * T
+        if self.linked_lot_size == "aggregated":
+            columns += S * T * sum(1 for n in lines_per_machine if n > 1)
+            rows += S * T * sum(2 * n for n in lines_per_machine if n > 1)
+        else:
+            rows += S * T * sum(n * (n - 1) for n in lines_per_machine)
+        return rows, columns
+
+    def report(self, rows, columns):
+        original_rows, original_columns = self.original_size()
+        self.rows = rows
+        self.columns = columns
+        self.removed_rows = original_rows - rows
+        self.removed_columns = original_columns - columns
+        print("Presolve removed %s rows and %s columns, reduced model has %s rows and %s columns" % (self.removed_rows, self.removed_columns, rows, columns))
+
+    def fixed_values(self):
+        # Values of fixed variables by variable name
+        index_model = self.index_model
+        values = dict()
+        for key, value in self.fixed_inventory.items():
+            values["INVENTORY_ON_HAND_{}_{}_{}".format(*key)] = value
+        for key, value in self.fixed_backorder.items():
+            values["BACKORDER_QUANTITY_{}_{}_{}".format(*key)] = value
+        for key, value in self.fixed_linked_lot_size.items():
+            values["LINKED_LOT_SIZE_{}_{}_{}_{}".format(*key)] = value
+        for key in self.fixed_production:
+            values["PRODUCTION_QUANTITY_{}_{}_{}_{}".format(*key)] = 0
+        for scenario in index_model.simulation_instances:
+            for machine in index_model.machines:
+                for product in index_model.products:
+                    if not self.is_allocated(machine, product):
+                        values["LINKED_LOT_SIZE_{}_{}_{}_0".format(scenario, machine, product)] = 0
+        return values
+
+    def postsolve(self, solution):
+        index_model = self.index_model
+
+        # Restore fixed variables
+        solution.update(self.fixed_values())
+
+        # Restore substituted total setup states
+        for scenario in index_model.simulation_instances:
+            for product in index_model.products:
+                for machine in index_model.product_to_line[product]:
+                    for period in index_model.periods:
+                        solution["TOTAL_SETUP_{}_{}_{}_{}".format(scenario, machine, product, period)] = solution["SETUP_STATE_{}_{}_{}_{}".format(scenario, machine, product, period)] + \
+                            solution["LINKED_LOT_SIZE_{}_{}_{}_{}".format(scenario, machine, product, period - 1)]
+        return solution
+
+
+# %% Helper functions
+def is_redundant(lin_expr):
+    # A constraint is redundant if it holds for all values within the variable bounds
+    activity_min = lin_expr.const
+    activity_max = lin_expr.const
+    for var, coeff in lin_expr.expr.items():
+        if abs(coeff) <= EPS:
+            continue
+        lb, ub = var.lb, var.ub
+        activity_min += coeff * lb if coeff > 0 else coeff * ub
+        activity_max += coeff * ub if coeff > 0 else coeff * lb
+    if lin_expr.sense == "<":
+        return activity_max <= EPS
+    if lin_expr.sense == ">":
+        return activity_min >= -EPS
+    return abs(activity_min) <= EPS and abs(activity_max) <= EPS
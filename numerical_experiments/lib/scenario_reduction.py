@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+
+# Define scenario reduction by fast forward selection on the demand of the simulation instances
+class ScenarioReduction:
+    def __init__(self, data, n_scenarios: int):
+        # Demand vectors over all materials and periods, one row per scenario with uniform probabilities
+        scenarios = sorted(set(data["probleminstance"]["SimulationInstanceId"]))
+        demand = data["demand"].astype({"SimulationInstanceId": object, "MaterialId": object})
+        demand = demand.groupby(["SimulationInstanceId", "MaterialId", "PlanningPeriod"])["Quantity"].sum().unstack(["MaterialId", "PlanningPeriod"], fill_value = 0)
+        self.demand = demand.reindex(scenarios, fill_value = 0).to_numpy(dtype = float)
+        self.original_scenarios = scenarios
+        self.original_probability = np.full(len(scenarios), 1 / len(scenarios))
+        self.n_scenarios = min(max(n_scenarios, 1), len(scenarios))
+
+        st = time.time()
+        selected = self.fast_forward_selection()
+        self.reduction_time = time.time() - st
+
+        # Probabilities of removed scenarios are added to their closest selected scenario
+        distance = self.distance[:, selected]
+        closest = np.argmin(distance, axis = 1)
+        probability = np.bincount(closest, weights = self.original_probability, minlength = len(selected))
+        self.scenarios = [scenarios[i] for i in selected]
+        self.probability = {scenario: float(probability[i]) for i, scenario in enumerate(self.scenarios)}
+
+        # Kantorovich distance between the original and the reduced demand distribution
+        self.approximation_error = float(np.sum(self.original_probability * distance[np.arange(len(scenarios)), closest]))
+        norm = float(np.sum(self.original_probability * np.linalg.norm(self.demand, axis = 1)))
+        self.relative_approximation_error = self.approximation_error / norm if norm > 0 else 0.0
+        print("Scenario reduction selected %s of %s scenarios, Kantorovich distance = %s (%s relative to the mean demand norm)" % (len(self.scenarios), len(scenarios), self.approximation_error,
+            self.relative_approximation_error))
+
+    def fast_forward_selection(self):
+        # Select the scenario that minimizes the distance to all remaining scenarios until n_scenarios are selected
+        squared = np.sum(self.demand ** 2, axis = 1)
+        self.distance = np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2 * self.demand @ self.demand.T, 0))
+        np.fill_diagonal(self.distance, 0)
+        p = self.original_probability
+        c = self.distance.copy()
+        remaining = np.ones(len(p), dtype = bool)
+        selected = list()
+        for i in range(self.n_scenarios):
+            z = np.where(remaining, (p * remaining) @ c, np.inf)
+            u = int(np.argmin(z))
+            selected.append(u)
+            remaining[u] = False
+            c = np.minimum(c, c[:, [u]])
+        return selected
+
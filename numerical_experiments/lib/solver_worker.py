@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import json
+import os
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+import pandas as pd
+from sqlalchemy import create_engine
+from lib.model_client import ModelClient, select_scenarios
+from lib.model_cache import ModelCache
+
+# Local port of the solver worker
+SOLVER_WORKER_PORT = 5711
+# Progress and incumbent messages of the CBC log, objective values of 1e+50 stand for no solution
+CBC_PROGRESS = re.compile(r"Cbc0010I After (\d+) nodes, (\d+) on tree, (\S+) best solution, best possible (\S+) \((\S+) seconds\)")
+CBC_INCUMBENT = re.compile(r"Cbc0012I Integer solution of (\S+) found by (.+) after .* \((\S+) seconds\)")
+
+# Define long-running solver worker with hot problem instance data and a pooled engine
+class SolverWorker:
+    def __init__(self, port = SOLVER_WORKER_PORT, max_instances = 8, concurrency = 4, materialized = False, model_cache = True):
+        # One model client keeps the engine for all requests, its pool keeps the connections open between requests
+        self.port = port
+        self.max_instances = max_instances
+        self.concurrency = concurrency
+        self.materialized = materialized
+        self.client = ModelClient(load_connection = True)
+        config = self.client.config
+        self.client.engine.dispose()
+        self.client.engine = create_engine("postgresql://%s:%s@%s/%s" % (config["user"], config["password"], config["host"], config["database"]), pool_size = concurrency, pool_pre_ping = True)
+
+        # Data of the problem instances with the loaded simulation instances (None for all), least recently used instances are evicted
+        self.instances = OrderedDict()
+        # Instantiated models by problem instance, simulation instances and compact option, built models are read from the model cache (see lib/model_cache.py)
+        self.models = OrderedDict()
+        self.model_cache = ModelCache() if model_cache else None
+        self.model_hits = 0
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.requests = 0
+
+    def serve(self):
+        # Requests are handled one after another, further requests wait in the backlog of the socket
+        worker = self
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if len(line.strip()) == 0:
+                        continue
+                    if not worker.handle(json.loads(line), self.send, self.server):
+                        break
+
+            def send(self, event):
+                # The solve continues if the caller disconnects
+                try:
+                    self.wfile.write((json.dumps(event, default = str) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                except OSError:
+                    pass
+
+        socketserver.TCPServer.allow_reuse_address = True
+        with socketserver.TCPServer(("127.0.0.1", self.port), RequestHandler) as server:
+            print("# Solver worker listening on port %s #" % (self.port))
+            server.serve_forever()
+
+    def handle(self, request, send, server):
+        command = request.get("command", "solve")
+        try:
+            if command == "solve":
+                self.solve(request, send)
+            elif command == "statistics":
+                send({"event": "statistics", **self.statistics()})
+            elif command == "shutdown":
+                send({"event": "shutdown"})
+                threading.Thread(target = server.shutdown).start()
+                return False
+            else:
+                raise ValueError("Unknown command {}, choose one of solve, statistics or shutdown".format(command))
+        except Exception as e:
+            traceback.print_exc()
+            send({"event": "error", "error": "%s: %s" % (type(e).__name__, e)})
+        return True
+
+    def solve(self, request, send):
+        from lib.MLCLSP_L_B import MLCLSP_L_B
+        st = time.time()
+        self.requests += 1
+        problem_instance_id = request["problem_instance_id"]
+        simulation_instance_ids = request.get("simulation_instance_ids", list())
+        compact = request.get("compact", False)
+        model_key = (problem_instance_id, tuple(sorted(simulation_instance_ids)) if len(simulation_instance_ids) > 0 else None, compact)
+        m = self.models.pop(model_key, None)
+        if m is not None:
+            # The instantiated model is kept, the data of its problem instance is marked as recently used
+            self.instances.move_to_end(problem_instance_id)
+            self.model_hits += 1
+            cache_state = "MODEL"
+            lt = it = time.time()
+        else:
+            data, cache_state = self.data(problem_instance_id, simulation_instance_ids)
+            lt = time.time()
+            m = MLCLSP_L_B(problem_instance_id, simulation_instance_ids, load_connection = False, disk_data = select_scenarios(data, simulation_instance_ids) if len(simulation_instance_ids) > 0 else data,
+                           compact = compact)
+            it = time.time()
+        self.models[model_key] = m
+        while len(self.models) > self.max_instances:
+            self.models.popitem(last = False)
+
+        # Every request solves a fresh model, a built model of equal data and options is read from the model cache
+        m.build(**request.get("build_options", dict()), cache = self.model_cache)
+        bt = time.time()
+        send({"event": "accepted", "problem_instance_id": problem_instance_id, "scenarios": m.S, "data_cache": cache_state, "load_time": lt - st, "instantiation_time": it - lt,
+              "build_time": bt - it, "time_to_solve": bt - st})
+
+        # Incumbents and the progress of the branch and bound are streamed from the CBC log
+        def progress(line):
+            match = CBC_PROGRESS.search(line)
+            if match is not None:
+                objective_value, objective_bound = objective(match.group(3)), objective(match.group(4))
+                send({"event": "progress", "nodes": int(match.group(1)), "open_nodes": int(match.group(2)), "objective_value": objective_value, "objective_bound": objective_bound,
+                      "gap": gap(objective_value, objective_bound), "time": float(match.group(5))})
+                return
+            match = CBC_INCUMBENT.search(line)
+            if match is not None:
+                send({"event": "incumbent", "objective_value": objective(match.group(1)), "heuristic": match.group(2), "time": float(match.group(3))})
+        m.model.verbose = 1
+        with solver_log(progress):
+            status = m.solve(max_seconds = request.get("max_seconds", 100.0), warm_start = request.get("warm_start"))
+        objective_value = m.objective_value if m.objective_value < float("inf") else None
+        result = {"event": "done", "status": status.name, "objective_value": objective_value, "lower_bound": m.model.objective_bound, "gap": gap(objective_value, m.model.objective_bound),
+                  "optimization_state": m.optimzation_state, "solve_time": time.time() - bt, "execution_time": time.time() - st}
+        if request.get("return_solution", False):
+            result["solution"] = m.solution
+        send(result)
+
+    def data(self, problem_instance_id, simulation_instance_ids):
+        # Only simulation instances that are not loaded yet are fetched, an empty list of simulation instances stands for all
+        client = self.client
+        client.set_problem_instance_id(problem_instance_id)
+        entry = self.instances.pop(problem_instance_id, None)
+        if entry is not None and (entry["scenarios"] is None or (len(simulation_instance_ids) > 0 and set(simulation_instance_ids) <= entry["scenarios"])):
+            self.hits += 1
+            cache_state = "HIT"
+        elif entry is not None and len(simulation_instance_ids) > 0:
+            missing = sorted(set(simulation_instance_ids) - entry["scenarios"])
+            scenario_data = client.load_scenario_data(missing, self.concurrency, self.materialized)
+            for key, frame in scenario_data.items():
+                entry["data"][key] = pd.concat([entry["data"][key], frame], ignore_index = True)
+            entry["scenarios"] |= set(missing)
+            self.partial_hits += 1
+            cache_state = "PARTIAL"
+        else:
+            client.simulation_instance_ids = simulation_instance_ids
+            client.data = dict()
+            client.load_data(self.concurrency, self.materialized)
+            entry = {"data": client.data, "scenarios": set(simulation_instance_ids) if len(simulation_instance_ids) > 0 else None}
+            self.misses += 1
+            cache_state = "MISS"
+        self.instances[problem_instance_id] = entry
+        while len(self.instances) > self.max_instances:
+            evicted, evicted_entry = self.instances.popitem(last = False)
+            for model_key in [model_key for model_key in self.models if model_key[0] == evicted]:
+                del self.models[model_key]
+            print("# Evicted problem instance %s from solver worker #" % (evicted))
+        return entry["data"], cache_state
+
+    def statistics(self):
+        return {"requests": self.requests, "model_hits": self.model_hits, "hits": self.hits, "partial_hits": self.partial_hits, "misses": self.misses, "problem_instances": list(self.instances),
+                "models": len(self.models), "model_cache": self.model_cache.statistics() if self.model_cache is not None else None, "pool": self.client.engine.pool.status()}
+
+
+# %% Helper functions
+@contextlib.contextmanager
+def solver_log(callback):
+    # Lines written by the solver to the stdout file descriptor are passed to the callback and echoed to the original stdout
+    sys.stdout.flush()
+    stdout = os.dup(1)
+    read, write = os.pipe()
+    os.dup2(write, 1)
+    os.close(write)
+    def reader():
+        with os.fdopen(read, "r", errors = "replace") as f, os.fdopen(os.dup(stdout), "w") as echo:
+            for line in f:
+                echo.write(line)
+                echo.flush()
+                callback(line)
+    thread = threading.Thread(target = reader)
+    thread.start()
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(stdout, 1)
+        os.close(stdout)
+        thread.join()
+
+
+def objective(value):
+    value = float(value)
+    return value if abs(value) < 1e+50 else None
+
+
+def gap(objective_value, objective_bound):
+    if objective_value is None or objective_bound is None:
+        return None
+    return abs(objective_value - objective_bound) / max(abs(objective_value), 1e-9)
+
+
+def solve_request(problem_instance_id, simulation_instance_ids = list(), max_seconds = 100.0, port = SOLVER_WORKER_PORT, **options):
+    # Send a solve request to the solver worker and yield its events until the request is done
+    request = {"command": "solve", "problem_instance_id": problem_instance_id, "simulation_instance_ids": simulation_instance_ids, "max_seconds": max_seconds, **options}
+    yield from send_request(request, port)
+
+
+def send_request(request, port = SOLVER_WORKER_PORT):
+    with socket.create_connection(("127.0.0.1", port)) as connection:
+        connection.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with connection.makefile("r", encoding = "utf-8") as f:
+            for line in f:
+                event = json.loads(line)
+                yield event
+                if event["event"] in ["done", "error", "statistics", "shutdown"]:
+                    return
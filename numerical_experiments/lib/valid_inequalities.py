@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+from mip import ConstrsGenerator, xsum
+
+# Define separation of (l,S) inequalities with backorders for the MLCLSP-L-B
+class LSInequalities(ConstrsGenerator):
+    def __init__(self, model, max_cuts = 200, max_depth = 0, tolerance = 1e-4):
+        # The supply X_j of period j (production of all lines in period j + lead time) is bounded for every period l and subset S of the periods up to l by
+        # sum_{j in S} X_j <= sum_{j in S} (D_jl * Y_j + x_bo[j - 1]) + x_inv[l], Y_j = x_su + x_l[t - 1] of all lines and D_jl the demand of the periods j to l
+        # Components are skipped, the inequalities hold for products whose only demand is the primary demand
+        self.max_cuts = max_cuts
+        self.max_depth = max_depth
+        self.tolerance = tolerance
+        self.separation_time = 0.0
+        self.cuts = 0
+        m = model
+        T = m.T
+        components = {key[3] for key in m.production_coefficient}
+
+        # Variables by name, fixed variables of the presolve and missing variables are constants
+        variables = {var.name: var for var in m.model.vars}
+        fixed = m.presolve.fixed_values() if m.presolve is not None else dict()
+        self.vars = list(variables.values())
+        position = {name: i for i, name in enumerate(variables)}
+        constants = list()
+        def column(name):
+            if name in position:
+                return position[name]
+            constants.append(fixed.get(name, 0.0))
+            return len(self.vars) + len(constants) - 1
+
+        # Columns of the terms per scenario, product and period
+        self.keys = list()
+        self.supply, self.setup, self.backorder, self.inventory = list(), list(), list(), list()
+        demand = list()
+        for scenario in sorted(m.simulation_instances):
+            for product in sorted(m.products):
+                if product in components or len(m.product_to_line[product]) == 0:
+                    continue
+                self.keys.append((scenario, product))
+                supply, setup = [list() for period in m.periods], [list() for period in m.periods]
+                for machine in sorted(m.product_to_line[product]):
+                    for j, period in enumerate(m.periods):
+                        t = period + int(round(m.lead_time[(machine, product, period)]))
+                        if t <= T:
+                            supply[j].append(column("PRODUCTION_QUANTITY_{}_{}_{}_{}".format(scenario, machine, product, t)))
+                            setup[j].append(column("SETUP_STATE_{}_{}_{}_{}".format(scenario, machine, product, t)))
+                            setup[j].append(column("LINKED_LOT_SIZE_{}_{}_{}_{}".format(scenario, machine, product, t - 1)))
+                self.supply.append(supply)
+                self.setup.append(setup)
+                self.backorder.append([column("BACKORDER_QUANTITY_{}_{}_{}".format(scenario, product, period - 1)) for period in m.periods])
+                self.inventory.append([column("INVENTORY_ON_HAND_{}_{}_{}".format(scenario, product, period)) for period in m.periods])
+                demand.append([m.demand[scenario][(product, period)] for period in m.periods])
+        self.constants = np.array(constants, dtype = float)
+
+        # Sparse sums of the supply and setup columns as (row, column) pairs, row = key * T + period
+        N = len(self.keys)
+        self.supply_rows = np.array([n * T + j for n in range(N) for j in range(T) for c in self.supply[n][j]], dtype = np.int64)
+        self.supply_cols = np.array([c for n in range(N) for j in range(T) for c in self.supply[n][j]], dtype = np.int64)
+        self.setup_rows = np.array([n * T + j for n in range(N) for j in range(T) for c in self.setup[n][j]], dtype = np.int64)
+        self.setup_cols = np.array([c for n in range(N) for j in range(T) for c in self.setup[n][j]], dtype = np.int64)
+        self.backorder_cols = np.array(self.backorder, dtype = np.int64).reshape(N, T)
+        self.inventory_cols = np.array(self.inventory, dtype = np.int64).reshape(N, T)
+
+        # Demand D_jl of the periods j to l as (N, T, T) array
+        cumulative = np.concatenate([np.zeros((N, 1)), np.cumsum(np.array(demand, dtype = float).reshape(N, T), axis = 1)], axis = 1)
+        self.demand = np.triu(cumulative[:, None, 1:] - cumulative[:, :-1, None])
+
+    def generate_constrs(self, model, depth = 0, npass = 0):
+        if depth > self.max_depth:
+            return
+        st = time.time()
+        N, T = len(self.keys), self.demand.shape[1]
+
+        # Values of the relaxation, variables removed by the preprocessing of the solver cannot be part of a cut
+        variables = model.translate(self.vars)
+        missing = np.array([var is None for var in variables] + [False] * self.constants.size, dtype = bool)
+        values = np.concatenate([np.array([var.x if var is not None else 0.0 for var in variables], dtype = float), self.constants])
+
+        supply = np.bincount(self.supply_rows, weights = values[self.supply_cols], minlength = N * T).reshape(N, T)
+        setup = np.bincount(self.setup_rows, weights = values[self.setup_cols], minlength = N * T).reshape(N, T)
+        backorder = values[self.backorder_cols]
+        inventory = values[self.inventory_cols]
+
+        # The most violated inequality per product and period l takes all periods j <= l with a positive contribution into S
+        contribution = supply[:, :, None] - self.demand * setup[:, :, None] - backorder[:, :, None]
+        contribution = np.where(np.triu(np.ones((T, T), dtype = bool))[None, :, :] & (contribution > 1e-9), contribution, 0)
+        violation = contribution.sum(axis = 1) - inventory
+        n, l = np.nonzero(violation > self.tolerance * (1 + np.abs(inventory)))
+        order = np.argsort(-violation[n, l])[:self.max_cuts]
+
+        cuts = 0
+        for n, l in zip(n[order].tolist(), l[order].tolist()):
+            S = np.flatnonzero(contribution[n, :, l] > 0).tolist()
+            terms = [(c, 1.0) for j in S for c in self.supply[n][j]] + [(c, -self.demand[n, j, l]) for j in S for c in self.setup[n][j]] + [(self.backorder[n][j], -1.0) for j in S] + [(self.inventory[n][l], -1.0)]
+            if any(missing[c] for c, coefficient in terms):
+                continue
+            constant = sum(coefficient * values[c] for c, coefficient in terms if c >= len(variables))
+            model += xsum(coefficient * variables[c] for c, coefficient in terms if c < len(variables)) <= -constant
+            cuts += 1
+        self.cuts += cuts
+        self.separation_time += time.time() - st
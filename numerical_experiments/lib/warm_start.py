@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+import math
+import time
+from mip import CONTINUOUS
+
+# Backward and forward passes over the periods of a machine until all periods are within the capacity
+PASSES = 3
+
+# Define constructive plan of the MLCLSP-L-B as MIP start
+class ConstructivePlan:
+    def __init__(self, index_model, big_M = None, scenarios = None):
+        # Lot-for-lot plan per scenario, lots are merged by the Silver-Meal rule and lots of overloaded periods are shifted backward (Dixon-Silver style)
+        # Remaining overloads are shifted forward as backorders
+        # The plan follows the material balance of the model: supply in period t is produced in period t + lead time
+        st = time.time()
+        self.index_model = index_model
+        # Lots are bounded by big-M, the setup bounds of a tightened model are the smaller ones
+        self.bounds = big_M if big_M is not None else index_model.big_M
+        # Scenarios are planned independently, a subset of the scenarios is planned when the other ones start from a stored solution
+        self.plan = dict()
+        for scenario in sorted(scenarios if scenarios is not None else index_model.simulation_instances):
+            self.plan_scenario(scenario)
+        self.construction_time = time.time() - st
+
+    def plan_scenario(self, scenario):
+        m = self.index_model
+        T = m.T
+        demand = m.demand[scenario]
+        self.big_M = self.bounds[scenario]
+        capacity = m.capacity[scenario]
+        init_inventory = m.init_inventory[scenario] if scenario in m.init_inventory else dict()
+        init_backorder = m.init_backorder[scenario] if scenario in m.init_backorder else dict()
+        init_linked_lot_size = m.init_linked_lot_size[scenario] if scenario in m.init_linked_lot_size else dict()
+
+        # Every product is produced on its first line, supply quantities per supply period
+        line = {product: sorted(m.product_to_line[product])[0] for product in m.products if len(m.product_to_line[product]) > 0}
+        supply = dict()
+        for product, machine in line.items():
+            available = init_inventory.get(product, 0) - init_backorder.get(product, 0)
+            supply[product] = [0.0] * (T + 1)
+            for period in m.periods:
+                requirement = max(0.0, demand[(product, period)] - available)
+                available = max(0.0, available - demand[(product, period)])
+                # Supply periods without a production period are served earlier
+                t = period
+                while t > 1 and not self.valid(machine, product, t):
+                    t -= 1
+                supply[product][t] += requirement
+
+            # Quantities above the maximum production quantity are supplied earlier, the excess of the first period is backordered
+            for t in range(T, 1, -1):
+                excess = supply[product][t] - self.max_quantity(machine, product, t)
+                if excess > 0:
+                    supply[product][t] -= excess
+                    supply[product][t - 1] += excess
+            for t in range(1, T):
+                excess = supply[product][t] - self.max_quantity(machine, product, t)
+                if excess > 0:
+                    supply[product][t] -= excess
+                    supply[product][t + 1] += excess
+            self.merge(machine, product, supply[product])
+
+        # Resolve capacity overloads per machine, setups are carried over between consecutive lots by linked lot sizes
+        links = dict()
+        for machine in m.machines:
+            products = [product for product in sorted(m.line_to_product[machine]) if line.get(product) == machine]
+            for i in range(PASSES):
+                for period in range(T, 1, -1):
+                    self.shift(machine, products, supply, capacity, init_linked_lot_size, period, -1)
+                for period in range(1, T):
+                    self.shift(machine, products, supply, capacity, init_linked_lot_size, period, 1)
+                if all(self.load(machine, products, supply, init_linked_lot_size, period) <= capacity[(machine, period)] + 1e-6 for period in m.periods):
+                    break
+            links[machine] = self.links(machine, products, supply, init_linked_lot_size)
+
+        # Variable values of the plan
+        for product in m.products:
+            machine = line.get(product)
+            position = init_inventory.get(product, 0) - init_backorder.get(product, 0)
+            self.plan["INVENTORY_ON_HAND_{}_{}_0".format(scenario, product)] = max(position, 0)
+            self.plan["BACKORDER_QUANTITY_{}_{}_0".format(scenario, product)] = max(-position, 0)
+            for period in m.periods:
+                position += (supply[product][period] if machine is not None else 0) - demand[(product, period)]
+                self.plan["INVENTORY_ON_HAND_{}_{}_{}".format(scenario, product, period)] = max(position, 0)
+                self.plan["BACKORDER_QUANTITY_{}_{}_{}".format(scenario, product, period)] = max(-position, 0)
+            for line_machine in m.machines:
+                self.plan["LINKED_LOT_SIZE_{}_{}_{}_0".format(scenario, line_machine, product)] = init_linked_lot_size.get((line_machine, product), 0)
+            for line_machine in m.product_to_line[product]:
+                linked_lot_size = init_linked_lot_size.get((line_machine, product), 0)
+                for period in m.periods:
+                    self.plan["PRODUCTION_QUANTITY_{}_{}_{}_{}".format(scenario, line_machine, product, period)] = 0
+                    self.plan["SETUP_STATE_{}_{}_{}_{}".format(scenario, line_machine, product, period)] = 0
+                    self.plan["LINKED_LOT_SIZE_{}_{}_{}_{}".format(scenario, line_machine, product, period)] = 0
+                    self.plan["TOTAL_SETUP_{}_{}_{}_{}".format(scenario, line_machine, product, period)] = linked_lot_size if period == 1 else 0
+            if machine is None:
+                continue
+            for period in m.periods:
+                if supply[product][period] > 0:
+                    t = period + self.lead_time(machine, product, period)
+                    self.plan["PRODUCTION_QUANTITY_{}_{}_{}_{}".format(scenario, machine, product, t)] = supply[product][period]
+                    self.plan["SETUP_STATE_{}_{}_{}_{}".format(scenario, machine, product, t)] = 0 if links[machine][t - 1] == product else 1
+                    self.plan["TOTAL_SETUP_{}_{}_{}_{}".format(scenario, machine, product, t)] = 1
+                if links[machine][period] == product:
+                    self.plan["LINKED_LOT_SIZE_{}_{}_{}_{}".format(scenario, machine, product, period)] = 1
+
+    def merge(self, machine, product, supply):
+        # Silver-Meal: a lot covers the following supply periods as long as the setup and holding cost per period decreases
+        m = self.index_model
+        period = 1
+        while period <= m.T:
+            if supply[period] <= 0:
+                period += 1
+                continue
+            cost = m.setup_cost[(machine, product, self.production_period(machine, product, period))]
+            average = cost
+            t = period + 1
+            while t <= m.T:
+                if supply[period] + supply[t] > self.max_quantity(machine, product, period):
+                    break
+                holding = supply[t] * sum(m.inventory_holding_cost[(product, k)] for k in range(period, t))
+                if (cost + holding) / (t - period + 1) > average:
+                    break
+                cost += holding
+                average = cost / (t - period + 1)
+                supply[period] += supply[t]
+                supply[t] = 0.0
+                t += 1
+            period = t
+
+    def shift(self, machine, products, supply, capacity, init_linked_lot_size, period, direction):
+        # Move lots produced in the period by one supply period until the machine is within its capacity
+        # The cheapest lot per unit of freed capacity is moved first, shifting backward holds inventory and shifting forward backorders the quantity
+        m = self.index_model
+        cost = m.inventory_holding_cost if direction < 0 else m.backorder_cost
+        while True:
+            overload = self.load(machine, products, supply, init_linked_lot_size, period) - capacity[(machine, period)]
+            if overload <= 1e-6:
+                return
+
+            # Candidate moves are the part of a lot that removes the overload and the whole lot, which also frees its setup time
+            links = self.links(machine, products, supply, init_linked_lot_size)
+            # Moves onto existing lots come first as they do not add setup time to the target period
+            moves = list()
+            for product in products:
+                t = self.supply_period(machine, product, period)
+                production_time = m.production_time[(machine, product, period)]
+                if t is None or supply[product][t] <= 0 or not self.valid(machine, product, t + direction):
+                    continue
+                setup = m.setup_cost[(machine, product, self.production_period(machine, product, t + direction))] if supply[product][t + direction] <= 0 else 0
+                quantities = [supply[product][t]]
+                if production_time > 0 and overload / production_time < supply[product][t]:
+                    quantity = overload / production_time
+                    quantities.append(min(supply[product][t], math.ceil(quantity - 1e-9)) if m.material_uom[product] != CONTINUOUS else quantity)
+                for quantity in quantities:
+                    if supply[product][t + direction] + quantity > self.max_quantity(machine, product, t + direction):
+                        continue
+                    freed = production_time * quantity + (m.setup_time[(machine, product, period)] * (links[period - 1] != product) if quantity >= supply[product][t] else 0)
+                    if freed > 0:
+                        moves.append((setup > 0, (cost[(product, min(t, t + direction))] * quantity + setup) / min(freed, overload), product, t, quantity))
+            if len(moves) == 0:
+                return
+            new_setup, score, product, t, quantity = min(moves)
+            supply[product][t] -= quantity
+            supply[product][t + direction] += quantity
+
+    def load(self, machine, products, supply, init_linked_lot_size, period):
+        # Production and setup times of all lots produced in the period, a carried over setup needs no setup time
+        m = self.index_model
+        links = self.links(machine, products, supply, init_linked_lot_size)
+        load = 0.0
+        for product in self.lots(machine, products, supply, period):
+            t = self.supply_period(machine, product, period)
+            load += m.production_time[(machine, product, period)] * supply[product][t] + m.setup_time[(machine, product, period)] * (links[period - 1] != product)
+        return load
+
+    def links(self, machine, products, supply, init_linked_lot_size):
+        # Product whose setup state is carried over from each production period into the next one (index 0 is the initial linked lot size)
+        # A lot is linked to the lot of the next period, a product carried into and out of a period must be the only lot of that period
+        m = self.index_model
+        links = [None] * (m.T + 1)
+        links[0] = next((product for product in products if init_linked_lot_size.get((machine, product), 0) == 1), None)
+        lots = self.lots(machine, products, supply, 1)
+        for t in range(1, m.T):
+            next_lots = self.lots(machine, products, supply, t + 1)
+            candidates = [product for product in lots if product in next_lots and (links[t - 1] != product or len(lots) == 1)]
+            if len(candidates) > 0:
+                links[t] = max(candidates, key = lambda product: m.setup_time[(machine, product, t + 1)])
+            lots = next_lots
+        return links
+
+    def lots(self, machine, products, supply, period):
+        # Products with a lot in the production period
+        lots = list()
+        for product in products:
+            t = self.supply_period(machine, product, period)
+            if t is not None and supply[product][t] > 0:
+                lots.append(product)
+        return lots
+
+    # %% Helper functions
+    def max_quantity(self, machine, product, period):
+        # Maximum production quantity of a supply period
+        return self.big_M[(machine, product, self.production_period(machine, product, period))]
+
+    def lead_time(self, machine, product, period):
+        return int(round(self.index_model.lead_time[(machine, product, period)]))
+
+    def production_period(self, machine, product, period):
+        return period + self.lead_time(machine, product, period)
+
+    def supply_period(self, machine, product, period):
+        # Supply period of a production period
+        for t in range(period, 0, -1):
+            if self.production_period(machine, product, t) == period:
+                return t
+        return None
+
+    def valid(self, machine, product, period):
+        # Production quantities are zero within the lead time before the end of the horizon
+        if period < 1 or period > self.index_model.T:
+            return False
+        return period + 2 * self.lead_time(machine, product, period) <= self.index_model.T
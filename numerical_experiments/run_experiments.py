@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+import sys
+
+# Get system variables, phases are UPLOAD, INSTANTIATE and SOLVE, a worker count of 0 uses all cores
+PHASES = str(sys.argv[1]).split(",")
+WORKERS = int(sys.argv[2]) if len(sys.argv) > 2 and int(sys.argv[2]) > 0 else None
+CT_LIMIT = int(sys.argv[3]) if len(sys.argv) > 3 else 600
+LOADING_TYPES = str(sys.argv[4]).split(",") if len(sys.argv) > 4 else ["DISK", "DB"]
+RESUME = not (len(sys.argv) > 5 and str(sys.argv[5]) == "RESTART")
+
+if __name__ == "__main__":
+    # Jobs of all problem instances in ProblemInstances.csv run in a process pool, finished jobs of a previous run are skipped
+    from lib.orchestrator import ExperimentOrchestrator
+    orchestrator = ExperimentOrchestrator(workers = WORKERS)
+    orchestrator.run(phases = PHASES, loading_types = LOADING_TYPES, ct_limit = CT_LIMIT, resume = RESUME)
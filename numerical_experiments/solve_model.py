@@ -6,6 +6,9 @@ import time
 PROBLEM_INSTANCE = str(sys.argv[1])
 SIMULATION_INSTANCES = str(sys.argv[2]).split(",")
 CT_LIMIT = int(sys.argv[3])
+# Optional flags: SAVE writes the expected KPIs and plans of the solution to the result tables, MATERIALIZED reads the materialized views
+SAVE_RESULTS = "SAVE" in sys.argv[4:]
+MATERIALIZED = "MATERIALIZED" in sys.argv[4:]
 
 # Solver function
 def solve_model(problem_instance_id: str, simulation_instance_ids: list):
@@ -15,13 +18,17 @@ def solve_model(problem_instance_id: str, simulation_instance_ids: list):
     m = MLCLSP_L_B(
         problem_instance_id = problem_instance_id,
         simulation_instance_ids = simulation_instance_ids,
-        load_connection = True
+        load_connection = True,
+        materialized = MATERIALIZED
     )
     m.build()
     et = time.time()
     OPTIMIZATION_TIME = max(0, CT_LIMIT - float(et - st))
     print("Optimization time = %s #" % (OPTIMIZATION_TIME))
     m.solve(max_seconds = OPTIMIZATION_TIME)
+    if SAVE_RESULTS and m.solution_values is not None:
+        rows = m.lot_sizing_result().save(m)
+        print("Saved results = %s #" % (rows))
     print("Optimization finished - Status: %s, MIP Gap: #" % (m.status, abs(m.objective_value - m.model_lb) / m.objective_value))
 
 # Solve a problem with scenarios
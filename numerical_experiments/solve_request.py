@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+# Get system variables, the request is solved by a running solver worker (python3 solver_worker.py)
+PROBLEM_INSTANCE = str(sys.argv[1])
+SIMULATION_INSTANCES = str(sys.argv[2]).split(",")
+CT_LIMIT = int(sys.argv[3])
+PORT = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+# Request function
+def solve(problem_instance_id: str, simulation_instance_ids: list):
+    from lib.solver_worker import solve_request, SOLVER_WORKER_PORT
+    print("# Solve request: Problem instance = %s #" % (problem_instance_id))
+    st = time.time()
+    result = None
+    for event in solve_request(problem_instance_id, simulation_instance_ids, CT_LIMIT, port = PORT if PORT is not None else SOLVER_WORKER_PORT):
+        if event["event"] == "accepted":
+            print("# Solving started after %s seconds (data cache %s) #" % (time.time() - st, event["data_cache"]))
+            result = {"ProblemInstance": problem_instance_id, "Scenarios": event["scenarios"], "DataCache": event["data_cache"], "TimeToSolve": time.time() - st}
+        elif event["event"] == "incumbent":
+            print("# Incumbent %s found by %s after %s seconds #" % (event["objective_value"], event["heuristic"], event["time"]))
+        elif event["event"] == "progress":
+            print("# %s nodes, best solution %s, best possible %s, gap %s #" % (event["nodes"], event["objective_value"], event["objective_bound"], event["gap"]))
+        elif event["event"] == "done":
+            print("# Optimization finished - Status: %s, MIP Gap: %s #" % (event["status"], event["gap"]))
+            result.update({"ExecutionTime": time.time() - st, "ObjectiveValue": event["objective_value"], "LowerBound": event["lower_bound"], "OptimizationState": event["optimization_state"]})
+        elif event["event"] == "error":
+            print("# Solve request failed: %s #" % (event["error"]))
+    return result
+
+if __name__ == "__main__":
+    result = solve(problem_instance_id = PROBLEM_INSTANCE, simulation_instance_ids = SIMULATION_INSTANCES)
+
+    # %% Save time to solve
+    if result is not None and "ExecutionTime" in result:
+        from lib.benchmark import append_report
+        append_report("logs/solve/solver_worker.csv", [result])
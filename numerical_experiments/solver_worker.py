@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+import sys
+
+# Get system variables
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else None
+MAX_INSTANCES = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+if __name__ == "__main__":
+    # Start the solver worker, it keeps running until a shutdown request is received
+    from lib.solver_worker import SolverWorker, SOLVER_WORKER_PORT
+    worker = SolverWorker(port = PORT if PORT is not None else SOLVER_WORKER_PORT, max_instances = MAX_INSTANCES)
+    worker.serve()
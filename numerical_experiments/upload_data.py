@@ -1,15 +1,30 @@
 # -*- coding: utf-8 -*-
 from lib.model_client import ModelClient
 import sys
+import os
+import pandas as pd
 
-# %% Get path to problem instances
-PROBLEM_INSTANCE = str(sys.argv[1])
+# %% Get path to problem instances, several problem instances of a workbook are separated by commas
+PROBLEM_INSTANCES = str(sys.argv[1]).split(",")
 DATA_PATH = str(sys.argv[2])
 
+# Upload mode COPY (default), COPY_DEFERRED with foreign key checks deferred until commit, or TO_SQL
+UPLOAD_MODE = str(sys.argv[3]) if len(sys.argv) > 3 else "COPY"
+
 # %% Data template upload based on selection
 
-# Instantiate the client for a problem instance
-client = ModelClient(problem_instance_id = PROBLEM_INSTANCE)
+# Instantiate the client for the first problem instance
+client = ModelClient(problem_instance_id = PROBLEM_INSTANCES[0])
+
+# Upload data from template, the workbook is parsed once for all problem instances
+client.upload_workbook(excel_path = DATA_PATH, problem_instance_ids = PROBLEM_INSTANCES, use_copy = UPLOAD_MODE != "TO_SQL", defer_constraints = UPLOAD_MODE == "COPY_DEFERRED")
 
-# Upload data from template
-client.upload_data(excel_path = DATA_PATH)
\ No newline at end of file
+# %% Save upload throughput per table
+if len(client.upload_report) > 0:
+    results = pd.DataFrame(client.upload_report)
+    results["UploadMode"] = UPLOAD_MODE
+    report_path = os.path.dirname(os.path.realpath("__file__")) + "/logs/upload/upload_time.csv"
+    os.makedirs(os.path.dirname(report_path), exist_ok = True)
+    if os.path.exists(report_path):
+        results = pd.concat([pd.read_csv(report_path, sep=";"), results])
+    results.to_csv(report_path, index = False, sep=";")
@@ -10,8 +10,9 @@ DATA=${CSV_LIST}
 # Prepare problem instance file
 sed -i "s/\r//g" ${DATA}
 
-# Upload data for all problem instances
-while IFS=, read -r Source ProblemInstance DataPath; do
-    echo "##### Upload migrated data model from provider ${Source} in ${DataPath} with problem instance ${ProblemInstance} into EER model #####"
-    python3 upload_data.py $ProblemInstance $DataPath
-done < ${DATA}
\ No newline at end of file
+# Upload data for all problem instances, every workbook is parsed once for all of its problem instances
+awk -F, '{ if (!($3 in instances)) { order[++n] = $3; instances[$3] = $2 } else { instances[$3] = instances[$3] "," $2 } } END { for (i = 1; i <= n; i++) print order[i], instances[order[i]] }' ${DATA} | \
+while read -r DataPath ProblemInstances; do
+    echo "##### Upload migrated data model in ${DataPath} with problem instances ${ProblemInstances} into EER model #####"
+    python3 upload_data.py $ProblemInstances $DataPath
+done
\ No newline at end of file
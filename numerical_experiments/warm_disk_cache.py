@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import sys
+import os
+import time
+import pandas as pd
+
+# Get system variables
+MAX_SIZE = int(sys.argv[1]) * 1024 ** 2 if len(sys.argv) > 1 else 2 * 1024 ** 3
+REFRESH = len(sys.argv) > 2 and str(sys.argv[2]) == "REFRESH"
+
+# Pre-warm the disk cache for all problem instances
+from lib.disk_cache import DataDiskCache
+cache = DataDiskCache(max_size = MAX_SIZE)
+if REFRESH:
+    cache.invalidate()
+
+problem_instances = pd.read_csv(os.path.dirname(os.path.realpath("__file__")) + "/ProblemInstances.csv", header = None, names = ["Source", "ProblemInstance", "DataPath"])
+problem_instances["DataPath"] = problem_instances["DataPath"].str.strip()
+
+# Every workbook is parsed once for all of its problem instances
+for data_path, instances in problem_instances.groupby("DataPath", sort = False):
+    print("##### Prepare disk cache for problem instances %s from %s #####" % (",".join(instances["ProblemInstance"]), data_path))
+    data_path = os.path.dirname(os.path.realpath("__file__")) + data_path
+    if not os.path.exists(data_path):
+        print("# Warning: Data path %s was not found #" % (data_path))
+        continue
+    st = time.time()
+    cache.load_workbook(list(instances["ProblemInstance"].drop_duplicates()), data_path)
+    et = time.time()
+    print("# Disk cache of %s problem instances ready after %s seconds #" % (instances.shape[0], et - st))
+
+entries = cache.entries()
+print("# Disk cache contains %s entries with %s MB #" % (len(entries), sum(entry["size"] for entry in entries) / 1024 ** 2))